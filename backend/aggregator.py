@@ -1,12 +1,277 @@
 # backend/aggregator.py
 from __future__ import annotations
-from typing import Dict, List
-from backend.x_fetcher import fetch_recent_tweets
-from backend.xai_client import score_text
+import asyncio
+import queue
+import threading
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+from backend.batch import ScoredBatch
+from backend.dedup import Deduper
+from backend.metrics import stage
+from backend.store import STORE_KEEP, TweetStore, get_store
+from backend.timeseries import TS_BUCKET_S, series
+from backend.x_fetcher import afetch_recent_tweets, aiter_recent_tweet_pages, iter_recent_tweet_pages, x_query
+from backend.xai_client import ascore_texts, get_scorer
+
+_DONE = object()
+
+def _read_ahead(pages: Iterable[Dict], depth: int = 1) -> Iterator[Dict]:
+    """
+    Pull `pages` on a background thread so page N+1 is in flight while the
+    caller is still scoring page N.
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _pump():
+        try:
+            for page in pages:
+                if not _put(page):
+                    return
+        except BaseException as e:  # surface producer errors to the consumer
+            _put(e)
+            return
+        _put(_DONE)
+
+    threading.Thread(target=_pump, name="xsent-read-ahead", daemon=True).start()
+    try:
+        while True:
+            page = q.get()
+            if page is _DONE:
+                return
+            if isinstance(page, BaseException):
+                raise page
+            yield page
+    finally:
+        stop.set()
+
+async def _aread_ahead(pages: AsyncIterator[Dict]) -> AsyncIterator[Dict]:
+    """
+    Async twin of _read_ahead(): keep the next page's fetch in flight. The
+    fetch gets one loop turn to send its request before the page is handed
+    over; it then overlaps with scoring because the scorers await (LLM calls,
+    or the lexicon on a worker thread) instead of holding the loop.
+    """
+    nxt = asyncio.ensure_future(pages.__anext__())
+    try:
+        while True:
+            try:
+                page = await nxt
+            except StopAsyncIteration:
+                return
+            nxt = asyncio.ensure_future(pages.__anext__())
+            await asyncio.sleep(0)  # let the next request go out before the caller scores
+            yield page
+    finally:
+        if not nxt.done():
+            nxt.cancel()
+            try:
+                await nxt
+            except (asyncio.CancelledError, StopAsyncIteration):
+                pass
+        await pages.aclose()
+
+class Tally:
+    """
+    Running counters + scored items for one analysis. Items are kept in a
+    ScoredBatch (columnar; reads back as the same dicts). With
+    keep_items=False only the counters are kept (streaming path).
+    """
+
+    def __init__(self, keep_items: bool = True):
+        self.source = "UNKNOWN"
+        self.keep_items = keep_items
+        self.items: ScoredBatch = ScoredBatch()
+        self.n = 0
+        self.pos = self.neg = self.neu = 0
+        self.total = 0.0
+
+    def add_page(self, page: Dict) -> List[Dict]:
+        """Score one fetched page; returns the new scored items."""
+        texts = self._texts(page)
+        return self._add(page, texts, get_scorer().score(texts))
+
+    async def aadd_page(self, page: Dict) -> List[Dict]:
+        """add_page() for async callers: scores without blocking the loop on the LLM."""
+        texts = self._texts(page)
+        return self._add(page, texts, await ascore_texts(texts))
+
+    def _texts(self, page: Dict) -> List[str]:
+        self.source = page.get("source", self.source)
+        return [t.get("text", "") or "" for t in page.get("items", []) or []]
+
+    def _add(self, page: Dict, texts: List[str], scored: List[Dict]) -> List[Dict]:
+        added = [
+            {"id": t.get("id"), "text": text, "score": float(s["score"]), "label": str(s["label"]),
+             "created_at": t.get("created_at")}
+            for t, text, s in zip(page.get("items", []) or [], texts, scored)
+        ]
+        self.add_scored(added)
+        return added
+
+    def add_scored(self, items: List[Dict]):
+        """Fold already-scored items into the counters."""
+        for it in items:
+            self.total += it["score"]
+            label = it["label"]
+            if label == "pos":
+                self.pos += 1
+            elif label == "neg":
+                self.neg += 1
+            else:
+                self.neu += 1
+        self.n += len(items)
+        if self.keep_items:
+            self.items.extend(items)
+
+    def aggregate(self) -> Dict:
+        avg = (self.total / self.n) if self.n else 0.0
+        return {
+            "n": self.n,
+            "avg_score": round(avg, 4),
+            "counts": {"pos": self.pos, "neg": self.neg, "neu": self.neu},
+        }
+
+    def result(self, query: str, requested: int) -> Dict:
+        return {
+            "query": query,
+            "requested": requested,
+            **self.aggregate(),
+            "items": self.items,
+            "source": self.source,
+        }
+
+def _series(store: Optional[TweetStore], key: str):
+    """The query's time series; a new one starts from the stored tweets."""
+    return series.get(key, seed=(lambda: store.window(key, STORE_KEEP)) if store is not None else None)
+
+def _record(store: Optional[TweetStore], key: str, raw_items: List[Dict], scored: List[Dict]):
+    """Keep LIVE scored tweets: in the store and in the query's time series."""
+    if store is not None:
+        store.add(key, raw_items, scored)
+    _series(store, key).add_items(scored)
+
+def sentiment_timeseries(query: str, lang: str = "en", buckets: int = 30, bucket_s: int = TS_BUCKET_S,
+                         now: Optional[float] = None) -> Dict:
+    """
+    Rolling per-bucket sentiment for a query, from tweets already scored
+    (analyze_topic and friends feed it). bucket_s is rounded down to a
+    multiple of XSENT_TS_BUCKET_S.
+
+    Returns:
+      {
+        "query": str,
+        "bucket_s": int,
+        "buckets": [{"start","n","mean","var","counts"}],   # oldest first, empty ones included
+        "window": {"seconds","n","mean","var","counts"},
+        "momentum": float                                  # slope of bucket means, per bucket
+      }
+    """
+    key = x_query(query, lang)
+    _series(get_store(), key)
+    return {"query": query, **series.summary(key, buckets, max(1, int(bucket_s) // TS_BUCKET_S), now)}
+
+class _Incremental:
+    """
+    Store + dedup bookkeeping for one analysis. since_id is only used once a
+    window at least this deep was fully fetched for the query; the deduper
+    then starts out knowing the stored window, so reposts of stored tweets
+    are dropped too. The fetch cursor only advances after a walk that ended
+    normally: one cut short (breaker, quota, failed page) would otherwise
+    skip the older tweets it never reached. Async callers run the store's
+    sqlite work through asyncio.to_thread (the a* methods).
+    """
+
+    def __init__(self, query: str, lang: str, max_results: int):
+        self.store: Optional[TweetStore] = get_store()
+        self.key = x_query(query, lang)
+        self.max_results = max_results
+        self.dedup = Deduper()
+        self.since_id: Optional[str] = None
+        self.newest = 0
+        self.live = False
+        self.complete = True
+
+    def load(self) -> "_Incremental":
+        if self.store is not None:
+            last_id, depth = self.store.cursor(self.key)
+            if last_id and depth >= self.max_results:
+                self.since_id = last_id
+                self.dedup.seed(self.store.window(self.key, self.max_results))
+        return self
+
+    async def aload(self) -> "_Incremental":
+        if self.store is not None:
+            await asyncio.to_thread(self.load)
+        return self
+
+    def page(self, page: Dict) -> Dict:
+        """Track the newest fetched ID, then drop duplicates."""
+        if page.get("truncated"):
+            self.complete = False
+        if page.get("source") == "LIVE":
+            self.live = True
+            ids = [int(t["id"]) for t in page.get("items", []) or [] if str(t.get("id", "")).isdigit()]
+            self.newest = max([self.newest, *ids])
+        return self.dedup.page(page)
+
+    def save(self, page: Dict, added: List[Dict]):
+        if page.get("source") == "LIVE":
+            _record(self.store, self.key, page["items"], added)
+
+    async def asave(self, page: Dict, added: List[Dict]):
+        if page.get("source") == "LIVE" and self.store is not None:
+            await asyncio.to_thread(self.save, page, added)
+        else:
+            self.save(page, added)
+
+    def done(self):
+        if self.store is not None and self.live and self.complete and self.newest:
+            self.store.note_fetch(self.key, self.newest, self.max_results)
+
+    async def adone(self):
+        if self.store is not None and self.live and self.complete and self.newest:
+            await asyncio.to_thread(self.done)
+
+    def window(self) -> List[Dict]:
+        return self.store.window(self.key, self.max_results)
+
+def _result(tally: Tally, inc: _Incremental, query: str, max_results: int, window: Optional[List[Dict]]) -> Dict:
+    """Final result: the newest stored window when LIVE, else just this fetch."""
+    if window is not None:
+        merged = Tally()
+        merged.source = "LIVE"
+        merged.add_scored(window)
+        tally = merged
+    out = tally.result(query, max_results)
+    out["fetched"] = inc.dedup.seen
+    out["dedup"] = inc.dedup.report()
+    return out
+
+def _merge_window(tally: Tally, inc: _Incremental, query: str, max_results: int) -> Dict:
+    inc.done()
+    live = inc.store is not None and tally.source == "LIVE"
+    return _result(tally, inc, query, max_results, inc.window() if live else None)
+
+async def _amerge_window(tally: Tally, inc: _Incremental, query: str, max_results: int) -> Dict:
+    await inc.adone()
+    live = inc.store is not None and tally.source == "LIVE"
+    return _result(tally, inc, query, max_results, await asyncio.to_thread(inc.window) if live else None)
 
 def analyze_topic(query: str, max_results: int = 20, lang: str = "en") -> Dict:
     """
     Fetch recent tweets from X and compute an average sentiment.
+    Pages are scored as they arrive while the next page is being fetched.
+    With the tweet store enabled only tweets newer than the last stored one
+    are fetched and scored, then merged into the stored window.
 
     Returns:
       {
@@ -15,50 +280,146 @@ def analyze_topic(query: str, max_results: int = 20, lang: str = "en") -> Dict:
         "n": int,                      # number actually scored
         "avg_score": float,
         "counts": {"pos": int, "neg": int, "neu": int},
-        "items": [{"id","text","score","label"}],
-        "source": "LIVE"|"DEMO"
+        "items": [{"id","text","score","label","created_at"}],   # a ScoredBatch
+        "source": "LIVE"|"DEMO",
+        "fetched": int,                # tweets pulled from X by this call
+        "dedup": {"seen","kept","exact","near","clusters": [{"id","size","text"}]}
       }
+    Retweets, exact copies and near-duplicates are dropped before scoring
+    (see backend/dedup.py); "dedup" reports what was collapsed.
     """
     max_results = max(1, min(int(max_results), 300))
-    fetched = fetch_recent_tweets(query=query, max_results=max_results, lang=lang)
-    source = fetched.get("source", "UNKNOWN")
-    raw_items = fetched.get("items", []) or []
-
-    out_items: List[Dict] = []
-    pos = neg = neu = 0
-    total = 0.0
-
-    for t in raw_items:
-        text = t.get("text", "") or ""
-        sid = t.get("id")
-        s = score_text(text)
-        score = float(s["score"])
-        label = str(s["label"])
-
-        total += score
-        if label == "pos":
-            pos += 1
-        elif label == "neg":
-            neg += 1
-        else:
-            neu += 1
+    inc = _Incremental(query, lang, max_results).load()
+    pages = iter_recent_tweet_pages(query=query, max_results=max_results, lang=lang, since_id=inc.since_id)
+
+    tally = Tally()
+    with stage("analyze"):
+        for page in _read_ahead(pages):
+            page = inc.page(page)
+            inc.save(page, tally.add_page(page))
+        return _merge_window(tally, inc, query, max_results)
+
+async def analyze_topic_async(query: str, max_results: int = 20, lang: str = "en") -> Dict:
+    """analyze_topic() on the async X client; same result schema."""
+    max_results = max(1, min(int(max_results), 300))
+    inc = await _Incremental(query, lang, max_results).aload()
+    pages = aiter_recent_tweet_pages(query=query, max_results=max_results, lang=lang, since_id=inc.since_id)
+
+    tally = Tally()
+    with stage("analyze"):
+        async for page in _aread_ahead(pages):
+            page = inc.page(page)
+            await inc.asave(page, await tally.aadd_page(page))
+        return await _amerge_window(tally, inc, query, max_results)
+
+async def stream_topic(query: str, max_results: int = 20, lang: str = "en") -> AsyncIterator[Dict]:
+    """
+    analyze_topic_async() as a stream of frames, emitted as soon as ready:
+      {"type": "item", "id", "text", "score", "label", "created_at"}   one per tweet
+      {"type": "agg", "n", "avg_score", "counts"}       after each page
+      {"type": "summary", ...}                          last; the analyze_topic
+                                                        result without "items"
+    Only running counters are held, never the full item list. With the store
+    enabled, newly fetched tweets come first, then the rest of the stored window.
+    """
+    max_results = max(1, min(int(max_results), 300))
+    inc = await _Incremental(query, lang, max_results).aload()
+    pages = aiter_recent_tweet_pages(query=query, max_results=max_results, lang=lang, since_id=inc.since_id)
+
+    tally = Tally(keep_items=False)
+    seen = set()
+    async for page in _aread_ahead(pages):
+        page = inc.page(page)
+        added = await tally.aadd_page(page)
+        await inc.asave(page, added)
+        if not added:
+            continue
+        for it in added:
+            seen.add(it["id"])
+            yield {"type": "item", **it}
+        yield {"type": "agg", **tally.aggregate()}
+
+    await inc.adone()
+    if inc.store is not None and tally.source == "LIVE":
+        rest = [it for it in await asyncio.to_thread(inc.window) if it["id"] not in seen][:max_results - tally.n]
+        if rest:
+            tally.add_scored(rest)
+            for it in rest:
+                yield {"type": "item", **it}
+            yield {"type": "agg", **tally.aggregate()}
+
+    out = tally.result(query, max_results)
+    del out["items"]
+    out["fetched"] = inc.dedup.seen
+    out["dedup"] = inc.dedup.report()
+    yield {"type": "summary", **out}
+
+async def analyze_batch_async(queries: List[str], max_results: int = 20, lang: str = "en",
+                              concurrency: int = 8) -> Dict:
+    """
+    Analyze many queries at once: fetch them concurrently (at most
+    `concurrency` in flight), score every distinct tweet once, and report
+    per-query aggregates plus a combined aggregate that counts each tweet once
+    even when several queries returned it. Each query's retweets and
+    near-duplicates are collapsed first, as in analyze_topic().
+
+    Returns:
+      {
+        "requested": int,
+        "queries": [{"query","n","avg_score","counts","source","duplicates"}],
+        "combined": {"n","avg_score","counts","duplicates"}
+      }
+    """
+    max_results = max(1, min(int(max_results), 300))
+    queries = list(dict.fromkeys(q for q in queries if q))  # dedupe, keep order
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
 
-        out_items.append({
-            "id": sid,
-            "text": text,
-            "score": score,
-            "label": label,
-        })
+    async def _fetch(q: str) -> Dict:
+        async with sem:
+            return await afetch_recent_tweets(q, max_results=max_results, lang=lang)
+
+    fetched = await asyncio.gather(*[_fetch(q) for q in queries])
+
+    # Distinct tweets across all queries. DEMO IDs repeat per query, so they
+    # are only shared within their own query.
+    unique: Dict = {}
+    per_query_keys: List[List] = []
+    dropped = []
+    for q, res in zip(queries, fetched):
+        dedup = Deduper()
+        res["items"] = dedup.filter(res.get("items", []) or [])
+        dropped.append(dedup.seen - dedup.kept)
+        keys = []
+        for t in res["items"]:
+            k = t.get("id") if res.get("source") == "LIVE" else (q, t.get("id"))
+            unique.setdefault(k, t)
+            keys.append(k)
+        per_query_keys.append(keys)
+
+    tweets = list(unique.values())
+    scored = await ascore_texts([t.get("text", "") or "" for t in tweets])
+    by_key = {
+        k: {"id": t.get("id"), "text": t.get("text", "") or "", "score": float(s["score"]), "label": str(s["label"]),
+            "created_at": t.get("created_at")}
+        for k, t, s in zip(unique, tweets, scored)
+    }
 
-    n = len(out_items)
-    avg = (total / n) if n else 0.0
+    store = get_store()
+    out_queries = []
+    for q, res, keys, dups in zip(queries, fetched, per_query_keys, dropped):
+        tally = Tally(keep_items=False)
+        tally.source = res.get("source", "UNKNOWN")
+        items = [by_key[k] for k in keys]
+        tally.add_scored(items)
+        if tally.source == "LIVE":
+            await asyncio.to_thread(_record, store, x_query(q, lang), res["items"], items)
+        out_queries.append({"query": q, **tally.aggregate(), "source": tally.source, "duplicates": dups})
 
+    combined = Tally(keep_items=False)
+    combined.add_scored(list(by_key.values()))
+    total_refs = sum(len(k) for k in per_query_keys)
     return {
-        "query": query,
         "requested": max_results,
-        "n": n,
-        "avg_score": round(avg, 4),
-        "counts": {"pos": pos, "neg": neg, "neu": neu},
-        "items": out_items,
-        "source": source,
+        "queries": out_queries,
+        "combined": {**combined.aggregate(), "duplicates": total_refs - combined.n},
     }
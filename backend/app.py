@@ -1,12 +1,18 @@
 # backend/app.py
 from __future__ import annotations
 
+import asyncio
+import json
 import os
+import time
 import traceback
-from typing import Optional
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel, Field
 
 # Load .env at process start
 try:
@@ -15,10 +21,80 @@ try:
 except Exception:
     pass
 
-from backend.aggregator import analyze_topic
-from backend.kalshi_auth import list_open_markets, get_balance, place_order
+from backend.aggregator import analyze_batch_async, sentiment_timeseries, stream_topic
+from backend.cache import analyze_topic_cached, sentiment_cache
+from backend.kalshi_auth import get_client, get_balance, order_body
+from backend.kalshi_ws import KALSHI_WS_TICKERS, market_feed
+from backend.market_catalog import catalog
+from backend.market_matcher import analyze_markets_async, matcher
+from backend.orders import aclose_order_pipeline, get_order_pipeline
+from backend import metrics, responses
+from backend.ratelimit import governor
+from backend.scheduler import scheduler, WATCH_INTERVAL_S
+from backend.timeseries import TS_BUCKET_S, TS_BUCKETS
+from backend.x_fetcher import aclose_async_client
+from backend.xai_client import get_scorer
 
-app = FastAPI(title="xSent Backend", version="0.2.0")
+catalog.listeners.append(matcher.on_catalog_refresh)
+
+# Server-Timing on every response ("1"), or only when the client sends X-Server-Timing: 1 ("0")
+SERVER_TIMING = os.getenv("XSENT_SERVER_TIMING", "0") == "1"
+
+# /api/signals/stream: keep-alive comment interval, and how long one stream lives before the client
+# reconnects (uvicorn waits for open responses on shutdown, so an endless stream would hold it up)
+SIGNAL_PING_S = float(os.getenv("XSENT_SIGNAL_PING_S", "15"))
+SIGNAL_STREAM_S = float(os.getenv("XSENT_SIGNAL_STREAM_S", "30"))
+
+HTTP_SECONDS = metrics.histogram("xsent_http_request_seconds", "API latency until the response headers are sent.",
+                                 ["route", "method", "status"])
+
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware: collects the stages timed during a request
+    (backend/metrics.py), observes the request latency per route and, when
+    enabled, adds them as a Server-Timing header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t0 = time.perf_counter()
+        token = metrics.begin_request()
+        want = SERVER_TIMING or any(k == b"x-server-timing" and v == b"1" for k, v in scope.get("headers", ()))
+
+        async def _send(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - t0
+                route = scope.get("route")
+                HTTP_SECONDS.observe(elapsed, route=getattr(route, "path", "unmatched"), method=scope["method"],
+                                     status=message["status"])
+                if want:
+                    value = metrics.server_timing(metrics.current_timings(), elapsed)
+                    message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", value.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            metrics.end_request(token)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    scheduler.start()
+    if KALSHI_WS_TICKERS:
+        await market_feed.subscribe(KALSHI_WS_TICKERS)
+    yield
+    await market_feed.stop()
+    await scheduler.stop()
+    await catalog.stop()
+    await aclose_async_client()
+    await get_scorer().aclose()
+    await aclose_order_pipeline()
+
+app = FastAPI(title="xSent Backend", version="0.2.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -26,12 +102,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(ServerTimingMiddleware)
 
 @app.get("/health")
 def health():
     return {"ok": True}
 
+# --- Prometheus scrape target ---
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 # --- Debug helper: confirm env vars are visible (masks secrets) ---
 @app.get("/debug/env")
 def debug_env():
@@ -45,28 +128,255 @@ def debug_env():
     return {
         "XSENT_FORCE_DEMO": os.getenv("XSENT_FORCE_DEMO", "0"),
         "X_BEARER": mask(os.getenv("X_BEARER")),
+        "XSENT_SCORER": get_scorer().name,
+        "XAI_KEY": mask(os.getenv("XAI_KEY")),
         "KALSHI_HOST": os.getenv("KALSHI_HOST"),
         "KALSHI_API_KEY_ID": mask(os.getenv("KALSHI_API_KEY_ID")),
         "KALSHI_PRIVATE_KEY": os.getenv("KALSHI_PRIVATE_KEY"),
     }
 
+# --- Debug helper: Kalshi request-signing latency ---
+@app.get("/debug/kalshi/signing")
+def debug_kalshi_signing():
+    return get_client().signing_stats()
+
+@app.get("/debug/kalshi/orders")
+def debug_kalshi_orders():
+    return get_order_pipeline().state()
+
+@app.get("/debug/kalshi/feed")
+def debug_kalshi_feed():
+    return market_feed.state()
+
+@app.get("/debug/x/governor")
+def debug_x_governor():
+    return governor.state()
+
+@app.get("/debug/scorer")
+def debug_scorer():
+    return get_scorer().state()
+
+@app.get("/debug/cache")
+def debug_cache():
+    return sentiment_cache.stats()
+
 # --- Sentiment ---
 @app.get("/api/sentiment")
-def api_sentiment(
+async def api_sentiment(
+    request: Request,
     q: str = Query(..., min_length=1),
     max_results: int = Query(10, ge=1, le=300),
+    view: str = Query("full", pattern="^(full|summary)$", description="summary: no items"),
+    fields: str = Query("", max_length=100, description="item keys to keep, e.g. id,score"),
+    offset: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=300, description="items per page"),
+    format: Optional[str] = Query(None, pattern="^(json|msgpack)$", description="default: from Accept"),
 ):
     try:
-        return analyze_topic(q, max_results=max_results, lang="en")
+        item_fields = responses.parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    try:
+        data = await analyze_topic_cached(q, max_results=max_results, lang="en")
+        return responses.render(responses.shape(data, view, item_fields, offset, limit), headers={
+            "X-Cache": "HIT" if data["cache"]["hit"] else "MISS",
+            "Age": str(int(data["cache"]["age_s"])),
+        }, fmt=format, request_headers=request.headers)
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-# --- Kalshi: list markets ---
+# --- Sentiment: rolling time series ---
+@app.get("/api/sentiment/timeseries")
+async def api_sentiment_timeseries(
+    q: str = Query(..., min_length=1),
+    bucket_s: int = Query(TS_BUCKET_S, ge=TS_BUCKET_S, le=TS_BUCKET_S * TS_BUCKETS),
+    buckets: int = Query(30, ge=1, le=TS_BUCKETS),
+    max_results: int = Query(100, ge=1, le=300),
+    refresh: bool = Query(True, description="fetch new tweets first (through the result cache)"),
+):
+    """Per-bucket mean/count/variance/counts over the last `buckets` x `bucket_s` seconds, plus momentum."""
+    try:
+        source = None
+        if refresh:
+            source = (await analyze_topic_cached(q, max_results=max_results, lang="en"))["source"]
+        ts = await asyncio.to_thread(sentiment_timeseries, q, lang="en", buckets=buckets, bucket_s=bucket_s)
+        return {**ts, "source": source}
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Sentiment: many queries in one call ---
+class BatchIn(BaseModel):
+    queries: List[str] = Field(..., min_length=1, max_length=100)
+    max_results: int = Field(10, ge=1, le=300)
+    concurrency: int = Field(8, ge=1, le=32)
+
+@app.post("/api/sentiment/batch")
+async def api_sentiment_batch(b: BatchIn):
+    try:
+        return await analyze_batch_async(b.queries, max_results=b.max_results, lang="en", concurrency=b.concurrency)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Sentiment: streamed as items are scored ---
+def _ndjson_frame(frame: dict) -> str:
+    return json.dumps(frame, ensure_ascii=False) + "\n"
+
+def _sse_frame(frame: dict) -> str:
+    return f"event: {frame['type']}\ndata: {json.dumps(frame, ensure_ascii=False)}\n\n"
+
+@app.get("/api/sentiment/stream")
+async def api_sentiment_stream(
+    request: Request,
+    q: str = Query(..., min_length=1),
+    max_results: int = Query(10, ge=1, le=300),
+    format: Optional[str] = Query(None, pattern="^(ndjson|sse)$"),
+):
+    """
+    Frames: "item" per scored tweet, "agg" running totals, "summary" last.
+    format=ndjson|sse, or negotiated via Accept: text/event-stream.
+    """
+    fmt = format or ("sse" if "text/event-stream" in request.headers.get("accept", "") else "ndjson")
+    encode = _sse_frame if fmt == "sse" else _ndjson_frame
+
+    async def body():
+        try:
+            async for frame in stream_topic(q, max_results=max_results, lang="en"):
+                yield encode(frame)
+        except Exception as e:
+            traceback.print_exc()
+            yield encode({"type": "error", "detail": str(e)})
+
+    media = "text/event-stream" if fmt == "sse" else "application/x-ndjson"
+    return StreamingResponse(body(), media_type=media, headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+# --- Watchlist: precomputed signals ---
+class WatchIn(BaseModel):
+    query: str
+    interval_s: float = WATCH_INTERVAL_S
+    max_results: int = 20
+
+@app.get("/api/signals")
+def api_signals():
+    return {"signals": scheduler.snapshot, "scheduler": scheduler.state()}
+
+@app.get("/api/signals/stream")
+async def api_signals_stream(request: Request):
+    """
+    SSE push of watchlist signals: one "snapshot" frame with every current
+    signal, then a "signal" (or "removed") frame per update, ": ping" every
+    SIGNAL_PING_S so proxies and clients can tell a quiet stream from a dead one.
+    The stream ends after SIGNAL_STREAM_S; clients reconnect and get a new snapshot.
+    """
+    queue = scheduler.subscribe()
+
+    async def body():
+        try:
+            yield "retry: 1000\n" + _sse_frame({"type": "snapshot", "signals": scheduler.snapshot})
+            deadline = time.monotonic() + SIGNAL_STREAM_S
+            while not await request.is_disconnected():
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    break
+                try:
+                    frame = await asyncio.wait_for(queue.get(), timeout=min(SIGNAL_PING_S, left))
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield _sse_frame(frame)
+        finally:
+            scheduler.unsubscribe(queue)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/api/signals/{query}")
+def api_signal(query: str):
+    sig = scheduler.get(query)
+    if sig is None:
+        raise HTTPException(status_code=404, detail=f"No signal yet for '{query}'")
+    return sig
+
+@app.get("/api/watchlist")
+def api_watchlist():
+    return {"watchlist": scheduler.watchlist()}
+
+@app.post("/api/watchlist")
+def api_watchlist_add(w: WatchIn):
+    if not w.query.strip():
+        raise HTTPException(status_code=422, detail="query must not be empty")
+    return scheduler.add(w.query.strip(), interval_s=max(1.0, w.interval_s), max_results=max(1, min(w.max_results, 300)))
+
+@app.delete("/api/watchlist/{query}")
+def api_watchlist_remove(query: str):
+    if not scheduler.remove(query):
+        raise HTTPException(status_code=404, detail=f"'{query}' is not on the watchlist")
+    return {"removed": query}
+
+# --- Kalshi: list markets (served from the local catalog) ---
+async def _catalog_ready():
+    """Wait for the catalog's first pass; 503 if it has only failed so far (empty is not "no markets")."""
+    await catalog.ensure_started()
+    if catalog.failed:
+        raise HTTPException(status_code=503, detail="Market catalog unavailable: no refresh has succeeded yet")
+
 @app.get("/api/kalshi/markets")
-def api_kalshi_markets():
+async def api_kalshi_markets(
+    search: str = Query("", max_length=200),
+    limit: int = Query(100, ge=1, le=1000),
+    event: str = Query(""),
+    series: str = Query(""),
+):
+    await _catalog_ready()
+    try:
+        return {**catalog.search(search, limit=limit, event=event, series=series), "catalog": catalog.state()}
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# --- Kalshi: market -> X query linking ---
+@app.get("/api/kalshi/markets/{ticker}/query")
+async def api_kalshi_market_query(ticker: str):
+    await _catalog_ready()
+    q = matcher.query_for(ticker)
+    if q is None:
+        raise HTTPException(status_code=404, detail=f"No query for market '{ticker}'")
+    return q.info()
+
+# --- Kalshi: live order book (websocket feed) ---
+@app.get("/api/kalshi/markets/{ticker}/book")
+async def api_kalshi_market_book(ticker: str, depth: int = Query(10, ge=1, le=99)):
+    """
+    Best bid/ask and top levels. The first request for a market the catalog
+    knows subscribes it (empty until the snapshot); other tickers must be
+    added with POST /api/kalshi/feed first.
+    """
+    if ticker not in market_feed.tickers:
+        await _catalog_ready()
+        if catalog.get(ticker) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown market '{ticker}'")
+        await market_feed.subscribe([ticker])
+    return {**market_feed.book(ticker, depth), "connected": market_feed.connected}
+
+class FeedIn(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=500)
+
+@app.post("/api/kalshi/feed")
+async def api_kalshi_feed(f: FeedIn):
+    added = await market_feed.subscribe(f.tickers)
+    return {"added": added, **market_feed.state()}
+
+class MarketsSentimentIn(BaseModel):
+    tickers: List[str] = Field(..., min_length=1, max_length=500)
+    max_results: int = Field(100, ge=1, le=300)
+
+@app.post("/api/sentiment/markets")
+async def api_sentiment_markets(b: MarketsSentimentIn):
     try:
-        return list_open_markets()
+        await catalog.ensure_started()
+        return await analyze_markets_async(b.tickers, max_results=b.max_results, lang="en")
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
@@ -81,18 +391,47 @@ def api_kalshi_balance():
         raise HTTPException(status_code=500, detail=str(e))
 
 # --- Kalshi: place order ---
-from pydantic import BaseModel
-
 class OrderIn(BaseModel):
     ticker: str
     side: str      # "buy" or "sell"  (your YES/NO mapping happens in the UI)
-    price: int     # 1..99
+    price: Optional[int] = None  # 1..99; omitted = the current ask from the live book (connected, fresh)
     count: int
+    client_order_id: Optional[str] = None  # reuse it when retrying, so the order cannot fill twice
+
+    def body(self) -> dict:
+        price = self.price
+        if price is None:
+            price = market_feed.price_for(self.ticker, self.side)
+            if price is None:
+                raise HTTPException(status_code=409, detail=f"No live price for '{self.ticker}'; pass a price")
+        return order_body(self.ticker, self.side, price, self.count, self.client_order_id)
 
 @app.post("/api/kalshi/order")
-def api_kalshi_order(o: OrderIn):
+async def api_kalshi_order(o: OrderIn):
+    body = o.body()
+    try:
+        res = await get_order_pipeline().submit(body)
+    except Exception as e:
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+    if res["status"] in ("rejected", "failed"):
+        raise HTTPException(status_code=500, detail=res["error"] or res["status"])
+    return res
+
+# --- Kalshi: place a basket of orders ---
+class OrdersIn(BaseModel):
+    orders: List[OrderIn] = Field(..., min_length=1, max_length=200)
+
+@app.post("/api/kalshi/orders")
+async def api_kalshi_orders(b: OrdersIn):
+    """All orders at once (batched where Kalshi allows); one result per order, in order."""
+    bodies = [o.body() for o in b.orders]
     try:
-        return place_order(o.ticker, o.side, o.price, o.count)
+        results = await get_order_pipeline().submit_many(bodies)
     except Exception as e:
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+    return {"results": results, "counts": counts}
@@ -0,0 +1,276 @@
+# backend/backtest.py
+"""
+Vectorized backtest of the YES/NO/HOLD sentiment rule.
+
+The dashboard rule (frontend sentiment_recommendation) is
+
+    YES  if avg >= +threshold and pos >= ratio * max(1, neg)
+    NO   if avg <= -threshold and neg >= ratio * max(1, pos)
+    HOLD otherwise
+
+with threshold 0.15 and ratio 2 hard-coded (its 60 is only a suggested
+limit price, not a condition). The backtest adds one entry filter the
+dashboard does not have: a side is only entered while its price is
+<= max_price (YES price for YES, 100 - price for NO). max_price 100 turns
+the filter off, and is what the dashboard baseline uses. Here the rule is
+replayed over a sentiment series and a Kalshi price series, both bucketed
+into bars of `bar_s` seconds, for a whole grid of (threshold, ratio,
+max_price) at once: signals, positions, per-bar PnL, equity and drawdown
+are (params x bars) NumPy arrays, never per-row Python loops.
+
+Trading model (1 contract, prices in cents):
+  - the signal at the end of bar t sets the position for bar t -> t+1
+    (+1 YES, -1 NO, 0 flat; with hold="keep" HOLD keeps the last position)
+  - bar PnL = position * (price[t+1] - price[t]); the last bar settles at
+    100/0 when the market result is known
+  - every position change costs `cost` cents per contract traded; in
+    hit_rate a trade pays both its entry and its exit
+
+Reported per parameter set: pnl, trades, hit_rate (share of closed trades
+that made money), max_drawdown, exposure (share of bars in a position).
+
+Inputs are local files (CSV or JSONL) or the tweet store:
+  prices     ts, price (cents, or 0..1 dollars) [, result = yes|no]
+  sentiment  ts, avg_score, pos, neg [, n]; /api/sentiment/timeseries
+             buckets (start, mean, counts{pos,neg}) are accepted too
+
+Run:  python -m backend.backtest --prices px.csv --query bitcoin --bar 3600
+"""
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import sqlite3
+import time
+from datetime import datetime
+from itertools import product
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_RULE = {"threshold": 0.15, "ratio": 2.0, "max_price": 100}  # the dashboard rule: no price filter
+_CELLS_PER_CHUNK = 4_000_000  # params x bars evaluated at once (~100 MB of temporaries)
+
+# --- loading ---
+def _ts(v) -> float:
+    if isinstance(v, (int, float)):
+        return float(v)
+    v = str(v).strip()
+    try:
+        return float(v)
+    except ValueError:
+        return datetime.fromisoformat(v.replace("Z", "+00:00")).timestamp()
+
+def _rows(path: str) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            return [json.loads(line) for line in f if line.strip()]
+        return list(csv.DictReader(f))
+
+def _first(row: Dict, *keys, default=None):
+    for k in keys:
+        cur = row
+        for part in k.split("."):
+            cur = cur.get(part) if isinstance(cur, dict) else None
+        if cur not in (None, ""):
+            return cur
+    return default
+
+def load_prices(path: str) -> Tuple[np.ndarray, np.ndarray, Optional[float]]:
+    """(ts, YES price in cents, settlement 100/0 or None), sorted by time."""
+    rows = _rows(path)
+    ts = np.array([_ts(_first(r, "ts", "end_period_ts", "time")) for r in rows], dtype=np.float64)
+    px = np.array([float(_first(r, "price", "yes_price", "close", "price.close")) for r in rows], dtype=np.float64)
+    if px.size and px.max() <= 1.0:
+        px *= 100.0  # dollars -> cents
+    results = [str(_first(r, "result", default="")).lower() for r in rows]
+    settle = 100.0 if "yes" in results else (0.0 if "no" in results else None)
+    order = np.argsort(ts, kind="stable")
+    return ts[order], px[order], settle
+
+def load_sentiment(path: str) -> Dict[str, np.ndarray]:
+    """Per-row sentiment from a file: {"ts","avg","pos","neg","n"} arrays."""
+    rows = _rows(path)
+    cols = {
+        "ts": [_ts(_first(r, "ts", "start", "time")) for r in rows],
+        "avg": [float(_first(r, "avg_score", "mean", default=0.0)) for r in rows],
+        "pos": [float(_first(r, "pos", "counts.pos", default=0)) for r in rows],
+        "neg": [float(_first(r, "neg", "counts.neg", default=0)) for r in rows],
+    }
+    cols["n"] = [float(_first(r, "n", default=p + q)) for r, p, q in zip(rows, cols["pos"], cols["neg"])]
+    out = {k: np.asarray(v, dtype=np.float64) for k, v in cols.items()}
+    order = np.argsort(out["ts"], kind="stable")
+    return {k: v[order] for k, v in out.items()}
+
+def load_store_tweets(db_path: str, query: str, lang: str = "en") -> Dict[str, np.ndarray]:
+    """Scored tweets kept by the tweet store for one query, as per-tweet rows."""
+    from backend.x_fetcher import x_query
+
+    rows = sqlite3.connect(db_path).execute(
+        "SELECT created_at, score, label FROM tweets WHERE query = ? AND created_at IS NOT NULL",
+        (x_query(query, lang),),
+    ).fetchall()
+    ts = np.array([r[0][:19] for r in rows], dtype="datetime64[s]").astype(np.float64)
+    labels = np.array([r[2] for r in rows])
+    return {
+        "ts": ts,
+        "avg": np.array([r[1] for r in rows], dtype=np.float64),
+        "pos": (labels == "pos").astype(np.float64),
+        "neg": (labels == "neg").astype(np.float64),
+        "n": np.ones(len(rows)),
+    }
+
+# --- bars ---
+def to_bars(sent: Dict[str, np.ndarray], ts: np.ndarray, px: np.ndarray, bar_s: int,
+            settle: Optional[float] = None, min_n: int = 1) -> Dict[str, np.ndarray]:
+    """
+    Align sentiment and prices on bars of `bar_s` seconds. Sentiment rows are
+    pooled per bar (avg weighted by n); the price of a bar is the last one
+    at or before its end. Bars before the first price are dropped, bars with
+    fewer than `min_n` tweets carry no signal. `next_px` is the price one bar
+    later (the settlement, if known, after the last bar).
+    """
+    start = min(sent["ts"].min(), ts.min()) if sent["ts"].size else ts.min()
+    first = int(start // bar_s)
+    last = int(max(sent["ts"].max() if sent["ts"].size else 0, ts.max()) // bar_s)
+    nbars = last - first + 1
+
+    idx = (sent["ts"] // bar_s).astype(np.int64) - first
+    n = np.bincount(idx, weights=sent["n"], minlength=nbars)
+    tot = np.bincount(idx, weights=sent["avg"] * sent["n"], minlength=nbars)
+    pos = np.bincount(idx, weights=sent["pos"], minlength=nbars)
+    neg = np.bincount(idx, weights=sent["neg"], minlength=nbars)
+    avg = np.divide(tot, n, out=np.zeros(nbars), where=n > 0)
+
+    ends = (np.arange(nbars) + first + 1) * bar_s
+    at = np.searchsorted(ts, ends, side="left") - 1   # last price strictly before the bar end
+    ok = at >= 0
+    price = px[np.clip(at, 0, None)]
+    price, avg, pos, neg, n = price[ok], avg[ok], pos[ok], neg[ok], n[ok]
+    next_px = np.append(price[1:], price[-1] if settle is None else settle) if price.size else price
+    quiet = n < min_n
+    avg[quiet] = 0.0
+    pos[quiet] = neg[quiet] = 0.0
+    return {"start": (np.flatnonzero(ok) + first) * bar_s, "avg": avg, "pos": pos, "neg": neg,
+            "n": n, "price": price, "next_px": next_px}
+
+# --- engine ---
+def grid(thresholds: Sequence[float], ratios: Sequence[float], max_prices: Sequence[float]) -> Dict[str, np.ndarray]:
+    combos = np.array(list(product(thresholds, ratios, max_prices)), dtype=np.float64).reshape(-1, 3)
+    return {"threshold": combos[:, 0], "ratio": combos[:, 1], "max_price": combos[:, 2]}
+
+def _forward_fill(signal: np.ndarray) -> np.ndarray:
+    """Replace 0 (HOLD) with the last non-zero signal along each row."""
+    t = np.arange(signal.shape[1])
+    last = np.maximum.accumulate(np.where(signal != 0, t, -1), axis=1)
+    filled = np.take_along_axis(signal, np.clip(last, 0, None), axis=1)
+    return np.where(last >= 0, filled, 0).astype(signal.dtype)
+
+def _evaluate(bars: Dict[str, np.ndarray], thr: np.ndarray, ratio: np.ndarray, maxp: np.ndarray,
+              cost: float, hold: str) -> Dict[str, np.ndarray]:
+    avg, pos, neg, price = bars["avg"], bars["pos"], bars["neg"], bars["price"]
+    g, t = thr.size, avg.size
+    thr, ratio, maxp = thr[:, None], ratio[:, None], maxp[:, None]
+
+    yes = (avg >= thr) & (pos >= ratio * np.maximum(1.0, neg)) & (price <= maxp)
+    no = (avg <= -thr) & (neg >= ratio * np.maximum(1.0, pos)) & ((100.0 - price) <= maxp)
+    position = yes.astype(np.int8) - no.astype(np.int8)
+    if hold == "keep":
+        position = _forward_fill(position)
+
+    prev = np.concatenate([np.zeros((g, 1), dtype=np.int8), position[:, :-1]], axis=1)
+    moved = position != prev
+    entered = np.where(moved, np.abs(position), 0)              # contracts bought at bar t
+    exited = np.where(moved, np.abs(prev), 0)                   # contracts sold at bar t
+    held = position * (bars["next_px"] - price)
+    bar_pnl = held - cost * (entered + exited)
+    equity = np.cumsum(bar_pnl, axis=1)
+    peak = np.maximum.accumulate(np.maximum(equity, 0.0), axis=1)
+
+    # Trades = runs of one non-zero position; flattened so one bincount covers every row.
+    # A trade's exit happens on the next run's first bar; charge it to the trade (its last bar).
+    trade_pnl = held - cost * entered
+    trade_pnl[:, :-1] -= cost * exited[:, 1:]
+    change = moved.copy()
+    change[:, 0] = True
+    seg = np.cumsum(change.ravel()) - 1
+    seg_pnl = np.bincount(seg, weights=trade_pnl.ravel())
+    seg_pos = position.ravel()[change.ravel()]
+    seg_row = np.repeat(np.arange(g), change.sum(axis=1))
+    is_trade = seg_pos != 0
+    trades = np.bincount(seg_row[is_trade], minlength=g)
+    wins = np.bincount(seg_row[is_trade & (seg_pnl > 0)], minlength=g)
+
+    return {
+        "pnl": equity[:, -1] if t else np.zeros(g),
+        "trades": trades,
+        "hit_rate": np.divide(wins, trades, out=np.zeros(g), where=trades > 0),
+        "max_drawdown": (peak - equity).max(axis=1) if t else np.zeros(g),
+        "exposure": (position != 0).mean(axis=1) if t else np.zeros(g),
+    }
+
+def run(bars: Dict[str, np.ndarray], params: Dict[str, np.ndarray], cost: float = 1.0,
+        hold: str = "flat") -> Dict[str, np.ndarray]:
+    """Evaluate every parameter set; returns params plus one metric array each."""
+    g, t = params["threshold"].size, max(1, bars["avg"].size)
+    chunk = max(1, _CELLS_PER_CHUNK // t)
+    parts = [
+        _evaluate(bars, params["threshold"][i:i + chunk], params["ratio"][i:i + chunk],
+                  params["max_price"][i:i + chunk], cost, hold)
+        for i in range(0, g, chunk)
+    ]
+    out = dict(params)
+    for k in ("pnl", "trades", "hit_rate", "max_drawdown", "exposure"):
+        out[k] = np.concatenate([p[k] for p in parts]) if parts else np.zeros(0)
+    return out
+
+def top(results: Dict[str, np.ndarray], k: int = 10, by: str = "pnl") -> List[Dict]:
+    order = np.argsort(-results[by], kind="stable")[:k]
+    return [{key: round(float(v[i]), 4) for key, v in results.items()} for i in order]
+
+def _span(spec: str) -> List[float]:
+    """"a:b:step" (inclusive) or "x,y,z"."""
+    if ":" in spec:
+        a, b, step = (float(x) for x in spec.split(":"))
+        return list(np.round(np.arange(a, b + step / 2, step), 6))
+    return [float(x) for x in spec.split(",") if x.strip()]
+
+def main(argv: Optional[Sequence[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--prices", required=True, help="CSV/JSONL: ts, price[, result]")
+    src = ap.add_mutually_exclusive_group(required=True)
+    src.add_argument("--sentiment", help="CSV/JSONL sentiment series")
+    src.add_argument("--query", help="replay this query from the tweet store")
+    ap.add_argument("--store-db", default="xsent_store.db")
+    ap.add_argument("--bar", type=int, default=3600, help="bar width in seconds")
+    ap.add_argument("--min-n", type=int, default=1, help="tweets needed in a bar to act")
+    ap.add_argument("--thresholds", default="0:0.5:0.01")
+    ap.add_argument("--ratios", default="1:4:0.25")
+    ap.add_argument("--max-prices", default="40:100:5", help="entry filter; 100 = off (the dashboard rule)")
+    ap.add_argument("--cost", type=float, default=1.0, help="cents per contract traded")
+    ap.add_argument("--hold", choices=["flat", "keep"], default="flat")
+    ap.add_argument("--top", type=int, default=10)
+    ap.add_argument("--json", help="write every result row here")
+    args = ap.parse_args(argv)
+
+    ts, px, settle = load_prices(args.prices)
+    sent = load_sentiment(args.sentiment) if args.sentiment else load_store_tweets(args.store_db, args.query)
+    bars = to_bars(sent, ts, px, args.bar, settle=settle, min_n=args.min_n)
+    params = grid(_span(args.thresholds), _span(args.ratios), _span(args.max_prices))
+
+    t0 = time.perf_counter()
+    res = run(bars, params, cost=args.cost, hold=args.hold)
+    secs = time.perf_counter() - t0
+    print(f"[backtest] {params['threshold'].size:,} parameter sets x {bars['avg'].size:,} bars in {secs:.2f}s")
+
+    base = run(bars, {k: np.array([float(v)]) for k, v in DEFAULT_RULE.items()}, cost=args.cost, hold=args.hold)
+    print("[backtest] dashboard rule:", top(base, 1)[0])
+    for row in top(res, args.top):
+        print(row)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(top(res, params["threshold"].size), f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+# backend/batch.py
+"""
+Columnar storage for scored tweets.
+
+An analyze_topic() result used to hold one dict per tweet (id, text,
+score, label, created_at): about a kilobyte each, most of it object
+headers, and the result cache keeps hundreds of those results alive.
+ScoredBatch keeps the same data in typed arrays:
+
+  ids         int64 (X snowflake IDs); anything else goes to a small
+              interned table and is stored as a negative index into it
+  scores      float32 (scores carry 4 decimals, which float32 holds exactly
+              enough to round back)
+  labels      int8: -1 neg, 0 neu, 1 pos
+  created_at  int64 epoch milliseconds; strings that do not round-trip
+              through X's format are kept as they are
+  text        one UTF-8 buffer + an offsets array
+
+It behaves as a read-only sequence of the old dicts (len, indexing,
+iteration), built on demand, so callers and the JSON API see the same
+schema. batch[a:b] is a view over the same buffers (no copy);
+total() / counts() / aggregate() work on the arrays directly.
+
+Only the batch that owns the buffers can be extended (its views stay
+valid). While a scores()/labels() memoryview is alive the owner cannot
+grow (array raises BufferError), so release them before extending.
+"""
+from __future__ import annotations
+
+import math
+import sys
+import time
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+from backend.timeseries import parse_ts
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional; aggregates fall back to plain loops
+    np = None
+
+LABELS = ("neg", "neu", "pos")                  # label code + 1 -> name
+LABEL_CODES = {"neg": -1, "neu": 0, "pos": 1}
+FIELDS = ("id", "text", "score", "label", "created_at")
+SCORE_DIGITS = 4          # every scorer rounds to this (xai_client)
+_NO_ID = -(1 << 63)       # id None
+_NO_TS = -(1 << 63)       # created_at None
+_MAX_ID = (1 << 63) - 1
+
+_DAYS: Dict[int, str] = {}  # epoch day -> "2024-05-01T"
+
+def _fmt_ms(ms: int) -> str:
+    """Epoch ms -> X's created_at ("2024-05-01T12:00:00.000Z")."""
+    day, ms = divmod(ms, 86_400_000)
+    prefix = _DAYS.get(day)
+    if prefix is None:
+        prefix = _DAYS[day] = time.strftime("%Y-%m-%dT", time.gmtime(day * 86_400))
+    s, ms = divmod(ms, 1000)
+    return "%s%02d:%02d:%02d.%03dZ" % (prefix, s // 3600, s // 60 % 60, s % 60, ms)
+
+class ScoredBatch:
+    """Scored tweets in typed arrays; a read-only sequence of item dicts."""
+
+    __slots__ = ("_ids", "_id_names", "_id_codes", "_scores", "_labels", "_ts", "_ts_text",
+                 "_text", "_offsets", "_start", "_stop")
+
+    def __init__(self, items: Iterable[Dict] = ()):
+        self._ids = array("q")
+        self._id_names: List = []          # non-numeric ids, interned
+        self._id_codes: Dict = {}          # id -> index in _id_names
+        self._scores = array("f")
+        self._labels = array("b")
+        self._ts = array("q")
+        self._ts_text: Dict[int, str] = {}  # row -> created_at that epoch ms cannot reproduce
+        self._text = bytearray()
+        self._offsets = array("q", [0])
+        self._start = 0
+        self._stop: Optional[int] = None   # None: up to the end (the owning batch)
+        self.extend(items)
+
+    @classmethod
+    def from_items(cls, items: Iterable[Dict]) -> "ScoredBatch":
+        return cls(items)
+
+    # --- building ---
+    def _id_code(self, tweet_id) -> int:
+        if tweet_id is None:
+            return _NO_ID
+        if type(tweet_id) is str and tweet_id.isdigit() and (tweet_id == "0" or tweet_id[0] != "0"):
+            v = int(tweet_id)
+            if v <= _MAX_ID:
+                return v
+        code = self._id_codes.get(tweet_id)
+        if code is None:
+            code = self._id_codes[tweet_id] = len(self._id_names)
+            self._id_names.append(sys.intern(tweet_id) if type(tweet_id) is str else tweet_id)
+        return -(code + 1)
+
+    def append(self, tweet_id, text: str, score: float, label: str, created_at: Optional[str] = None):
+        if self._stop is not None:
+            raise TypeError("a ScoredBatch slice is read-only; extend the batch it was cut from")
+        row = len(self._scores)
+        self._ids.append(self._id_code(tweet_id))
+        self._scores.append(score)
+        self._labels.append(LABEL_CODES.get(label, 0))
+        if created_at is None:
+            self._ts.append(_NO_TS)
+        else:
+            ts = parse_ts(created_at)
+            ms = round(ts * 1000) if ts is not None else _NO_TS
+            self._ts.append(ms)
+            if ms == _NO_TS or _fmt_ms(ms) != created_at:
+                self._ts_text[row] = created_at
+        self._text += (text or "").encode("utf-8", "surrogatepass")
+        self._offsets.append(len(self._text))
+
+    def extend(self, items: Iterable[Dict]):
+        for it in items:
+            self.append(it.get("id"), it.get("text", "") or "", float(it["score"]), str(it["label"]),
+                        it.get("created_at"))
+
+    # --- sequence ---
+    def _bounds(self):
+        return self._start, (len(self._scores) if self._stop is None else self._stop)
+
+    def __len__(self) -> int:
+        a, b = self._bounds()
+        return b - a
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def __getitem__(self, key):
+        a, b = self._bounds()
+        if isinstance(key, slice):
+            start, stop, step = key.indices(b - a)
+            if step != 1:
+                raise ValueError("ScoredBatch slices must be contiguous")
+            view = ScoredBatch.__new__(ScoredBatch)
+            for name in self.__slots__:
+                setattr(view, name, getattr(self, name))
+            view._start, view._stop = a + start, a + max(start, stop)
+            return view
+        i = key + (b - a) if key < 0 else key
+        if not 0 <= i < b - a:
+            raise IndexError("ScoredBatch index out of range")
+        return self._row(a + i, FIELDS)
+
+    def __iter__(self) -> Iterator[Dict]:
+        for start in range(0, len(self), 256):  # dicts are built a block at a time
+            yield from self[start:start + 256].to_dicts()
+
+    def __repr__(self) -> str:
+        return f"<ScoredBatch n={len(self)} {self.nbytes()} bytes>"
+
+    # --- columns ---
+    def _id(self, r: int):
+        code = self._ids[r]
+        if code >= 0:
+            return str(code)
+        return None if code == _NO_ID else self._id_names[-code - 1]
+
+    def _created_at(self, r: int) -> Optional[str]:
+        text = self._ts_text.get(r)
+        if text is not None:
+            return text
+        ms = self._ts[r]
+        return None if ms == _NO_TS else _fmt_ms(ms)
+
+    def _text_at(self, r: int) -> str:
+        return self._text[self._offsets[r]:self._offsets[r + 1]].decode("utf-8", "surrogatepass")
+
+    def _row(self, r: int, fields: Sequence[str]) -> Dict:
+        out = {}
+        for f in fields:
+            if f == "id":
+                out["id"] = self._id(r)
+            elif f == "text":
+                out["text"] = self._text_at(r)
+            elif f == "score":
+                out["score"] = round(self._scores[r], SCORE_DIGITS)
+            elif f == "label":
+                out["label"] = LABELS[self._labels[r] + 1]
+            elif f == "created_at":
+                out["created_at"] = self._created_at(r)
+        return out
+
+    def scores(self) -> memoryview:
+        """float32 scores of this batch/view, without copying."""
+        a, b = self._bounds()
+        return memoryview(self._scores)[a:b]
+
+    def labels(self) -> memoryview:
+        """int8 label codes (-1 neg, 0 neu, 1 pos), without copying."""
+        a, b = self._bounds()
+        return memoryview(self._labels)[a:b]
+
+    # --- conversion ---
+    def column(self, field: str) -> List:
+        """One field for every row, as the dicts carry it."""
+        a, b = self._bounds()
+        if field == "id":
+            names = self._id_names
+            return [str(c) if c >= 0 else (None if c == _NO_ID else names[-c - 1]) for c in self._ids[a:b]]
+        if field == "text":
+            offsets = self._offsets[a:b + 1]
+            start = offsets[0]
+            raw = bytes(memoryview(self._text)[start:offsets[-1]])
+            whole = raw.decode("utf-8", "surrogatepass")
+            if len(whole) == len(raw):  # ASCII: byte offsets are character offsets
+                return [whole[o0 - start:o1 - start] for o0, o1 in zip(offsets, offsets[1:])]
+            return [raw[o0 - start:o1 - start].decode("utf-8", "surrogatepass") for o0, o1 in zip(offsets, offsets[1:])]
+        if field == "score":
+            if np is not None and b > a:
+                # exact: a float32 score is within 1e-7 of its 4-decimal value, so this matches round()
+                v = np.frombuffer(self._scores, dtype=np.float32, count=b - a, offset=a * 4).astype(np.float64)
+                return np.round(v, SCORE_DIGITS).tolist()
+            return [round(x, SCORE_DIGITS) for x in self._scores[a:b]]
+        if field == "label":
+            return [LABELS[c + 1] for c in self._labels[a:b]]
+        if field == "created_at":
+            if np is not None and b > a:
+                ms = np.frombuffer(self._ts, dtype=np.int64, count=b - a, offset=a * 8)
+                text = np.datetime_as_string(ms.astype("datetime64[ms]"), unit="ms").tolist()
+                out = [None if m == _NO_TS else t + "Z" for m, t in zip(ms.tolist(), text)]
+            else:
+                out = [None if ms == _NO_TS else _fmt_ms(ms) for ms in self._ts[a:b]]
+            for r, text in self._ts_text.items():
+                if a <= r < b:
+                    out[r - a] = text
+            return out
+        raise KeyError(field)
+
+    def to_dicts(self, fields: Sequence[str] = FIELDS) -> List[Dict]:
+        """The old item dicts (only `fields`, in that order); text is decoded only if asked for."""
+        fields = tuple(fields)
+        if fields == FIELDS:
+            return [{"id": i, "text": t, "score": s, "label": l, "created_at": c}
+                    for i, t, s, l, c in zip(*(self.column(f) for f in FIELDS))]
+        if not fields:
+            return [{} for _ in range(len(self))]
+        return [dict(zip(fields, row)) for row in zip(*(self.column(f) for f in fields))]
+
+    # --- aggregates ---
+    def total(self) -> float:
+        """Sum of the scores as the dicts carry them (rounded to SCORE_DIGITS)."""
+        a, b = self._bounds()
+        if np is not None and b > a:
+            v = np.frombuffer(self._scores, dtype=np.float32, count=b - a, offset=a * 4).astype(np.float64)
+            return math.fsum(np.round(v, SCORE_DIGITS))
+        return math.fsum(round(self._scores[r], SCORE_DIGITS) for r in range(a, b))
+
+    def counts(self) -> Dict[str, int]:
+        a, b = self._bounds()
+        if np is not None and b > a:
+            c = np.bincount(np.frombuffer(self._labels, dtype=np.int8, count=b - a, offset=a) + 1, minlength=3)
+            return {"pos": int(c[2]), "neg": int(c[0]), "neu": int(c[1])}
+        labels = self._labels[a:b]
+        return {"pos": labels.count(1), "neg": labels.count(-1), "neu": labels.count(0)}
+
+    def aggregate(self) -> Dict:
+        """{"n", "avg_score", "counts"} like aggregator.Tally.aggregate()."""
+        n = len(self)
+        return {"n": n, "avg_score": round(self.total() / n, 4) if n else 0.0, "counts": self.counts()}
+
+    def nbytes(self) -> int:
+        """Bytes held by the buffers (shared with any views)."""
+        arrays = (self._ids, self._scores, self._labels, self._ts, self._offsets)
+        return (sum(x.itemsize * len(x) for x in arrays) + len(self._text)
+                + sum(sys.getsizeof(s) for s in self._id_names) + sum(sys.getsizeof(s) for s in self._ts_text.values()))
+
+def json_default(obj):
+    """`default=` hook for json.dumps / orjson: a ScoredBatch is written as its list of dicts."""
+    if isinstance(obj, ScoredBatch):
+        return obj.to_dicts()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
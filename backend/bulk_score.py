@@ -0,0 +1,355 @@
+# backend/bulk_score.py
+"""
+Offline bulk scoring of tweet archives.
+
+Reads JSONL archives (one tweet per line: id, text, created_at and
+optionally the query it was collected for), scores every tweet with the
+active xai_client scorer on a process pool and writes a columnar dataset:
+
+  <out>/scores/part-<chunk>.parquet|npz   id, ts, query, score, label (-1/0/1)
+  <out>/aggregates.parquet|npz            per (query, time bucket): n, mean,
+                                          var, pos, neg, neu
+  <out>/summary.json
+
+Plain files are split into byte ranges that end on a newline; each worker
+maps its own range (mmap), so the parent never touches tweet text. Gzip
+files cannot be split that way: the parent decompresses them and ships
+chunks of --chunk-lines lines. At most 2 chunks per worker are in flight,
+so memory stays bounded whatever the archive size.
+
+Every finished chunk leaves its part file, its partial aggregates
+(agg-<chunk>.json) and a line in done.log. Re-running the same command
+skips the chunks already done and rebuilds the aggregates from the
+partials; --restart deletes the previous run's files (only the ones this
+tool writes, nothing else in --out).
+
+Parquet needs pyarrow; without it the parts are NumPy .npz files (load()
+reads either).
+
+Run:  python -m backend.bulk_score archive.jsonl.gz more/*.jsonl --out scored/ [--workers 8] [--bucket 3600]
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import mmap
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from backend.batch import LABEL_CODES
+from backend.timeseries import Bucket, parse_ts
+from backend.xai_client import get_scorer
+
+try:  # optional: ~2x faster line parsing
+    import orjson
+    _loads = orjson.loads
+except Exception:
+    _loads = json.loads
+
+try:  # optional: Parquet output
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = pq = None
+
+CHUNK_BYTES = 8 << 20      # plain files: bytes per chunk
+CHUNK_LINES = 50_000       # gzip files: lines per chunk
+
+# --- chunking (parent) ---
+def _is_gzip(path: str) -> bool:
+    with open(path, "rb") as f:
+        return f.read(2) == b"\x1f\x8b"
+
+def _ranges(path: str, chunk_bytes: int) -> Iterator[Tuple[int, int]]:
+    """(start, end) byte ranges of about chunk_bytes, each ending after a newline."""
+    size = os.path.getsize(path)
+    if not size:
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        start = 0
+        while start < size:
+            nl = mm.find(b"\n", min(size, start + chunk_bytes) - 1)
+            end = size if nl < 0 else nl + 1
+            yield start, end
+            start = end
+
+def _gzip_chunks(path: str, chunk_lines: int) -> Iterator[bytes]:
+    with gzip.open(path, "rb") as f:
+        buf: List[bytes] = []
+        for line in f:
+            buf.append(line)
+            if len(buf) >= chunk_lines:
+                yield b"".join(buf)
+                buf = []
+        if buf:
+            yield b"".join(buf)
+
+def chunks(paths: Sequence[str], chunk_bytes: int = CHUNK_BYTES, chunk_lines: int = CHUNK_LINES,
+           skip: Optional[set] = None) -> Iterator[Dict]:
+    """Work units in a stable order: {"id", "path", "range": (start, end)} or {"id", "path", "data"}."""
+    skip = skip or set()
+    for fi, path in enumerate(paths):
+        if _is_gzip(path):
+            for k, data in enumerate(_gzip_chunks(path, chunk_lines)):
+                cid = f"{fi:03d}-{k:06d}"
+                if cid not in skip:
+                    yield {"id": cid, "path": path, "data": data}
+        else:
+            for k, rng in enumerate(_ranges(path, chunk_bytes)):
+                cid = f"{fi:03d}-{k:06d}"
+                if cid not in skip:
+                    yield {"id": cid, "path": path, "range": rng}
+
+# --- scoring (workers) ---
+def _read(chunk: Dict) -> bytes:
+    if "data" in chunk:
+        return chunk["data"]
+    start, end = chunk["range"]
+    with open(chunk["path"], "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        return mm[start:end]
+
+def _ts(t: Dict) -> float:
+    v = t.get("created_at", t.get("ts"))
+    if isinstance(v, (int, float)):
+        return float(v)
+    ts = parse_ts(v) if isinstance(v, str) else None
+    return float("nan") if ts is None else ts
+
+def _partials(query: np.ndarray, ts: np.ndarray, score: np.ndarray, label: np.ndarray,
+              bucket_s: int) -> List[list]:
+    """[query, bucket index, n, mean, m2, pos, neg, neu] per (query, bucket) in this chunk; undated tweets skipped."""
+    dated = ~np.isnan(ts)
+    if not dated.any():
+        return []
+    q, b, s, lab = query[dated], np.floor(ts[dated] / bucket_s).astype(np.int64), score[dated].astype(np.float64), label[dated]
+    names, qi = np.unique(q, return_inverse=True)
+    keys, inv = np.unique(np.stack([qi, b], axis=1), axis=0, return_inverse=True)
+    inv = inv.reshape(-1)
+    m = len(keys)
+    n = np.bincount(inv, minlength=m)
+    mean = np.bincount(inv, weights=s, minlength=m) / n
+    m2 = np.bincount(inv, weights=(s - mean[inv]) ** 2, minlength=m)
+    pos, neg = (np.bincount(inv, weights=lab == c, minlength=m) for c in (1, -1))
+    return [[str(names[k[0]]), int(k[1]), int(n[i]), float(mean[i]), float(m2[i]),
+             int(pos[i]), int(neg[i]), int(n[i] - pos[i] - neg[i])] for i, k in enumerate(keys)]
+
+def score_chunk(chunk: Dict, out_dir: str, fmt: str, bucket_s: int, query_field: str,
+                default_query: str) -> Dict:
+    """Parse, score and write one chunk; returns {"id", "rows", "bad", "partials"}."""
+    ids, texts, tss, queries = [], [], [], []
+    bad = 0
+    for line in _read(chunk).splitlines():
+        if not line.strip():
+            continue
+        try:
+            t = _loads(line)
+            text = t.get("text") or t.get("full_text") or ""
+        except Exception:
+            bad += 1
+            continue
+        ids.append(str(t.get("id", "")))
+        texts.append(text)
+        tss.append(_ts(t))
+        queries.append(str(t.get(query_field) or default_query))
+
+    scored = get_scorer().score(texts) if texts else []
+    cols = {
+        "id": np.array(ids, dtype=str),
+        "ts": np.array(tss, dtype=np.float64),
+        "query": np.array(queries, dtype=str),
+        "score": np.array([s["score"] for s in scored], dtype=np.float32),
+        "label": np.array([LABEL_CODES.get(s["label"], 0) for s in scored], dtype=np.int8),
+    }
+    write_table(os.path.join(out_dir, "scores", f"part-{chunk['id']}.{fmt}"), cols, fmt)
+    partials = _partials(cols["query"], cols["ts"], cols["score"], cols["label"], bucket_s)
+    _write_json(os.path.join(out_dir, "scores", f"agg-{chunk['id']}.json"), partials)
+    return {"id": chunk["id"], "rows": len(ids), "bad": bad, "partials": partials}
+
+# --- output ---
+def _write_json(path: str, obj):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+def write_table(path: str, cols: Dict[str, np.ndarray], fmt: str):
+    """One columnar file, written under a temporary name and renamed (a crash never leaves half a part)."""
+    tmp = path + ".tmp"
+    if fmt == "parquet":
+        pq.write_table(pa.table({k: pa.array(v) for k, v in cols.items()}), tmp)
+    else:
+        with open(tmp, "wb") as f:
+            np.savez(f, **cols)
+    os.replace(tmp, path)
+
+def load(path: str) -> Dict[str, np.ndarray]:
+    """Columns of a .parquet / .npz file, or of every part in a directory (concatenated)."""
+    if os.path.isdir(path):
+        parts = sorted(os.path.join(path, p) for p in os.listdir(path) if p.endswith((".parquet", ".npz")))
+        tables = [load(p) for p in parts]
+        if not tables:
+            return {}
+        return {k: np.concatenate([t[k] for t in tables]) for k in tables[0]}
+    if path.endswith(".parquet"):
+        table = pq.read_table(path)
+        return {k: table.column(k).to_numpy() for k in table.column_names}
+    with np.load(path) as z:
+        return {k: z[k] for k in z.files}
+
+def _aggregate_columns(buckets: Dict[Tuple[str, int], Bucket], bucket_s: int) -> Dict[str, np.ndarray]:
+    keys = sorted(buckets)
+    bs = [buckets[k] for k in keys]
+    return {
+        "query": np.array([k[0] for k in keys], dtype=str),
+        "bucket_start": np.array([k[1] * bucket_s for k in keys], dtype=np.int64),
+        "n": np.array([b.n for b in bs], dtype=np.int64),
+        "mean": np.array([b.mean for b in bs], dtype=np.float64),
+        "var": np.array([b.m2 / b.n if b.n else 0.0 for b in bs], dtype=np.float64),  # population variance
+        "pos": np.array([b.pos for b in bs], dtype=np.int64),
+        "neg": np.array([b.neg for b in bs], dtype=np.int64),
+        "neu": np.array([b.neu for b in bs], dtype=np.int64),
+    }
+
+def _merge(buckets: Dict[Tuple[str, int], Bucket], partials: List[list]):
+    for query, index, n, mean, m2, pos, neg, neu in partials:
+        part = Bucket(index)
+        part.n, part.mean, part.m2, part.pos, part.neg, part.neu = n, mean, m2, pos, neg, neu
+        b = buckets.get((query, index))
+        if b is None:
+            buckets[(query, index)] = part
+        else:
+            b.merge(part)
+
+# --- driver ---
+def _manifest(paths: Sequence[str], chunk_bytes: int, chunk_lines: int, bucket_s: int, fmt: str,
+              query_field: str, default_query: str) -> Dict:
+    """What a resumed run must share with the first one for its chunk ids to mean the same thing."""
+    return {
+        "files": [{"path": os.path.abspath(p), "size": os.path.getsize(p), "mtime": int(os.path.getmtime(p))} for p in paths],
+        "chunk_bytes": chunk_bytes,
+        "chunk_lines": chunk_lines,
+        "bucket_s": bucket_s,
+        "format": fmt,
+        "query_field": query_field,
+        "default_query": default_query,
+        "scorer": get_scorer().name,
+    }
+
+_PART_RE = re.compile(r"^(?:part-\d{3}-\d{6}\.(?:parquet|npz)|agg-\d{3}-\d{6}\.json)(?:\.tmp)?$")
+
+def _clear(out_dir: str):
+    """Delete a previous run's files from out_dir; anything bulk_score did not write stays."""
+    for name in ("manifest.json", "done.log", "summary.json", "aggregates.parquet", "aggregates.npz"):
+        for path in (os.path.join(out_dir, name), os.path.join(out_dir, name + ".tmp")):
+            if os.path.isfile(path):
+                os.remove(path)
+    scores = os.path.join(out_dir, "scores")
+    if os.path.isdir(scores):
+        for name in os.listdir(scores):
+            if _PART_RE.match(name):
+                os.remove(os.path.join(scores, name))
+        if not os.listdir(scores):
+            os.rmdir(scores)
+
+def run(paths: Sequence[str], out_dir: str, workers: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES,
+        chunk_lines: int = CHUNK_LINES, bucket_s: int = 3600, fmt: Optional[str] = None,
+        query_field: str = "query", default_query: Optional[str] = None, restart: bool = False) -> Dict:
+    """Score every archive into out_dir (resuming a previous run of the same job); returns the summary."""
+    fmt = fmt or ("parquet" if pq is not None else "npz")
+    if fmt == "parquet" and pq is None:
+        raise RuntimeError("Parquet output needs pyarrow (pip install pyarrow), or use --format npz")
+    workers = max(1, workers or os.cpu_count() or 1)
+    default_query = default_query or ""
+
+    manifest = _manifest(paths, chunk_bytes, chunk_lines, bucket_s, fmt, query_field, default_query)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    done_path = os.path.join(out_dir, "done.log")
+    if restart and os.path.isdir(out_dir):
+        _clear(out_dir)
+    done = set()
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding="utf-8") as f:
+            if json.load(f) != manifest:
+                raise RuntimeError(f"{out_dir} holds a different job (inputs, chunking, query settings or scorer changed); "
+                                   "use --restart")
+        if os.path.exists(done_path):
+            with open(done_path, encoding="utf-8") as f:
+                done = {line.strip() for line in f if line.strip()}
+    os.makedirs(os.path.join(out_dir, "scores"), exist_ok=True)
+    _write_json(manifest_path, manifest)
+
+    buckets: Dict[Tuple[str, int], Bucket] = {}
+    for cid in sorted(done):
+        with open(os.path.join(out_dir, "scores", f"agg-{cid}.json"), encoding="utf-8") as f:
+            _merge(buckets, json.load(f))
+    if done:
+        print(f"[bulk_score] resuming: {len(done)} chunks already done")
+
+    t0 = time.perf_counter()
+    rows = bad = finished = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, open(done_path, "a", encoding="utf-8") as log:
+        pending = set()
+
+        def collect(futures):
+            nonlocal rows, bad, finished
+            for fut in futures:
+                res = fut.result()
+                rows += res["rows"]
+                bad += res["bad"]
+                finished += 1
+                _merge(buckets, res["partials"])
+                log.write(res["id"] + "\n")
+                log.flush()
+
+        for chunk in chunks(paths, chunk_bytes, chunk_lines, skip=done):
+            if len(pending) >= 2 * workers:
+                ready, pending = wait(pending, return_when=FIRST_COMPLETED)
+                collect(ready)
+            pending.add(pool.submit(score_chunk, chunk, out_dir, fmt, bucket_s, query_field, default_query))
+        collect(wait(pending)[0])
+    secs = time.perf_counter() - t0
+
+    write_table(os.path.join(out_dir, f"aggregates.{fmt}"), _aggregate_columns(buckets, bucket_s), fmt)
+    summary = {
+        "rows": rows,
+        "bad_lines": bad,
+        "chunks": finished,
+        "chunks_resumed": len(done),
+        "aggregate_rows": len(buckets),
+        "workers": workers,
+        "seconds": round(secs, 3),
+        "rows_per_s": round(rows / secs, 1) if secs > 0 else None,
+        "format": fmt,
+    }
+    _write_json(os.path.join(out_dir, "summary.json"), summary)
+    return summary
+
+def main(argv: Optional[Sequence[str]] = None):
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("archives", nargs="+", help="JSONL files, plain or gzip")
+    ap.add_argument("--out", required=True, help="output directory (re-run to resume)")
+    ap.add_argument("--workers", type=int, default=None, help="processes (default: CPU count)")
+    ap.add_argument("--chunk-mb", type=float, default=CHUNK_BYTES / (1 << 20), help="plain files: MB per chunk")
+    ap.add_argument("--chunk-lines", type=int, default=CHUNK_LINES, help="gzip files: lines per chunk")
+    ap.add_argument("--bucket", type=int, default=3600, help="aggregate bucket width in seconds")
+    ap.add_argument("--format", choices=["parquet", "npz"], default=None, help="default: parquet if pyarrow is installed")
+    ap.add_argument("--query-field", default="query", help="tweet field naming its query")
+    ap.add_argument("--query", default="", help="query for tweets without --query-field")
+    ap.add_argument("--restart", action="store_true", help="discard a previous run in --out")
+    args = ap.parse_args(argv)
+
+    summary = run(args.archives, args.out, workers=args.workers, chunk_bytes=int(args.chunk_mb * (1 << 20)),
+                  chunk_lines=args.chunk_lines, bucket_s=args.bucket, fmt=args.format,
+                  query_field=args.query_field, default_query=args.query, restart=args.restart)
+    print(f"[bulk_score] {summary['rows']:,} tweets in {summary['seconds']:.1f}s "
+          f"({summary['rows_per_s'] or 0:,.0f}/s, {summary['workers']} workers) -> {args.out}")
+    print("[bulk_score]", summary)
+
+if __name__ == "__main__":
+    main()
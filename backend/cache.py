@@ -0,0 +1,162 @@
+# backend/cache.py
+"""
+Result cache for analyze_topic().
+
+  - TTL + bounded size with LRU eviction (in-process)
+  - single-flight: concurrent identical requests await one upstream fetch
+  - optional shared SQLite tier (XSENT_CACHE_DB) so several uvicorn workers
+    reuse each other's results
+
+Cached responses carry {"cache": {"hit", "age_s", "ttl_s"}}.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+from backend.aggregator import analyze_topic_async
+from backend.batch import ScoredBatch, json_default
+from backend.metrics import counter
+
+CACHE_TTL_S = float(os.getenv("XSENT_CACHE_TTL", "30"))
+CACHE_MAX_ITEMS = int(os.getenv("XSENT_CACHE_SIZE", "256"))
+CACHE_DB = os.getenv("XSENT_CACHE_DB", "").strip()  # e.g. /tmp/xsent_cache.db
+
+CACHE_LOOKUPS = counter("xsent_cache_lookups_total", "Sentiment cache lookups by result (hit, shared_hit, coalesced, miss).", ["result"])
+
+class _SharedStore:
+    """SQLite key/value tier shared by processes on the same host."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        with self._conn() as c:
+            c.execute("CREATE TABLE IF NOT EXISTS sentiment_cache (k TEXT PRIMARY KEY, stored_at REAL, v TEXT)")
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            c.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = c
+        return c
+
+    def get(self, key: str, ttl: float) -> Optional[Tuple[float, Dict]]:
+        row = self._conn().execute(
+            "SELECT stored_at, v FROM sentiment_cache WHERE k = ? AND stored_at >= ?",
+            (key, time.time() - ttl),
+        ).fetchone()
+        if not row:
+            return None
+        value = json.loads(row[1])
+        if isinstance(value.get("items"), list):
+            value["items"] = ScoredBatch(value["items"])
+        return row[0], value
+
+    def put(self, key: str, stored_at: float, value: Dict, ttl: float):
+        c = self._conn()
+        c.execute("INSERT OR REPLACE INTO sentiment_cache (k, stored_at, v) VALUES (?, ?, ?)",
+                  (key, stored_at, json.dumps(value, default=json_default)))
+        c.execute("DELETE FROM sentiment_cache WHERE stored_at < ?", (time.time() - 10 * ttl,))
+
+class SentimentCache:
+    def __init__(self, ttl: float = CACHE_TTL_S, max_items: int = CACHE_MAX_ITEMS, shared_path: str = CACHE_DB):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.shared = _SharedStore(shared_path) if shared_path else None
+        self._items: "OrderedDict[Hashable, Tuple[float, Dict]]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.hits = self.misses = self.coalesced = 0
+
+    def _get_local(self, key: Hashable) -> Optional[Tuple[float, Dict]]:
+        entry = self._items.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl:
+            del self._items[key]
+            return None
+        self._items.move_to_end(key)
+        return entry
+
+    def _put_local(self, key: Hashable, stored_at: float, value: Dict):
+        self._items[key] = (stored_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def _tagged(self, entry: Tuple[float, Dict], hit: bool) -> Dict:
+        stored_at, value = entry
+        out = dict(value)
+        out["cache"] = {"hit": hit, "age_s": round(max(0.0, time.time() - stored_at), 3), "ttl_s": self.ttl}
+        return out
+
+    async def get_or_compute(self, key: Hashable, compute: Callable[[], Awaitable[Dict]]) -> Dict:
+        entry = self._get_local(key)
+        if entry is not None:
+            self.hits += 1
+            CACHE_LOOKUPS.inc(result="hit")
+            return self._tagged(entry, True)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self.coalesced += 1
+            CACHE_LOOKUPS.inc(result="coalesced")
+            entry, _ = await asyncio.shield(task)
+            return self._tagged(entry, True)
+
+        # The fill runs in its own task: a caller that is cancelled (client gone)
+        # stops waiting, but the fill carries on for everyone else sharing the key.
+        task = asyncio.ensure_future(self._fill(key, compute))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # nobody left waiting: don't warn
+        entry, hit = await asyncio.shield(task)
+        return self._tagged(entry, hit)
+
+    async def _fill(self, key: Hashable, compute: Callable[[], Awaitable[Dict]]) -> Tuple[Tuple[float, Dict], bool]:
+        """(entry, came from the shared tier) for a key missing locally; stored in both tiers."""
+        try:
+            entry = None
+            if self.shared:
+                entry = await asyncio.to_thread(self.shared.get, json.dumps(key), self.ttl)
+            hit = entry is not None
+            if hit:
+                self.hits += 1
+                CACHE_LOOKUPS.inc(result="shared_hit")
+            else:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result="miss")
+                value = await compute()
+                entry = (time.time(), value)
+                if self.shared:
+                    await asyncio.to_thread(self.shared.put, json.dumps(key), entry[0], value, self.ttl)
+            self._put_local(key, *entry)
+            return entry, hit
+        finally:
+            self._inflight.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {
+            "items": len(self._items),
+            "max_items": self.max_items,
+            "ttl_s": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "shared": self.shared.path if self.shared else None,
+        }
+
+sentiment_cache = SentimentCache()
+
+async def analyze_topic_cached(query: str, max_results: int = 20, lang: str = "en") -> Dict:
+    """analyze_topic_async() behind sentiment_cache, keyed by (query, max_results, lang)."""
+    key = (query, int(max_results), lang)
+    return await sentiment_cache.get_or_compute(
+        key, lambda: analyze_topic_async(query, max_results=max_results, lang=lang)
+    )
@@ -0,0 +1,210 @@
+# backend/dedup.py
+"""
+Retweet / copy-paste / bot-flood filter that sits between fetching and
+scoring.
+
+Each tweet is reduced to its canonical words (no "RT @user:" prefix, links,
+mentions, case or punctuation). Then:
+
+  - exact duplicates: same canonical words -> dropped
+  - near duplicates: MinHash signature of the word set (32 hashes), indexed
+    by LSH in 8 bands of 4. Tweets sharing a band are candidates; a
+    candidate is a match when its signatures agree on at least
+    DEDUP_SIMILARITY of the hashes (estimated Jaccard similarity).
+    A pair at Jaccard s becomes a candidate with probability
+    1 - (1 - s^4)^8: ~89% at the default 0.7, ~98.5% at 0.8.
+
+The first tweet of a cluster is kept (and scored); later members only bump
+its count. Memory is bounded by a sliding window of the newest
+DEDUP_WINDOW clusters.
+
+XSENT_DEDUP=0 turns the filter off (tweets are still counted).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import random
+import re
+import struct
+import zlib
+from collections import deque
+from itertools import chain
+from typing import Deque, Dict, List, Optional
+
+try:
+    import numpy as np
+except Exception:  # numpy is optional; signatures fall back to a Python loop
+    np = None
+
+DEDUP_ENABLED = os.getenv("XSENT_DEDUP", "1") == "1"
+DEDUP_WINDOW = int(os.getenv("XSENT_DEDUP_WINDOW", "10000"))          # clusters remembered
+DEDUP_SIMILARITY = float(os.getenv("XSENT_DEDUP_SIMILARITY", "0.7"))  # min estimated Jaccard
+MIN_NEAR_WORDS = 4  # shorter texts are only matched exactly; a word or two is too little to compare
+
+_HASHES = 32
+_BANDS = 8
+_ROWS = _HASHES // _BANDS
+_MASK64 = (1 << 64) - 1
+# Multiply-shift hash family: h_i(x) = ((a_i * x + b_i) mod 2^64) >> 32
+_rng = random.Random(20240521)
+_A = [_rng.getrandbits(64) | 1 for _ in range(_HASHES)]
+_B = [_rng.getrandbits(64) for _ in range(_HASHES)]
+_EMPTY = b""
+
+_noise_re = re.compile(r"^rt @\w+:|https?://\S+|@\w+")
+_word_re = re.compile(r"\w+")
+
+def canonical_words(text: str) -> List[str]:
+    return _word_re.findall(_noise_re.sub(" ", (text or "").lower()))
+
+def exact_key(words: List[str]) -> bytes:
+    """8-byte digest of the canonical words; stable across processes (unlike hash())."""
+    return hashlib.sha1(" ".join(words).encode("utf-8", "surrogatepass")).digest()[:8]
+
+def signatures(word_sets: List[List[str]]) -> List[bytes]:
+    """MinHash signature per word list as _HASHES packed uint32 (b"" for an empty list)."""
+    # crc32 rather than hash(): str hashes are salted per process, and every
+    # worker should collapse the same tweets
+    hashed = [{zlib.crc32(x.encode("utf-8", "surrogatepass")) for x in w} for w in word_sets]
+    if np is None:
+        return [_signature_py(h) for h in hashed]
+    lens = np.fromiter(map(len, hashed), dtype=np.int64, count=len(hashed))
+    out = [_EMPTY] * len(hashed)
+    nonempty = np.flatnonzero(lens)
+    if nonempty.size:
+        flat = np.fromiter(chain.from_iterable(hashed), dtype=np.uint64, count=int(lens.sum()))
+        a = np.array(_A, dtype=np.uint64)
+        b = np.array(_B, dtype=np.uint64)
+        with np.errstate(over="ignore"):
+            mixed = ((flat[:, None] * a + b) >> np.uint64(32)).astype(np.uint32)  # (words, _HASHES)
+        starts = np.concatenate(([0], np.cumsum(lens)[:-1]))[nonempty]
+        mins = np.minimum.reduceat(mixed, starts, axis=0)
+        for i, row in zip(nonempty.tolist(), mins):
+            out[i] = row.tobytes()
+    return out
+
+def _signature_py(hashed) -> bytes:
+    if not hashed:
+        return _EMPTY
+    mins = [min((((a * x + b) & _MASK64) >> 32) for x in hashed) for a, b in zip(_A, _B)]
+    return struct.pack(f"<{_HASHES}I", *mins)
+
+def similarity(sig_a: bytes, sig_b: bytes) -> float:
+    """Fraction of agreeing MinHash values, an estimate of Jaccard similarity."""
+    same = sum(x == y for x, y in zip(struct.iter_unpack("<I", sig_a), struct.iter_unpack("<I", sig_b)))
+    return same / _HASHES
+
+def _band_keys(sig: bytes) -> List[bytes]:
+    step = _ROWS * 4
+    return [sig[i:i + step] for i in range(0, len(sig), step)]
+
+class _Cluster:
+    __slots__ = ("id", "text", "size", "exact", "sig")
+
+    def __init__(self, item_id, text: str, exact: bytes, sig: bytes):
+        self.id = item_id
+        self.text = text
+        self.size = 1
+        self.exact = exact
+        self.sig = sig
+
+class Deduper:
+    """
+    Stateful filter for one analysis (or one long-running stream).
+    filter() returns the items that start a new cluster, in order.
+    """
+
+    def __init__(self, window: int = DEDUP_WINDOW, min_similarity: float = DEDUP_SIMILARITY,
+                 enabled: bool = DEDUP_ENABLED):
+        self.window = max(1, window)
+        self.min_similarity = min_similarity
+        self.enabled = enabled
+        self.seen = self.kept = self.exact = self.near = 0
+        self._clusters: Deque[_Cluster] = deque()
+        self._by_exact: Dict[bytes, _Cluster] = {}
+        self._bands: List[Dict[bytes, List[_Cluster]]] = [{} for _ in range(_BANDS)]
+
+    def filter(self, items: List[Dict]) -> List[Dict]:
+        return self._process(items, count=True)
+
+    def page(self, page: Dict) -> Dict:
+        """A fetched page with only its new-cluster items."""
+        return {**page, "items": self.filter(page.get("items", []) or [])}
+
+    def seed(self, items: List[Dict]):
+        """Remember already-scored tweets (e.g. the stored window) without counting them."""
+        self._process(items, count=False)
+
+    def _process(self, items: List[Dict], count: bool) -> List[Dict]:
+        if count:
+            self.seen += len(items)
+        if not self.enabled:
+            if count:
+                self.kept += len(items)
+            return list(items)
+
+        words = [canonical_words(t.get("text", "")) for t in items]
+        sigs = signatures([w if len(w) >= MIN_NEAR_WORDS else [] for w in words])
+        kept = []
+        for item, w, sig in zip(items, words, sigs):
+            if not w:
+                kept.append(item)  # nothing to compare (links/emoji only)
+                continue
+            exact = exact_key(w)
+            c = self._by_exact.get(exact)
+            if c is not None:
+                c.size += 1
+                self.exact += count
+                continue
+            c = self._match(sig) if sig else None
+            if c is not None:
+                c.size += 1
+                self.near += count
+                continue
+            self._add(_Cluster(item.get("id"), item.get("text", "") or "", exact, sig))
+            kept.append(item)
+        if count:
+            self.kept += len(kept)
+        return kept
+
+    def _match(self, sig: bytes) -> Optional[_Cluster]:
+        checked = set()
+        for index, key in zip(self._bands, _band_keys(sig)):
+            for c in index.get(key, ()):
+                if id(c) not in checked:
+                    checked.add(id(c))
+                    if similarity(c.sig, sig) >= self.min_similarity:
+                        return c
+        return None
+
+    def _add(self, c: _Cluster):
+        self._clusters.append(c)
+        self._by_exact[c.exact] = c
+        if c.sig:
+            for index, key in zip(self._bands, _band_keys(c.sig)):
+                index.setdefault(key, []).append(c)
+        if len(self._clusters) > self.window:
+            self._evict(self._clusters.popleft())
+
+    def _evict(self, c: _Cluster):
+        if self._by_exact.get(c.exact) is c:
+            del self._by_exact[c.exact]
+        if c.sig:
+            for index, key in zip(self._bands, _band_keys(c.sig)):
+                bucket = index.get(key)
+                if bucket:
+                    bucket.remove(c)
+                    if not bucket:
+                        del index[key]
+
+    def report(self, top: int = 10) -> Dict:
+        """Counters plus the `top` largest clusters still in the window."""
+        clusters = sorted((c for c in self._clusters if c.size > 1), key=lambda c: c.size, reverse=True)[:top]
+        return {
+            "seen": self.seen,
+            "kept": self.kept,
+            "exact": self.exact,
+            "near": self.near,
+            "clusters": [{"id": c.id, "size": c.size, "text": c.text[:140]} for c in clusters],
+        }
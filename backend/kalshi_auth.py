@@ -1,18 +1,29 @@
 # backend/kalshi_auth.py
-import os, time, base64, requests
-from typing import Optional, Dict, Any      # ← add
-from urllib.parse import urlsplit
+import os, time, base64, threading, uuid, requests
+from typing import Optional, Dict, Any, Iterator, List
+from urllib.parse import urlencode, urlsplit
+from requests.adapters import HTTPAdapter
 from cryptography.hazmat.primitives import hashes, serialization
 from cryptography.hazmat.primitives.asymmetric import padding, rsa
 from cryptography.hazmat.backends import default_backend
+from backend.metrics import counter, observe_stage, stage
 
 KALSHI_BASE = os.getenv("KALSHI_HOST", "https://api.elections.kalshi.com").rstrip("/")
 KALSHI_KEY_ID = os.getenv("KALSHI_API_KEY_ID", "").strip()
 KALSHI_PRIVATE_KEY_PATH = os.getenv("KALSHI_PRIVATE_KEY", "kalpr.txt")
+# How often (seconds) the client stats the key file to pick up a rolled key
+KALSHI_KEY_CHECK_S = float(os.getenv("KALSHI_KEY_CHECK_S", "1.0"))
+KALSHI_POOL_SIZE = int(os.getenv("KALSHI_POOL_SIZE", "10"))
 
-def _load_private_key():
-    with open(KALSHI_PRIVATE_KEY_PATH, "rb") as f:
-        return serialization.load_pem_private_key(f.read(), password=None, backend=default_backend())
+KALSHI_REQUESTS = counter("xsent_kalshi_requests_total", "Signed Kalshi calls by method and status (error = no response).",
+                          ["method", "status"])
+
+def _load_private_key(path: str = KALSHI_PRIVATE_KEY_PATH) -> rsa.RSAPrivateKey:
+    with open(path, "rb") as f:
+        key = serialization.load_pem_private_key(f.read(), password=None, backend=default_backend())
+    if not isinstance(key, rsa.RSAPrivateKey):
+        raise ValueError(f"Kalshi key at {path} is not an RSA private key")
+    return key
 
 def _sign_pss_text(priv: rsa.RSAPrivateKey, text: str) -> str:
     sig = priv.sign(
@@ -22,40 +33,161 @@ def _sign_pss_text(priv: rsa.RSAPrivateKey, text: str) -> str:
     )
     return base64.b64encode(sig).decode("utf-8")
 
+class KalshiClient:
+    """
+    Signed Kalshi API client.
+      - the RSA key is parsed once and reloaded only when the file's mtime changes
+      - requests go through one keep-alive requests.Session (pooled connections)
+      - per-request signing latency is tracked, see signing_stats()
+    """
+
+    def __init__(self, base: str = KALSHI_BASE, key_id: str = KALSHI_KEY_ID,
+                 key_path: str = KALSHI_PRIVATE_KEY_PATH, pool_size: int = KALSHI_POOL_SIZE):
+        self.base = base.rstrip("/")
+        self.key_id = key_id
+        self.key_path = key_path
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._key: Optional[rsa.RSAPrivateKey] = None
+        self._key_mtime: Optional[float] = None
+        self._key_checked = 0.0
+        self.key_reloads = 0
+
+        self._sign_n = 0
+        self._sign_total_ms = 0.0
+        self._sign_last_ms = 0.0
+        self._sign_max_ms = 0.0
+
+    # --- key handling ---
+    def private_key(self) -> rsa.RSAPrivateKey:
+        now = time.monotonic()
+        if self._key is not None and now - self._key_checked < KALSHI_KEY_CHECK_S:
+            return self._key
+        with self._lock:
+            mtime = os.stat(self.key_path).st_mtime
+            if self._key is None or mtime != self._key_mtime:
+                self._key = _load_private_key(self.key_path)
+                self._key_mtime = mtime
+                self.key_reloads += 1
+            self._key_checked = now
+            return self._key
+
+    # --- signing ---
+    def signed_headers(self, method: str, full_url: str) -> Dict[str, str]:
+        t0 = time.perf_counter()
+        ts_ms = str(int(time.time() * 1000))
+        path_only = urlsplit(full_url).path                  # sign PATH ONLY
+        msg = ts_ms + method.upper() + path_only
+        sig = _sign_pss_text(self.private_key(), msg)
+        elapsed = time.perf_counter() - t0
+        self._record_sign(elapsed * 1000.0)
+        observe_stage("kalshi_sign", elapsed)
+        return {
+            "KALSHI-ACCESS-KEY": self.key_id,
+            "KALSHI-ACCESS-TIMESTAMP": ts_ms,
+            "KALSHI-ACCESS-SIGNATURE": sig,
+            "Content-Type": "application/json",
+        }
+
+    def _record_sign(self, ms: float):
+        with self._lock:
+            self._sign_n += 1
+            self._sign_total_ms += ms
+            self._sign_last_ms = ms
+            self._sign_max_ms = max(self._sign_max_ms, ms)
+
+    def signing_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            n = self._sign_n
+            return {
+                "count": n,
+                "last_ms": round(self._sign_last_ms, 3),
+                "avg_ms": round(self._sign_total_ms / n, 3) if n else 0.0,
+                "max_ms": round(self._sign_max_ms, 3),
+                "key_reloads": self.key_reloads,
+            }
+
+    # --- HTTP ---
+    def request(self, method: str, path: str, json_body: Optional[Dict[str, Any]] = None, timeout: int = 20):
+        if not path.startswith("/"):
+            path = "/" + path
+        url = f"{self.base}{path}"
+        with stage("kalshi_request"):
+            headers = self.signed_headers(method, url)
+            try:
+                r = self.session.request(method, url, headers=headers, json=json_body, timeout=timeout)
+            except Exception:
+                KALSHI_REQUESTS.inc(method=method.upper(), status="error")
+                raise
+            KALSHI_REQUESTS.inc(method=method.upper(), status=r.status_code)
+            r.raise_for_status()
+            return r.json()
+
+    def close(self):
+        self.session.close()
+
+_client: Optional[KalshiClient] = None
+_client_lock = threading.Lock()
+
+def get_client() -> KalshiClient:
+    """Process-wide KalshiClient, created on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = KalshiClient()
+    return _client
+
 def _signed_headers(method: str, full_url: str) -> Dict[str, str]:
-    ts_ms = str(int(time.time() * 1000))
-    path_only = urlsplit(full_url).path                  # sign PATH ONLY
-    msg = ts_ms + method.upper() + path_only
-    sig = _sign_pss_text(_load_private_key(), msg)
-    return {
-        "KALSHI-ACCESS-KEY": KALSHI_KEY_ID,
-        "KALSHI-ACCESS-TIMESTAMP": ts_ms,
-        "KALSHI-ACCESS-SIGNATURE": sig,
-        "Content-Type": "application/json",
-    }
+    return get_client().signed_headers(method, full_url)
+
+def kalshi_request(method: str, path: str, json_body: Optional[Dict[str, Any]] = None, timeout: int = 20):
+    return get_client().request(method, path, json_body=json_body, timeout=timeout)
 
-def kalshi_request(method: str, path: str, json_body: Optional[Dict[str, Any]] = None, timeout: int = 20):  # ← change
-    if not path.startswith("/"):
-        path = "/" + path
-    url = f"{KALSHI_BASE}{path}"
-    headers = _signed_headers(method, url)
-    r = requests.request(method, url, headers=headers, json=json_body, timeout=timeout)
-    r.raise_for_status()
-    return r.json()
+def iter_market_pages(status: str = "open", limit: int = 1000, **filters) -> Iterator[List[Dict[str, Any]]]:
+    """Yields each page of markets, following Kalshi's `cursor` until it runs out."""
+    cursor = None
+    while True:
+        params = {"status": status, "limit": limit, **filters}
+        if cursor:
+            params["cursor"] = cursor
+        data = kalshi_request("GET", "/trade-api/v2/markets?" + urlencode(params))
+        yield data.get("markets", []) or []
+        cursor = data.get("cursor")
+        if not cursor:
+            return
 
 def list_open_markets():
-    return kalshi_request("GET", "/trade-api/v2/markets?filter[status]=OPEN")
+    """All open markets, across every page."""
+    markets: List[Dict[str, Any]] = []
+    for page in iter_market_pages():
+        markets.extend(page)
+    return {"markets": markets}
 
 def get_balance():
     return kalshi_request("GET", "/trade-api/v2/portfolio/balances")
 
-def place_order(market_ticker: str, side: str, price: int, quantity: int):
-    body = {
+def new_client_order_id() -> str:
+    return uuid.uuid4().hex
+
+def order_body(market_ticker: str, side: str, price: int, quantity: int,
+               client_order_id: Optional[str] = None) -> Dict[str, Any]:
+    """Limit-order body; client_order_id (new uuid if not given) lets a retry be recognised as one."""
+    return {
         "ticker": market_ticker,
         "type": "limit",
         "side": side.lower(),
         "price": int(price),
         "count": int(quantity),
         "time_in_force": "gtc",
+        "client_order_id": client_order_id or new_client_order_id(),
     }
+
+def place_order(market_ticker: str, side: str, price: int, quantity: int, client_order_id: Optional[str] = None):
+    body = order_body(market_ticker, side, price, quantity, client_order_id)
     return kalshi_request("POST", "/trade-api/v2/portfolio/orders", json_body=body)
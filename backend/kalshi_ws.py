@@ -0,0 +1,353 @@
+# backend/kalshi_ws.py
+"""
+Live Kalshi market data over the trade API websocket.
+
+Subscribes the `orderbook_delta` and `ticker` channels for a set of
+tickers. The handshake is signed like every REST call (timestamp + "GET" +
+"/trade-api/ws/v2", RSA-PSS, see kalshi_auth).
+
+Each market keeps a compact book: one 100-slot int array per side (resting
+YES bids and NO bids, indexed by price in cents) plus the best price of
+each side, so applying a delta and reading best bid/ask are O(1) (a level
+emptying at the top scans down to the next one).
+
+Order-book messages carry a per-subscription `seq`. When one is skipped,
+the books of that subscription are marked stale and the subscription is
+dropped and re-made, which makes Kalshi send fresh snapshots. After a
+reconnect every book is re-snapshotted the same way.
+
+quote(ticker) is a plain dict read for the signal / order code; it falls
+back to the ticker channel's bid/ask while no book is available.
+
+Env:
+  KALSHI_WS_URL       default: KALSHI_HOST with ws(s):// and /trade-api/ws/v2
+  KALSHI_WS_TICKERS   comma-separated tickers to subscribe at startup
+  KALSHI_WS_MAX_BACKOFF  longest wait between reconnects (30s)
+  KALSHI_WS_PRICE_MAX_AGE  oldest book update price_for() will quote
+                           from, in seconds (10)
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import time
+import traceback
+from array import array
+from typing import Dict, Iterable, List, Optional, Set
+
+from backend.kalshi_auth import KALSHI_BASE, get_client
+from backend.metrics import counter
+
+try:  # optional: ~2x faster message decoding
+    import orjson
+    _loads = orjson.loads
+except Exception:
+    _loads = json.loads
+
+try:
+    import websockets
+    try:
+        from websockets.asyncio.client import connect as _ws_connect  # websockets >= 13
+        _HEADERS_KW = "additional_headers"
+    except Exception:
+        from websockets import connect as _ws_connect
+        _HEADERS_KW = "extra_headers"
+except Exception:  # websockets is optional; the feed stays off without it
+    websockets = None
+
+WS_PATH = "/trade-api/ws/v2"
+KALSHI_WS_URL = os.getenv("KALSHI_WS_URL", KALSHI_BASE.replace("https://", "wss://", 1).replace("http://", "ws://", 1) + WS_PATH)
+KALSHI_WS_TICKERS = [t.strip() for t in os.getenv("KALSHI_WS_TICKERS", "").split(",") if t.strip()]
+KALSHI_WS_MAX_BACKOFF = float(os.getenv("KALSHI_WS_MAX_BACKOFF", "30"))
+KALSHI_WS_PRICE_MAX_AGE = float(os.getenv("KALSHI_WS_PRICE_MAX_AGE", "10"))
+
+LEVELS = 100  # prices 1..99 cents; slot 0 unused
+
+class OrderBook:
+    """Resting YES and NO bids for one market, by price in cents."""
+
+    __slots__ = ("ticker", "yes", "no", "best_yes", "best_no", "stale", "updated_at",
+                 "last_price", "tick_bid", "tick_ask", "volume")
+
+    def __init__(self, ticker: str):
+        self.ticker = ticker
+        self.yes = array("q", bytes(8 * LEVELS))
+        self.no = array("q", bytes(8 * LEVELS))
+        self.best_yes = self.best_no = 0  # 0 = side empty
+        self.stale = True                 # no snapshot since (re)subscribing
+        self.updated_at = 0.0
+        self.last_price = self.tick_bid = self.tick_ask = self.volume = None
+
+    def snapshot(self, yes: Iterable, no: Iterable):
+        for side, levels in ((self.yes, yes), (self.no, no)):
+            side[:] = array("q", bytes(8 * LEVELS))
+            for price, qty in levels or ():
+                if 0 < price < LEVELS and qty > 0:
+                    side[price] = qty
+        self.best_yes = self._top(self.yes, LEVELS - 1)
+        self.best_no = self._top(self.no, LEVELS - 1)
+        self.stale = False
+        self.updated_at = time.time()
+
+    @staticmethod
+    def _top(side: array, start: int) -> int:
+        for p in range(start, 0, -1):
+            if side[p] > 0:
+                return p
+        return 0
+
+    def delta(self, side: str, price: int, delta: int):
+        if not 0 < price < LEVELS:
+            return
+        if side == "yes":
+            levels, best = self.yes, self.best_yes
+        else:
+            levels, best = self.no, self.best_no
+        qty = levels[price] + delta
+        if qty <= 0:
+            qty = 0
+        levels[price] = qty
+        if qty and price > best:
+            best = price
+        elif not qty and price == best:
+            best = self._top(levels, price - 1)
+        if side == "yes":
+            self.best_yes = best
+        else:
+            self.best_no = best
+        self.updated_at = time.time()
+
+    def quote(self) -> Dict:
+        """Best YES/NO bid and ask in cents (a NO bid at p is a YES ask at 100 - p)."""
+        if self.stale:
+            yes_bid, yes_ask = self.tick_bid, self.tick_ask
+            yes_bid_size = yes_ask_size = None
+        else:
+            by, bn = self.best_yes, self.best_no
+            yes_bid, yes_ask = by or None, (LEVELS - bn) if bn else None
+            yes_bid_size = self.yes[by] if by else 0
+            yes_ask_size = self.no[bn] if bn else 0
+        return {
+            "ticker": self.ticker,
+            "yes_bid": yes_bid,
+            "yes_ask": yes_ask,
+            "no_bid": (LEVELS - yes_ask) if yes_ask else None,
+            "no_ask": (LEVELS - yes_bid) if yes_bid else None,
+            "yes_bid_size": yes_bid_size,
+            "yes_ask_size": yes_ask_size,
+            "last_price": self.last_price,
+            "source": "ticker" if self.stale else "book",
+            "age_s": round(time.time() - self.updated_at, 3) if self.updated_at else None,
+        }
+
+    def levels(self, depth: int = 10) -> Dict:
+        """Top `depth` price levels per side, best first."""
+        def side(levels: array, best: int) -> List[List[int]]:
+            out = []
+            for p in range(best, 0, -1):
+                if levels[p]:
+                    out.append([p, levels[p]])
+                    if len(out) == depth:
+                        break
+            return out
+        return {"yes": side(self.yes, self.best_yes), "no": side(self.no, self.best_no)}
+
+class MarketFeed:
+    """One websocket connection, books for every subscribed ticker."""
+
+    def __init__(self, url: str = KALSHI_WS_URL, max_backoff: float = KALSHI_WS_MAX_BACKOFF, client=None):
+        self.url = url
+        self.max_backoff = max_backoff
+        self._client = client
+        self.tickers: Set[str] = set()
+        self.books: Dict[str, OrderBook] = {}
+        self.stats = {"messages": 0, "snapshots": 0, "deltas": 0, "ticker_updates": 0, "gaps": 0,
+                      "resyncs": 0, "reconnects": 0, "errors": 0}
+        self.connected = False
+        self._ws = None
+        self._task: Optional[asyncio.Task] = None
+        self._cmd_id = 0
+        self._pending: Dict[int, List[str]] = {}   # command id -> tickers it subscribed
+        self._sid_tickers: Dict[int, List[str]] = {}  # orderbook_delta sid -> its tickers
+        self._seq: Dict[int, int] = {}
+
+    # --- reads ---
+    def quote(self, ticker: str) -> Optional[Dict]:
+        book = self.books.get(ticker)
+        return book.quote() if book is not None else None
+
+    def price_for(self, ticker: str, side: str, max_age: float = KALSHI_WS_PRICE_MAX_AGE) -> Optional[int]:
+        """
+        Price (cents) that crosses the book now: the YES ask to buy, the NO ask
+        to sell. None unless the feed is connected and the book is live (not
+        stale, updated within `max_age` seconds); ticker-channel prices may
+        predate a disconnect, so they are never used here.
+        """
+        book = self.books.get(ticker)
+        if not self.connected or book is None or book.stale or time.time() - book.updated_at > max_age:
+            return None
+        q = book.quote()
+        return q["yes_ask"] if side.lower() == "buy" else q["no_ask"]
+
+    def book(self, ticker: str, depth: int = 10) -> Optional[Dict]:
+        b = self.books.get(ticker)
+        if b is None:
+            return None
+        return {**b.quote(), **b.levels(depth)}
+
+    # --- message handling ---
+    def handle(self, raw) -> None:
+        """Apply one websocket message (str/bytes JSON, or an already decoded dict)."""
+        msg = _loads(raw) if isinstance(raw, (str, bytes)) else raw
+        self.stats["messages"] += 1
+        kind = msg.get("type")
+        if kind == "orderbook_delta" or kind == "orderbook_snapshot":
+            sid = msg.get("sid")
+            seq = msg.get("seq")
+            if sid not in self._sid_tickers:
+                return  # from a subscription we already dropped
+            if seq is not None:
+                last = self._seq.get(sid)
+                if kind == "orderbook_delta" and last is not None and seq != last + 1:
+                    self._gap(sid)
+                    return
+                self._seq[sid] = seq
+            body = msg["msg"]
+            book = self.books.get(body.get("market_ticker"))
+            if book is None:
+                return
+            if kind == "orderbook_delta":
+                if not book.stale:
+                    book.delta(body["side"], body["price"], body["delta"])
+                    self.stats["deltas"] += 1
+            else:
+                book.snapshot(body.get("yes"), body.get("no"))
+                self.stats["snapshots"] += 1
+        elif kind == "ticker":
+            body = msg["msg"]
+            book = self.books.get(body.get("market_ticker"))
+            if book is not None:
+                book.last_price = body.get("price", book.last_price)
+                book.tick_bid = body.get("yes_bid", book.tick_bid)
+                book.tick_ask = body.get("yes_ask", book.tick_ask)
+                book.volume = body.get("volume", book.volume)
+                if book.stale:
+                    book.updated_at = time.time()
+                self.stats["ticker_updates"] += 1
+        elif kind == "subscribed":
+            body = msg.get("msg") or {}
+            tickers = self._pending.get(msg.get("id"))
+            if body.get("channel") == "orderbook_delta" and tickers is not None:
+                self._sid_tickers[body["sid"]] = tickers
+        elif kind == "error":
+            self.stats["errors"] += 1
+            print(f"[kalshi_ws] error: {msg.get('msg')}")
+
+    def _gap(self, sid: int):
+        """A seq was skipped: forget the subscription (its later messages are ignored) and re-make it."""
+        self.stats["gaps"] += 1
+        tickers = self._sid_tickers.pop(sid, [])
+        self._seq.pop(sid, None)
+        for t in tickers:
+            book = self.books.get(t)
+            if book is not None:
+                book.stale = True
+        if self._ws is not None:
+            asyncio.ensure_future(self._resync(sid, tickers))
+
+    async def _resync(self, sid: int, tickers: List[str]):
+        try:
+            await self._send("unsubscribe", {"sids": [sid]})
+            if tickers:
+                await self._send("subscribe", {"channels": ["orderbook_delta"], "market_tickers": tickers}, tickers)
+            self.stats["resyncs"] += 1
+        except Exception as e:
+            print(f"[kalshi_ws] resync failed: {type(e).__name__}: {e}")
+
+    # --- connection ---
+    async def _send(self, cmd: str, params: Dict, tickers: Optional[List[str]] = None):
+        self._cmd_id += 1
+        if tickers is not None:
+            self._pending[self._cmd_id] = tickers
+        await self._ws.send(json.dumps({"id": self._cmd_id, "cmd": cmd, "params": params}))
+
+    def _auth_headers(self) -> Dict[str, str]:
+        client = self._client or get_client()
+        headers = client.signed_headers("GET", self.url)
+        headers.pop("Content-Type", None)
+        return headers
+
+    async def subscribe(self, tickers: Iterable[str]) -> List[str]:
+        """Start tracking `tickers` (connects on first use); returns the newly added ones."""
+        new = sorted(set(tickers) - self.tickers)
+        for t in new:
+            self.tickers.add(t)
+            self.books[t] = OrderBook(t)
+        self.start()
+        if new and self._ws is not None:
+            await self._send("subscribe", {"channels": ["orderbook_delta", "ticker"], "market_tickers": new}, new)
+        return new
+
+    async def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                async with _ws_connect(self.url, **{_HEADERS_KW: self._auth_headers()}) as ws:
+                    self._ws, self.connected, delay = ws, True, 1.0
+                    self._pending.clear()
+                    self._sid_tickers.clear()
+                    self._seq.clear()
+                    for b in self.books.values():
+                        b.stale = True
+                    print(f"[kalshi_ws] connected to {self.url}; {len(self.tickers)} tickers")
+                    if self.tickers:
+                        tickers = sorted(self.tickers)
+                        await self._send("subscribe", {"channels": ["orderbook_delta", "ticker"],
+                                                       "market_tickers": tickers}, tickers)
+                    async for raw in ws:
+                        try:
+                            self.handle(raw)
+                        except Exception:
+                            self.stats["errors"] += 1
+                            traceback.print_exc()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                msg = (str(e).splitlines() or [""])[0]
+                print(f"[kalshi_ws] connection lost: {type(e).__name__}: {msg}; retrying in {delay:.0f}s")
+            finally:
+                self._ws, self.connected = None, False
+            self.stats["reconnects"] += 1
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_backoff)
+
+    def start(self):
+        if websockets is None:
+            print("[kalshi_ws] WARNING: `websockets` is not installed; live market data is off.")
+            return
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def state(self) -> Dict:
+        return {
+            "url": self.url,
+            "connected": self.connected,
+            "tickers": len(self.tickers),
+            "stale_books": sum(b.stale for b in self.books.values()),
+            "subscriptions": len(self._sid_tickers),
+            **self.stats,
+        }
+
+market_feed = MarketFeed()
+
+counter("xsent_ws_messages_total", "Kalshi websocket messages handled, by kind.", ["kind"],
+        fn=lambda: {(k,): market_feed.stats[k] for k in ("snapshots", "deltas", "ticker_updates")})
+counter("xsent_ws_gaps_total", "Order-book sequence gaps (each triggers a re-snapshot).",
+        fn=lambda: {(): market_feed.stats["gaps"]})
@@ -0,0 +1,234 @@
+# backend/lexicon.py
+"""
+Compiled sentiment lexicon.
+
+Entries are weighted words, multi-word phrases ("to the moon", "rug pull")
+and full emoji sequences ("❤️", "👍🏽", "🧑‍🚀"), plus negators. A lexicon is
+compiled once into:
+
+  - a token table: token bytes -> token id, with per-id arrays for the
+    single-token entry it stands for and whether a phrase can start there
+  - a token-level trie for phrases (nested dicts, one level per token)
+
+Matching a text is a single left-to-right scan: the tokenizer regex walks
+the bytes once, single tokens resolve by table lookup, and only positions
+flagged as phrase starts walk the trie (leftmost-longest match wins).
+
+Texts are tokenized as lowercased UTF-8 bytes. Emoji variation selectors
+(U+FE0F) are dropped first, so "❤" and "❤️" are the same token.
+
+Lexicon files are UTF-8 TSV, one `term<TAB>weight` per line, where weight
+is a float or the word NEGATOR; lines starting with `#` are comments.
+Compiled lexicons are pickled to a private per-user directory
+(<tmp>/xsent-<uid>, mode 0700) and reused while the source files are
+unchanged. The cache is only read when that directory and the file belong
+to the current user and nobody else can write them; otherwise it is skipped.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import pickle
+import re
+import stat
+import tempfile
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+NEGATOR = "NEGATOR"
+
+_VS16 = b"\xef\xb8\x8f"  # U+FE0F, emoji presentation selector
+
+# One UTF-8 codepoint from the emoji blocks we treat as emoji bases
+_EMOJI_BASE = (
+    rb"(?:\xF0\x9F[\x80-\xAB][\x80-\xBF]"      # U+1F000-U+1FAFF
+    rb"|\xE2[\x98-\x9E][\x80-\xBF]"            # U+2600-U+27BF (misc symbols, dingbats: ❤ ☀ ✅)
+    rb"|\xE2\xAD[\x90-\x95]"                   # U+2B50-U+2B55 (⭐ ⭕)
+    rb"|\xE2\x8C[\x9A\x9B]|\xE2\x8F[\xA9-\xBA])"  # ⌚⌛ ⏩-⏺
+)
+_EMOJI_MOD = rb"(?:\xF0\x9F\x8F[\xBB-\xBF]|\xE2\x83\xA3|\xF3\xA0[\x80-\x81][\x80-\xBF])"  # skin tone, keycap, tags
+_ZWJ = rb"\xE2\x80\x8D"
+_EMOJI_SEQ = _EMOJI_BASE + _EMOJI_MOD + rb"*(?:" + _ZWJ + _EMOJI_BASE + _EMOJI_MOD + rb"*)*"
+# Words keep inner apostrophes (straight or ’) so "don't" is one token
+_WORD = rb"[a-z0-9_]+(?:(?:'|\xE2\x80\x99)[a-z0-9_]+)*"
+
+SEP = b"\x00"  # text separator inside a batch
+token_re = re.compile(_WORD + rb"|" + _EMOJI_SEQ + rb"|\x00")
+
+def prepare(text: str) -> bytes:
+    """Lowercased UTF-8 bytes with variation selectors removed."""
+    return (text or "").encode("utf-8", "surrogatepass").lower().replace(_VS16, b"")
+
+def tokenize(text: str) -> List[bytes]:
+    return token_re.findall(prepare(text).replace(SEP, b" "))
+
+def _norm_term(term: str) -> Tuple[bytes, ...]:
+    return tuple(t.replace("’".encode(), b"'") for t in tokenize(term))
+
+class Lexicon:
+    """
+    Compiled lexicon. Entry 0 is "no entry"; weight > 0 positive, < 0
+    negative, 0 neutral (a phrase that just shadows its words).
+    """
+
+    def __init__(self, entries: Dict[str, object]):
+        self.weights: List[float] = [0.0]
+        self.negator: List[bool] = [False]
+        self.terms: List[str] = [""]
+        self.token_ids: Dict[bytes, int] = {SEP: 1}
+        self.tok_entry: List[int] = [0, 0]         # token id -> single-token entry
+        self.tok_phrase: List[bool] = [False, False]  # token id -> may start a phrase
+        self.tok_sep: List[bool] = [False, True]
+        self.trie: Dict[bytes, dict] = {}
+        self.max_phrase = 1
+
+        for term, value in entries.items():
+            toks = _norm_term(term)
+            if not toks:
+                continue
+            curly = tuple(t.replace(b"'", b"\xe2\x80\x99") for t in toks)
+            entry = len(self.weights)
+            self.terms.append(term)
+            if value == NEGATOR:
+                self.weights.append(0.0)
+                self.negator.append(True)
+            else:
+                self.weights.append(float(value))
+                self.negator.append(False)
+            for variant in {toks, curly}:  # straight and curly apostrophe spellings
+                if len(variant) == 1:
+                    self.tok_entry[self._tid(variant[0])] = entry
+                else:
+                    self.tok_phrase[self._tid(variant[0])] = True
+                    node = self.trie
+                    for t in variant:
+                        node = node.setdefault(t, {})
+                    node[None] = entry
+                    self.max_phrase = max(self.max_phrase, len(variant))
+
+    def _tid(self, tok: bytes) -> int:
+        tid = self.token_ids.get(tok)
+        if tid is None:
+            tid = self.token_ids[tok] = len(self.tok_entry)
+            self.tok_entry.append(0)
+            self.tok_phrase.append(False)
+            self.tok_sep.append(False)
+        return tid
+
+    def __len__(self) -> int:
+        return len(self.weights) - 1
+
+    def phrase_at(self, toks: Sequence[bytes], i: int) -> Tuple[int, int]:
+        """Longest phrase starting at toks[i]: (entry, n_tokens) or (0, 0)."""
+        node, best, n = self.trie, (0, 0), 0
+        for j in range(i, min(len(toks), i + self.max_phrase)):
+            node = node.get(toks[j])
+            if node is None:
+                break
+            n += 1
+            if None in node:
+                best = (node[None], n)
+        return best
+
+    def match(self, text: str) -> List[int]:
+        """Entry ids matched in `text`, in order (leftmost-longest)."""
+        toks = tokenize(text)
+        get, tok_entry, tok_phrase = self.token_ids.get, self.tok_entry, self.tok_phrase
+        out, i = [], 0
+        while i < len(toks):
+            tid = get(toks[i], 0)
+            if tid and tok_phrase[tid]:
+                entry, n = self.phrase_at(toks, i)
+                if n:
+                    out.append(entry)
+                    i += n
+                    continue
+            if tid and tok_entry[tid]:
+                out.append(tok_entry[tid])
+            i += 1
+        return out
+
+# --- loading ---
+def read_tsv(path: str) -> Dict[str, object]:
+    entries: Dict[str, object] = {}
+    with open(path, encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            term, _, value = line.rpartition("\t")
+            if not term:
+                raise ValueError(f"{path}:{n}: expected 'term<TAB>weight'")
+            entries[term.strip()] = NEGATOR if value.strip().upper() == NEGATOR else float(value)
+    return entries
+
+def _private(st: os.stat_result) -> bool:
+    """Owned by us and not writable by group/others."""
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+def _cache_dir() -> Optional[str]:
+    """<tmp>/xsent-<uid>, created 0700; None if it is not ours alone (or no uids on this OS)."""
+    if not hasattr(os, "getuid"):
+        return None
+    d = os.path.join(tempfile.gettempdir(), f"xsent-{os.getuid()}")
+    try:
+        os.mkdir(d, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    st = os.lstat(d)  # lstat: a planted symlink is not a directory
+    if not stat.S_ISDIR(st.st_mode) or not _private(st) or st.st_mode & stat.S_IRWXO:
+        print(f"[lexicon] not caching: {d} is not a private directory of this user")
+        return None
+    return d
+
+def _cache_path(paths: Sequence[str], builtin: Dict[str, object]) -> Optional[str]:
+    d = _cache_dir()
+    if d is None:
+        return None
+    h = hashlib.sha1(repr(sorted(builtin.items(), key=lambda kv: kv[0])).encode())
+    for p in paths:
+        st = os.stat(p)
+        h.update(f"{os.path.abspath(p)}|{st.st_mtime_ns}|{st.st_size}".encode())
+    return os.path.join(d, f"lexicon-{h.hexdigest()[:16]}.pkl")
+
+def _read_cache(path: str) -> Optional["Lexicon"]:
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, "O_NOFOLLOW", 0))
+    except OSError:
+        return None
+    with os.fdopen(fd, "rb") as f:
+        if not _private(os.fstat(f.fileno())):
+            return None
+        return pickle.load(f)
+
+def load(builtin: Dict[str, object], paths: Iterable[str] = (), use_cache: bool = True) -> Lexicon:
+    """
+    Compile `builtin` entries plus any TSV files (later files override).
+    The compiled result is cached (pickled, in a private per-user dir) and
+    reused while the files are unchanged.
+    """
+    paths = [p for p in paths if p]
+    cache: Optional[str] = _cache_path(paths, builtin) if (use_cache and paths) else None
+    if cache:
+        try:
+            lex = _read_cache(cache)
+            if lex is not None:
+                return lex
+        except Exception:
+            pass  # stale/corrupt cache: rebuild
+
+    entries = dict(builtin)
+    for p in paths:
+        entries.update(read_tsv(p))
+    lex = Lexicon(entries)
+
+    if cache:
+        try:
+            tmp = cache + f".{os.getpid()}"
+            with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_NOFOLLOW", 0), 0o600), "wb") as f:
+                pickle.dump(lex, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, cache)
+        except OSError:
+            pass
+    return lex
@@ -0,0 +1,253 @@
+# backend/market_catalog.py
+"""
+Local, indexed catalog of open Kalshi markets.
+
+A background task walks every page of /markets (Kalshi `cursor`) and upserts
+each page into the catalog as it arrives, re-indexing only markets whose
+title/event changed; markets that were not seen in a full pass are dropped. Lookups never touch Kalshi:
+
+  by_ticker   ticker -> market
+  by_event    event_ticker -> {tickers}
+  by_series   series ticker -> {tickers}
+  tokens      lowercase title/subtitle word -> {tickers}
+
+Env:
+  XSENT_CATALOG_REFRESH  seconds between full refresh passes (60)
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import heapq
+import os
+import re
+import threading
+import time
+import traceback
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+from backend.kalshi_auth import iter_market_pages
+
+CATALOG_REFRESH_S = float(os.getenv("XSENT_CATALOG_REFRESH", "60"))
+
+_token_re = re.compile(r"[a-z0-9]+")
+
+def tokenize(text: str) -> List[str]:
+    return _token_re.findall((text or "").lower())
+
+def series_of(m: Dict) -> str:
+    return m.get("series_ticker") or (m.get("event_ticker") or "").split("-", 1)[0]
+
+def _fingerprint(m: Dict) -> tuple:
+    """Fields that affect the indexes; unchanged markets are not re-indexed."""
+    return (m.get("title"), m.get("subtitle"), m.get("event_ticker"), series_of(m))
+
+def _rank(m: Dict) -> float:
+    return float(m.get("volume_24h") or m.get("volume") or 0)
+
+class MarketCatalog:
+    def __init__(self, refresh_s: float = CATALOG_REFRESH_S):
+        self.refresh_s = refresh_s
+        self.by_ticker: Dict[str, Dict] = {}
+        self.by_event: Dict[str, Set[str]] = {}
+        self.by_series: Dict[str, Set[str]] = {}
+        self.tokens: Dict[str, Set[str]] = {}
+        self._sorted_tokens: List[str] = []
+        self._fp: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._ranked: List[str] = []   # all tickers, highest volume first
+        self.listeners: List[Callable[["MarketCatalog"], None]] = []  # run after each full pass
+        self.refreshed_at = 0.0
+        self.last_pass_s = 0.0
+        self.passes = 0
+        self.errors = 0
+
+    # --- index maintenance ---
+    def _unindex(self, ticker: str):
+        m = self.by_ticker.pop(ticker, None)
+        if m is None:
+            return
+        for idx, key in ((self.by_event, m.get("event_ticker")), (self.by_series, series_of(m))):
+            s = idx.get(key)
+            if s is not None:
+                s.discard(ticker)
+                if not s:
+                    del idx[key]
+        for tok in set(tokenize(m.get("title", "")) + tokenize(m.get("subtitle", ""))):
+            s = self.tokens.get(tok)
+            if s is not None:
+                s.discard(ticker)
+                if not s:
+                    del self.tokens[tok]
+        self._fp.pop(ticker, None)
+
+    def _index(self, m: Dict):
+        t = m["ticker"]
+        self.by_ticker[t] = m
+        self._fp[t] = _fingerprint(m)
+        if m.get("event_ticker"):
+            self.by_event.setdefault(m["event_ticker"], set()).add(t)
+        if series_of(m):
+            self.by_series.setdefault(series_of(m), set()).add(t)
+        for tok in set(tokenize(m.get("title", "")) + tokenize(m.get("subtitle", "")) + tokenize(t)):
+            self.tokens.setdefault(tok, set()).add(t)
+
+    def upsert(self, markets: Iterable[Dict]) -> int:
+        """Add or update markets; returns how many needed re-indexing."""
+        changed = 0
+        with self._lock:
+            for m in markets:
+                t = m.get("ticker")
+                if not t:
+                    continue
+                if self._fp.get(t) == _fingerprint(m):
+                    self.by_ticker[t] = m  # prices etc. moved; indexes unchanged
+                    continue
+                self._unindex(t)
+                self._index(m)
+                changed += 1
+            if changed:
+                self._sorted_tokens = sorted(self.tokens)
+        return changed
+
+    def retain(self, tickers: Set[str]) -> int:
+        """Drop markets not in `tickers` (closed since the last pass)."""
+        with self._lock:
+            gone = [t for t in self.by_ticker if t not in tickers]
+            for t in gone:
+                self._unindex(t)
+            if gone:
+                self._sorted_tokens = sorted(self.tokens)
+        return len(gone)
+
+    # --- lookups ---
+    def _prefix(self, prefix: str) -> Set[str]:
+        out: Set[str] = set()
+        toks = self._sorted_tokens
+        i = bisect.bisect_left(toks, prefix)
+        while i < len(toks) and toks[i].startswith(prefix):
+            out |= self.tokens[toks[i]]
+            i += 1
+            if len(out) > 5000:  # very short prefixes; good enough for a search box
+                break
+        return out
+
+    def search(self, search: str = "", limit: int = 50, event: str = "", series: str = "") -> Dict:
+        """
+        Markets matching every search word (the last word may be a prefix),
+        optionally restricted to an event or series; highest volume first.
+        """
+        limit = max(1, int(limit))
+        with self._lock:
+            sets: List[Set[str]] = []
+            if event:
+                sets.append(self.by_event.get(event, set()))
+            if series:
+                sets.append(self.by_series.get(series, set()))
+            words = tokenize(search)
+            for i, w in enumerate(words):
+                exact = self.tokens.get(w, set())
+                sets.append(self._prefix(w) if i == len(words) - 1 else exact)
+
+            # the ranking is rebuilt after each full pass; mid-pass it may be stale
+            ranked_ok = len(self._ranked) == len(self.by_ticker)
+            if not sets:
+                if ranked_ok:
+                    top = [self.by_ticker[t] for t in self._ranked[:limit] if t in self.by_ticker]
+                else:
+                    top = heapq.nlargest(limit, self.by_ticker.values(), key=_rank)
+                return {"markets": top, "total": len(self.by_ticker)}
+
+            sets.sort(key=len)
+            hits = sets[0].intersection(*sets[1:])
+            if ranked_ok and len(hits) > 20 * limit:
+                # dense result: walking the volume ranking finds the top hits sooner
+                top = []
+                for t in self._ranked:
+                    if t in hits:
+                        top.append(self.by_ticker[t])
+                        if len(top) == limit:
+                            break
+            else:
+                top = heapq.nlargest(limit, (self.by_ticker[t] for t in hits), key=_rank)
+            return {"markets": top, "total": len(hits)}
+
+    def get(self, ticker: str) -> Optional[Dict]:
+        return self.by_ticker.get(ticker)
+
+    def markets(self) -> List[Dict]:
+        with self._lock:
+            return list(self.by_ticker.values())
+
+    # --- refresh ---
+    def refresh(self) -> Dict:
+        """One full pass over Kalshi's pages (blocking)."""
+        t0 = time.perf_counter()
+        seen: Set[str] = set()
+        changed = 0
+        for page in iter_market_pages():
+            changed += self.upsert(page)
+            seen.update(m["ticker"] for m in page if m.get("ticker"))
+        removed = self.retain(seen)
+        with self._lock:
+            self._ranked = sorted(self.by_ticker, key=lambda t: _rank(self.by_ticker[t]), reverse=True)
+        self.refreshed_at = time.time()
+        self.last_pass_s = time.perf_counter() - t0
+        for fn in self.listeners:
+            fn(self)
+        self.passes += 1
+        return {"seen": len(seen), "changed": changed, "removed": removed}
+
+    async def _run(self):
+        while True:
+            try:
+                stats = await asyncio.to_thread(self.refresh)
+                print(f"[catalog] refresh: {stats} in {self.last_pass_s:.2f}s")
+            except Exception:
+                self.errors += 1
+                traceback.print_exc()
+            finally:
+                self._ready.set()  # don't keep readers waiting on a failed pass
+            await asyncio.sleep(self.refresh_s)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def ensure_started(self, timeout: float = 15.0):
+        """Start refreshing on first use and wait (bounded) for the first full pass."""
+        self.start()
+        if not self.passes:
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def failed(self) -> bool:
+        """True while no refresh pass has succeeded and at least one has failed."""
+        return self.passes == 0 and self.errors > 0
+
+    def state(self) -> Dict:
+        return {
+            "markets": len(self.by_ticker),
+            "events": len(self.by_event),
+            "series": len(self.by_series),
+            "tokens": len(self.tokens),
+            "refreshed_at": self.refreshed_at,
+            "last_pass_s": round(self.last_pass_s, 3),
+            "passes": self.passes,
+            "errors": self.errors,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+catalog = MarketCatalog()
@@ -0,0 +1,233 @@
+# backend/market_matcher.py
+"""
+Market -> X query matcher.
+
+For every open market we precompute a short X query from its title,
+subtitle and series code. Terms are chosen per event (the words most of the
+event's markets share, so strikes and dates drop out); the two most
+specific ones (rarest across events) are AND-ed, without retweets. The same
+terms drive an inverted index used to route tweets back to markets: each
+event is filed under its rarest term only, so routing a tweet is one pass
+over its tokens plus a subset check for the few events anchored on them.
+
+That lets many markets share one X search and one scoring pass: fetch with
+the OR of their queries, score each tweet once, then route it to every
+market whose terms it contains.
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import re
+import threading
+from collections import Counter
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set
+
+from backend.aggregator import Tally
+from backend.dedup import Deduper
+from backend.market_catalog import MarketCatalog, series_of, tokenize
+from backend.x_fetcher import afetch_recent_tweets
+from backend.xai_client import ascore_texts
+
+MAX_TERMS = 2  # AND-ed; more terms make the X search too narrow
+X_QUERY_MAX = 490  # Recent Search allows 512; leave room for "( ) lang:xx"
+
+STOPWORDS = set("""
+a an and any are as at be been before between by did do does during end ending for from has have how
+if in into is it its least less many market more most much next no not of on or over than that the
+their then this to under what when which who will with without yes above below
+jan feb mar apr may jun jul aug sep sept oct nov dec january february march april june july august
+september october november december week month year today tomorrow day
+""".split())
+
+_num_re = re.compile(r"^\d+$")
+
+def _terms(text: str) -> List[str]:
+    return [t for t in tokenize(text) if t not in STOPWORDS and len(t) > 1 and not _num_re.match(t)]
+
+def _series_term(m: Dict) -> Optional[str]:
+    """Short alphabetic series codes (KXBTC -> btc) make good cashtag-ish terms."""
+    code = series_of(m).lower()
+    if code.startswith("kx"):
+        code = code[2:]
+    return code if code.isalpha() and 2 < len(code) <= 6 else None
+
+class MarketQuery:
+    __slots__ = ("ticker", "event", "terms", "query")
+
+    def __init__(self, ticker: str, event: str, terms: List[str]):
+        self.ticker = ticker
+        self.event = event
+        self.terms = terms
+        self.query = " ".join(terms) + " -is:retweet"
+
+    def info(self) -> Dict:
+        return {"ticker": self.ticker, "event": self.event, "query": self.query, "terms": self.terms}
+
+class _Index:
+    """
+    One catalog's queries and routing tables. Never modified after it is
+    built: rebuild() (on the catalog's worker thread) swaps in a new one with
+    a single assignment, so readers on the event loop always see a
+    consistent set without taking a lock.
+    """
+    __slots__ = ("queries", "required", "anchors", "event_tickers")
+
+    def __init__(self, queries: Dict[str, MarketQuery], required: Dict[str, FrozenSet[str]],
+                 anchors: Dict[str, List[str]], event_tickers: Dict[str, List[str]]):
+        self.queries = queries              # ticker -> query
+        self.required = required            # event -> terms
+        self.anchors = anchors              # rarest term -> events
+        self.event_tickers = event_tickers  # event -> tickers
+
+def _route(index: _Index, tokens: Set[str], only: Optional[Set[str]]) -> List[str]:
+    hits = []
+    for tok in tokens:
+        for ev in index.anchors.get(tok, ()):
+            if index.required[ev] <= tokens:
+                hits.extend(t for t in index.event_tickers[ev] if only is None or t in only)
+    return hits
+
+class MarketMatcher:
+    def __init__(self):
+        self._index = _Index({}, {}, {}, {})
+        self._lock = threading.Lock()  # one rebuild at a time
+
+    @property
+    def queries(self) -> Dict[str, MarketQuery]:
+        return self._index.queries
+
+    def rebuild(self, markets: Iterable[Dict]):
+        # Queries describe the event, not the strike: markets of one event
+        # ("BTC above 100k", "BTC above 105k", ...) share terms, so they share
+        # one X search and one routing entry.
+        events: Dict[str, List[Dict]] = {}
+        for m in markets:
+            if m.get("ticker"):
+                events.setdefault(m.get("event_ticker") or m["ticker"], []).append(m)
+
+        docs: Dict[str, List[str]] = {}
+        for ev, ms in events.items():
+            counts = Counter()
+            order: Dict[str, int] = {}
+            for m in ms:
+                terms = _terms(m.get("title", "")) + _terms(m.get("subtitle", "") or m.get("yes_sub_title", ""))
+                for t in dict.fromkeys(terms):
+                    counts[t] += 1
+                    order.setdefault(t, len(order))
+            # keep terms most of the event's markets share (drops strikes/dates)
+            terms = sorted((t for t, c in counts.items() if 2 * c >= len(ms)), key=order.get)
+            st = _series_term(ms[0])
+            if st and st not in terms:
+                terms.append(st)
+            docs[ev] = terms
+
+        df = Counter(t for terms in docs.values() for t in set(terms))
+        n = max(1, len(docs))
+        idf = {t: math.log(n / c) for t, c in df.items()}
+
+        queries, required, anchors = {}, {}, {}
+        event_tickers = {ev: [m["ticker"] for m in ms] for ev, ms in events.items()}
+        for ev, terms in docs.items():
+            best = sorted(terms, key=lambda t: (-idf[t], -len(t)))[:MAX_TERMS]
+            if not best:
+                continue
+            anchors[best[0]] = anchors.get(best[0], []) + [ev]
+            required[ev] = frozenset(best)
+            for m in events[ev]:
+                queries[m["ticker"]] = MarketQuery(m["ticker"], ev, best)
+
+        index = _Index(queries, required, anchors, event_tickers)
+        with self._lock:
+            self._index = index
+
+    def on_catalog_refresh(self, catalog: MarketCatalog):
+        self.rebuild(catalog.markets())
+
+    def query_for(self, ticker: str) -> Optional[MarketQuery]:
+        return self.queries.get(ticker)
+
+    def route_tokens(self, tokens: Set[str], only: Optional[Set[str]] = None) -> List[str]:
+        """Tickers whose every term appears in `tokens`."""
+        return _route(self._index, tokens, only)
+
+    def route(self, texts: List[str], only: Optional[Set[str]] = None) -> Dict[str, List[int]]:
+        """{ticker: [indexes into texts]} in one pass over the texts."""
+        index = self._index  # one snapshot for the whole pass
+        out: Dict[str, List[int]] = {}
+        for i, text in enumerate(texts):
+            for ticker in _route(index, set(tokenize(text)), only):
+                out.setdefault(ticker, []).append(i)
+        return out
+
+    def combined_queries(self, tickers: List[str]) -> List[str]:
+        """OR the markets' (event) queries together in chunks that fit X's query limit."""
+        index = self._index
+        out, cur = [], ""
+        events = dict.fromkeys(index.queries[t].event for t in tickers if t in index.queries)
+        for ev in events:
+            part = "(" + " ".join(index.queries[index.event_tickers[ev][0]].terms) + ")"
+            cand = f"{cur} OR {part}" if cur else part
+            if len(cand) + len(" -is:retweet") > X_QUERY_MAX and cur:
+                out.append(cur + " -is:retweet")
+                cand = part
+            cur = cand
+        if cur:
+            out.append(cur + " -is:retweet")
+        return out
+
+    def state(self) -> Dict:
+        index = self._index
+        return {"markets": len(index.queries), "anchors": len(index.anchors)}
+
+matcher = MarketMatcher()
+
+async def analyze_markets_async(tickers: List[str], max_results: int = 100, lang: str = "en",
+                                concurrency: int = 4) -> Dict:
+    """
+    Sentiment for many markets from shared X searches: fetch the OR of their
+    queries, drop reposts and near-duplicates, score every distinct tweet
+    once, route each tweet to all markets it matches and aggregate per market.
+    """
+    tickers = [t for t in dict.fromkeys(tickers) if matcher.query_for(t)]
+    wanted = set(tickers)
+    sem = asyncio.Semaphore(max(1, int(concurrency)))
+
+    async def _fetch(q: str) -> Dict:
+        async with sem:
+            return await afetch_recent_tweets(q, max_results=max_results, lang=lang)
+
+    fetched = await asyncio.gather(*[_fetch(q) for q in matcher.combined_queries(tickers)])
+
+    unique: Dict[str, Dict] = {}
+    sources = set()
+    for res in fetched:
+        sources.add(res.get("source", "UNKNOWN"))
+        if res.get("source") != "LIVE":
+            continue  # DEMO tweets are per-query filler; they can't be routed
+        for t in res.get("items", []) or []:
+            unique.setdefault(t.get("id"), t)
+
+    dedup = Deduper()
+    tweets = dedup.filter(list(unique.values()))
+    texts = [t.get("text", "") or "" for t in tweets]
+    scored = await ascore_texts(texts)
+    items = [
+        {"id": t.get("id"), "text": text, "score": float(s["score"]), "label": str(s["label"])}
+        for t, text, s in zip(tweets, texts, scored)
+    ]
+
+    routed = matcher.route(texts, only=wanted)
+    markets = []
+    for ticker in tickers:
+        tally = Tally(keep_items=False)
+        tally.add_scored([items[i] for i in routed.get(ticker, [])])
+        markets.append({"ticker": ticker, "query": matcher.query_for(ticker).query, **tally.aggregate()})
+
+    return {
+        "markets": markets,
+        "tweets": len(items),
+        "duplicates": dedup.seen - dedup.kept,
+        "searches": len(fetched),
+        "source": "LIVE" if sources == {"LIVE"} else ("DEMO" if "LIVE" not in sources else "MIXED"),
+    }
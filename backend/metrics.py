@@ -0,0 +1,259 @@
+# backend/metrics.py
+"""
+Process-wide latency histograms and counters, served as Prometheus text on
+/metrics.
+
+Hot paths only pay for two perf_counter() calls, a bisect and a lock per
+observation. Everything timed with stage() lands in
+xsent_stage_seconds{stage=...}; while an HTTP request is being served the
+same timings are also collected for its Server-Timing header (see
+ServerTimingMiddleware in backend/app.py).
+
+Stages:
+  x_fetch         one Recent Search page, retries and waits included
+  x_wait          sleeping on a quota reset or retry backoff
+  score           one scoring pass (lexicon or LLM)
+  analyze         a whole analyze_topic() / analyze_topic_async()
+  kalshi_sign     RSA-PSS signing of one Kalshi request
+  kalshi_request  one signed Kalshi call, signing included
+  order_submit    one order / batched-order call, retries included
+  serialize       rendering a response body (JSON or MessagePack)
+  compress        gzip / zstd of a response body
+"""
+from __future__ import annotations
+
+import bisect
+import math
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Seconds; covers sub-ms scoring passes up to a stalled upstream
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def _fmt(v: float) -> str:
+    if v == math.inf:
+        return "+Inf"
+    return repr(float(v)) if not float(v).is_integer() else str(int(v))
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Tuple, extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict) -> Tuple:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+    def _samples(self) -> List[str]:
+        return []
+
+class Counter(_Metric):
+    """Incremented with inc(), or read from `fn` (returning {label tuple: value}) at scrape time."""
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 fn: Optional[Callable[[], Dict[Tuple, float]]] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+        self.fn = fn
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> List[str]:
+        if self.fn is not None:
+            return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in sorted(self.fn().items())]
+        with self._lock:
+            items = sorted(self._values.items()) or ([((), 0.0)] if not self.labelnames else [])
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+class Gauge(_Metric):
+    """Set directly, or read from `fn` (returning {label tuple: value}) at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (),
+                 fn: Optional[Callable[[], Dict[Tuple, Optional[float]]]] = None):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple, float] = {}
+        self.fn = fn
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def _samples(self) -> List[str]:
+        if self.fn is not None:
+            items = sorted((k, v) for k, v in self.fn().items() if v is not None)
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, k)} {_fmt(v)}" for k, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple, List] = {}  # key -> [per-bucket counts (+Inf last), sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1] += value
+            s[2] += 1
+
+    def snapshot(self, **labels) -> Dict:
+        """count/sum plus p50/p99 estimated from the buckets (upper bound of the bucket)."""
+        with self._lock:
+            s = self._series.get(self._key(labels))
+            counts, total, n = (list(s[0]), s[1], s[2]) if s else ([], 0.0, 0)
+        return {"count": n, "sum": total, "p50": self._quantile(counts, n, 0.5), "p99": self._quantile(counts, n, 0.99)}
+
+    def _quantile(self, counts: List[int], n: int, q: float) -> Optional[float]:
+        if not n:
+            return None
+        seen = 0
+        for bound, c in zip(self.buckets + (math.inf,), counts):
+            seen += c
+            if seen >= q * n:
+                return bound
+        return math.inf
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        out = []
+        for key, (counts, total, n) in items:
+            cum = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                cum += c
+                le = 'le="%s"' % _fmt(bound)
+                out.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cum}")
+            out.append(f"{self.name}_sum{_labels(self.labelnames, key)} {total!r}")
+            out.append(f"{self.name}_count{_labels(self.labelnames, key)} {n}")
+        return out
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:  # module reloads: keep the series we already have
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, help: str, labels: Sequence[str] = (), fn=None) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels, fn))
+
+def gauge(name: str, help: str, labels: Sequence[str] = (), fn=None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels, fn))
+
+def histogram(name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))
+
+def render() -> str:
+    return REGISTRY.render()
+
+STAGE_SECONDS = histogram("xsent_stage_seconds", "Latency of one pipeline stage.", ["stage"])
+
+# --- per-request stage timings (Server-Timing) ---
+# A list while a request is collecting timings, None otherwise. Tasks started
+# by the request share the same list, so their stages are reported too.
+_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("xsent_timings", default=None)
+
+def begin_request():
+    """Start collecting stage timings for the current request; returns a reset token."""
+    return _timings.set([])
+
+def end_request(token) -> List[Tuple[str, float]]:
+    """Stop collecting; returns [(stage, seconds)] in completion order."""
+    got = _timings.get() or []
+    _timings.reset(token)
+    return got
+
+def current_timings() -> List[Tuple[str, float]]:
+    return list(_timings.get() or [])
+
+def observe_stage(name: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage=name)
+    got = _timings.get()
+    if got is not None:
+        got.append((name, seconds))
+
+class stage:
+    """
+    with stage("score"): ...
+    Times the block into xsent_stage_seconds and the current request's Server-Timing.
+    """
+
+    __slots__ = ("name", "t0")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe_stage(self.name, time.perf_counter() - self.t0)
+        return False
+
+def server_timing(timings: List[Tuple[str, float]], total_s: Optional[float] = None) -> str:
+    """Server-Timing value: one entry per stage, repeats summed ("3 calls" in desc)."""
+    merged: Dict[str, List] = {}
+    for name, secs in timings:
+        m = merged.setdefault(name, [0.0, 0])
+        m[0] += secs
+        m[1] += 1
+    parts = [
+        f"{name};dur={secs * 1000:.2f}" + (f';desc="{n} calls"' if n > 1 else "")
+        for name, (secs, n) in merged.items()
+    ]
+    if total_s is not None:
+        parts.append(f"total;dur={total_s * 1000:.2f}")
+    return ", ".join(parts)
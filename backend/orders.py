@@ -0,0 +1,305 @@
+# backend/orders.py
+"""
+Async order submission for Kalshi.
+
+  - signatures are made ahead of time: Kalshi signs timestamp + method +
+    path, not the body, so a background thread keeps a few signed headers
+    per endpoint ready and each request takes a fresh one (older than
+    KALSHI_PRESIGN_MAX_AGE_S are thrown away)
+  - every order carries a client_order_id; a retry after a timeout, 5xx or
+    429 resends the same id, so an order that did reach the exchange is
+    answered with 409 "already exists" instead of filling twice
+  - baskets go through POST /portfolio/orders/batched (KALSHI_BATCH_MAX per
+    call, chunks in parallel) and fall back to concurrent single orders
+    when the exchange does not offer that endpoint
+
+Each order comes back as
+  {"client_order_id", "ticker", "status", "order", "error", "http_status", "attempts"}
+with status "accepted", "duplicate" (an earlier attempt with this id already
+placed it), "rejected" (the exchange said no) or "failed" (no answer; it may
+still have been placed, so resubmit with the same client_order_id).
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import httpx
+
+from backend.kalshi_auth import KalshiClient, get_client, new_client_order_id
+from backend.metrics import counter, stage
+
+ORDERS_PATH = "/trade-api/v2/portfolio/orders"
+BATCH_PATH = ORDERS_PATH + "/batched"
+
+KALSHI_BATCH_ORDERS = os.getenv("KALSHI_BATCH_ORDERS", "1") == "1"
+KALSHI_BATCH_MAX = int(os.getenv("KALSHI_BATCH_MAX", "20"))                 # orders per batched call
+KALSHI_ORDER_ATTEMPTS = int(os.getenv("KALSHI_ORDER_ATTEMPTS", "3"))
+KALSHI_ORDER_BACKOFF_S = float(os.getenv("KALSHI_ORDER_BACKOFF_S", "0.05"))  # doubles per retry
+KALSHI_ORDER_TIMEOUT_S = float(os.getenv("KALSHI_ORDER_TIMEOUT_S", "5"))
+KALSHI_ORDER_CONCURRENCY = int(os.getenv("KALSHI_ORDER_CONCURRENCY", "10"))  # requests in flight
+KALSHI_PRESIGN = int(os.getenv("KALSHI_PRESIGN", "8"))                       # signed headers kept per endpoint
+KALSHI_PRESIGN_MAX_AGE_S = float(os.getenv("KALSHI_PRESIGN_MAX_AGE_S", "5"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+ORDERS = counter("xsent_orders_total", "Orders submitted through the pipeline, by outcome.", ["status"])
+ORDER_RETRIES = counter("xsent_order_retries_total", "Order requests resent with the same client_order_id.")
+
+class PreSigner:
+    """Pool of ready-made KALSHI-ACCESS-* headers per (method, path), refilled off the event loop."""
+
+    def __init__(self, client: KalshiClient, size: int = KALSHI_PRESIGN, max_age_s: float = KALSHI_PRESIGN_MAX_AGE_S):
+        self.client = client
+        self.size = size
+        self.max_age_s = max_age_s
+        self.hits = self.misses = 0
+        self._pools: Dict[Tuple[str, str], Deque[Tuple[float, Dict[str, str]]]] = {}
+        self._refilling = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kalshi-presign")
+
+    def take(self, method: str, path: str) -> Dict[str, str]:
+        key = (method, path)
+        now = time.monotonic()
+        with self._lock:
+            pool = self._pools.setdefault(key, deque())
+            while pool and now - pool[0][0] > self.max_age_s:
+                pool.popleft()
+            item = pool.popleft() if pool else None
+        if item is not None:
+            self.hits += 1
+            headers = item[1]
+        else:
+            self.misses += 1
+            headers = self.client.signed_headers(method, self.client.base + path)
+        self.warm(method, path)
+        return headers
+
+    def warm(self, method: str, path: str):
+        """Top the pool for (method, path) up in the background."""
+        if self.size <= 0:
+            return
+        key = (method, path)
+        with self._lock:
+            if key in self._refilling or len(self._pools.get(key, ())) >= self.size:
+                return
+            self._refilling.add(key)
+        self._executor.submit(self._refill, key)
+
+    def _refill(self, key: Tuple[str, str]):
+        method, path = key
+        try:
+            while True:
+                with self._lock:
+                    if len(self._pools.setdefault(key, deque())) >= self.size:
+                        return
+                headers = self.client.signed_headers(method, self.client.base + path)
+                with self._lock:
+                    self._pools[key].append((time.monotonic(), headers))
+        except Exception as e:
+            print(f"[orders] pre-signing failed: {type(e).__name__}: {e}")
+        finally:
+            with self._lock:
+                self._refilling.discard(key)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+def _result(body: Dict, status: str, order: Optional[Dict] = None, error: Optional[str] = None,
+            http_status: Optional[int] = None, attempts: int = 0) -> Dict[str, Any]:
+    ORDERS.inc(status=status)
+    return {
+        "client_order_id": body.get("client_order_id"),
+        "ticker": body.get("ticker"),
+        "status": status,
+        "order": order,
+        "error": error,
+        "http_status": http_status,
+        "attempts": attempts,
+    }
+
+def _error_text(data: Any) -> str:
+    err = data.get("error") if isinstance(data, dict) else None
+    if isinstance(err, dict):
+        return f"{err.get('code', '')}: {err.get('message', '')}".strip(": ")
+    return str(err or data)[:300]
+
+def _is_duplicate(status: int, data: Any) -> bool:
+    err = data.get("error") if isinstance(data, dict) else None
+    code = str((err.get("code") if isinstance(err, dict) else None) or "")
+    return status == 409 or "already_exists" in code or "duplicate" in code
+
+def _json(r: httpx.Response) -> Dict:
+    """The body as a dict; anything else (a proxy's HTML page, a bare list) becomes {"error": text}."""
+    try:
+        data = r.json()
+    except ValueError:
+        return {"error": r.text[:300]}
+    return data if isinstance(data, dict) else {"error": r.text[:300]}
+
+class OrderPipeline:
+    """
+    Concurrent, idempotent order submission. One instance per process
+    (get_order_pipeline()); the HTTP client is rebuilt for each event loop.
+    `transport` swaps the network for an in-process mock exchange.
+    """
+
+    def __init__(self, client: Optional[KalshiClient] = None, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 concurrency: int = KALSHI_ORDER_CONCURRENCY, attempts: int = KALSHI_ORDER_ATTEMPTS,
+                 timeout_s: float = KALSHI_ORDER_TIMEOUT_S, batch_max: int = KALSHI_BATCH_MAX,
+                 use_batch: bool = KALSHI_BATCH_ORDERS, backoff_s: float = KALSHI_ORDER_BACKOFF_S):
+        self.client = client or get_client()
+        self.signer = PreSigner(self.client)
+        self.transport = transport
+        self.concurrency = concurrency
+        self.attempts = max(1, attempts)
+        self.timeout_s = timeout_s
+        self.batch_max = max(1, batch_max)
+        self.backoff_s = backoff_s
+        self.batch_available: Optional[bool] = None if use_batch else False  # None = not tried yet
+        self.stats = {"orders": 0, "requests": 0, "batches": 0, "retries": 0}
+        self._http: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop = None
+
+    def _bind_loop(self):
+        """Client + semaphore belong to one event loop; recreate them on a new one."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(
+                transport=self.transport, timeout=self.timeout_s,
+                limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            )
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+            self.signer.warm("POST", ORDERS_PATH)
+            if self.batch_available is not False:
+                self.signer.warm("POST", BATCH_PATH)
+
+    async def aclose(self):
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+    async def _post(self, path: str, body: Dict) -> Tuple[Optional[httpx.Response], Optional[str], int]:
+        """POST with retries on timeouts / 429 / 5xx; (last response or None, transport error, attempts)."""
+        r, err = None, None
+        for attempt in range(1, self.attempts + 1):
+            headers = self.signer.take("POST", path)
+            self.stats["requests"] += 1
+            try:
+                async with self._sem:
+                    r = await self._http.post(self.client.base + path, json=body, headers=headers)
+                err = None
+            except httpx.HTTPError as e:
+                r, err = None, f"{type(e).__name__}: {e}"
+            if r is not None and r.status_code not in RETRY_STATUSES:
+                return r, None, attempt
+            if attempt == self.attempts:
+                return r, err, attempt
+            delay = self.backoff_s * 2 ** (attempt - 1)
+            if r is not None and r.status_code == 429:
+                try:
+                    delay = max(delay, float(r.headers.get("Retry-After", 0)))
+                except ValueError:
+                    pass
+            self.stats["retries"] += 1
+            ORDER_RETRIES.inc()
+            await asyncio.sleep(delay)
+        return r, err, self.attempts
+
+    async def submit(self, body: Dict) -> Dict[str, Any]:
+        """One order (an order_body() dict); never raises."""
+        self._bind_loop()
+        body = {**body, "client_order_id": body.get("client_order_id") or new_client_order_id()}
+        self.stats["orders"] += 1
+        with stage("order_submit"):
+            r, err, attempts = await self._post(ORDERS_PATH, body)
+        if r is None:
+            return _result(body, "failed", error=err, attempts=attempts)
+        data = _json(r)
+        if r.status_code < 300:
+            return _result(body, "accepted", order=data.get("order"), http_status=r.status_code, attempts=attempts)
+        if _is_duplicate(r.status_code, data):
+            return _result(body, "duplicate", error=_error_text(data), http_status=r.status_code, attempts=attempts)
+        status = "failed" if r.status_code in RETRY_STATUSES else "rejected"
+        return _result(body, status, error=_error_text(data), http_status=r.status_code, attempts=attempts)
+
+    async def _submit_batch(self, bodies: List[Dict]) -> Optional[List[Dict[str, Any]]]:
+        """One batched call; None when the exchange has no batch endpoint."""
+        with stage("order_submit"):
+            r, err, attempts = await self._post(BATCH_PATH, {"orders": bodies})
+        if r is not None and r.status_code in (404, 405):
+            self.batch_available = False
+            return None
+        if r is None:
+            return [_result(b, "failed", error=err, attempts=attempts) for b in bodies]
+        data = _json(r)
+        if r.status_code >= 300:
+            status = "failed" if r.status_code in RETRY_STATUSES else "rejected"
+            return [_result(b, status, error=_error_text(data), http_status=r.status_code, attempts=attempts)
+                    for b in bodies]
+        self.batch_available = True
+        self.stats["batches"] += 1
+        entries = data.get("orders")
+        entries = entries if isinstance(entries, list) else []
+        out = []
+        for i, b in enumerate(bodies):
+            e = entries[i] if i < len(entries) else {"error": {"code": "missing", "message": "no result returned"}}
+            if not isinstance(e, dict):
+                e = {"error": str(e)[:300]}
+            if e.get("order") and not e.get("error"):
+                out.append(_result(b, "accepted", order=e["order"], http_status=r.status_code, attempts=attempts))
+            elif _is_duplicate(0, e):
+                out.append(_result(b, "duplicate", error=_error_text(e), http_status=r.status_code, attempts=attempts))
+            else:
+                out.append(_result(b, "rejected", error=_error_text(e), http_status=r.status_code, attempts=attempts))
+        return out
+
+    async def submit_many(self, bodies: List[Dict]) -> List[Dict[str, Any]]:
+        """A basket of orders, batched where possible; results in input order."""
+        if not bodies:
+            return []
+        self._bind_loop()
+        bodies = [{**b, "client_order_id": b.get("client_order_id") or new_client_order_id()} for b in bodies]
+        if len(bodies) == 1 or self.batch_available is False:
+            return list(await asyncio.gather(*(self.submit(b) for b in bodies)))
+
+        self.stats["orders"] += len(bodies)
+        chunks = [bodies[i:i + self.batch_max] for i in range(0, len(bodies), self.batch_max)]
+        done = await asyncio.gather(*(self._submit_batch(c) for c in chunks))
+        out: List[Dict[str, Any]] = []
+        for chunk, res in zip(chunks, done):
+            if res is None:  # no batch endpoint: send these one by one
+                self.stats["orders"] -= len(chunk)
+                res = list(await asyncio.gather(*(self.submit(b) for b in chunk)))
+            out.extend(res)
+        return out
+
+    def state(self) -> Dict:
+        return {
+            "batch_available": self.batch_available,
+            "presigned_hits": self.signer.hits,
+            "presigned_misses": self.signer.misses,
+            "concurrency": self.concurrency,
+            **self.stats,
+        }
+
+_pipeline: Optional[OrderPipeline] = None
+
+def get_order_pipeline() -> OrderPipeline:
+    """Process-wide OrderPipeline, created on first use."""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = OrderPipeline()
+    return _pipeline
+
+async def aclose_order_pipeline():
+    if _pipeline is not None:
+        await _pipeline.aclose()
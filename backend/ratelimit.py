@@ -0,0 +1,205 @@
+# backend/ratelimit.py
+"""
+Shared X rate-limit governor and circuit breaker.
+
+The governor reads x-rate-limit-limit / -remaining / -reset from every X
+response. When the quota is spent it holds requests until exactly the reset
+time (or fails fast if that is too far away), retries 429s at the reset
+instead of on a fixed backoff, and never retries statuses that cannot
+succeed (bad token, bad query).
+
+The circuit breaker opens after repeated upstream failures, so callers go
+straight to the DEMO fallback while X is down. After a cooldown one probe
+request is let through; if it succeeds the breaker closes again.
+
+Env:
+  X_MAX_ATTEMPTS     tries per page (3)
+  X_BACKOFF_BASE     first backoff for 5xx/network errors, doubles (1.0s)
+  X_MAX_WAIT_S       longest we'll wait for a reset before falling back (15s)
+  X_BREAKER_FAILS    consecutive failures that open the breaker (5)
+  X_BREAKER_COOLDOWN seconds the breaker stays open (30)
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+from backend.metrics import gauge
+
+X_MAX_ATTEMPTS = int(os.getenv("X_MAX_ATTEMPTS", "3"))
+X_BACKOFF_BASE = float(os.getenv("X_BACKOFF_BASE", "1.0"))
+X_MAX_WAIT_S = float(os.getenv("X_MAX_WAIT_S", "15"))
+X_BREAKER_FAILS = int(os.getenv("X_BREAKER_FAILS", "5"))
+X_BREAKER_COOLDOWN = float(os.getenv("X_BREAKER_COOLDOWN", "30"))
+
+RETRYABLE = {429, 500, 502, 503, 504}
+# Our side is wrong (token/plan) — X is up, but nothing will work until fixed
+BREAKER_STATUSES = {401, 403}
+
+OK, RETRY, GIVE_UP = "ok", "retry", "give_up"
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, threshold: int = X_BREAKER_FAILS, cooldown_s: float = X_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown_s = cooldown_s
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._probe_out = False
+        self._probe_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.cooldown_s:
+                self.state = self.HALF_OPEN
+                self._probe_out = False
+            now = time.monotonic()
+            # exactly one probe at a time (a probe that never reported back expires)
+            if self.state == self.HALF_OPEN and (not self._probe_out or now - self._probe_at >= self.cooldown_s):
+                self._probe_out, self._probe_at = True, now
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probe_out = False
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.threshold:
+                if self.state != self.OPEN:
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._probe_out = False
+
+    def info(self) -> Dict:
+        with self._lock:
+            reopen = max(0.0, self.cooldown_s - (time.monotonic() - self.opened_at)) if self.state == self.OPEN else 0.0
+            return {"state": self.state, "failures": self.failures, "trips": self.trips, "reopens_in_s": round(reopen, 3)}
+
+class RateGovernor:
+    def __init__(self, breaker: Optional[CircuitBreaker] = None, max_wait_s: float = X_MAX_WAIT_S,
+                 backoff_base: float = X_BACKOFF_BASE):
+        self.breaker = breaker or CircuitBreaker()
+        self.max_wait_s = max_wait_s
+        self.backoff_base = backoff_base
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at: Optional[float] = None   # epoch seconds
+        self.retries = 0
+        self.fail_fast = 0
+        self.non_retryable = 0
+        self._lock = threading.Lock()
+
+    def _reset_wait(self, now: float) -> float:
+        return max(0.0, self.reset_at - now) if self.reset_at else 0.0
+
+    def before_request(self) -> Optional[float]:
+        """
+        Seconds to wait before sending (0 = go now), or None to fail fast
+        because the breaker is open or the quota resets too far away.
+        """
+        with self._lock:
+            wait = 0.0
+            if self.remaining is not None and self.remaining <= 0:
+                wait = self._reset_wait(time.time())
+                if wait <= 0:
+                    self.remaining = None  # window rolled over; quota unknown again
+            if wait > self.max_wait_s:
+                self.fail_fast += 1
+                return None
+        if not self.breaker.allow():
+            with self._lock:
+                self.fail_fast += 1
+            return None
+        return wait
+
+    def _update(self, headers: Mapping[str, str]):
+        def _int(name: str) -> Optional[int]:
+            v = headers.get(name)
+            try:
+                return int(v) if v is not None else None
+            except ValueError:
+                return None
+
+        limit, remaining, reset = _int("x-rate-limit-limit"), _int("x-rate-limit-remaining"), _int("x-rate-limit-reset")
+        if limit is not None:
+            self.limit = limit
+        if remaining is not None:
+            self.remaining = remaining
+        if reset is not None:
+            self.reset_at = float(reset)
+
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_base * (2 ** (attempt - 1))
+
+    def on_response(self, status: int, headers: Mapping[str, str], attempt: int) -> Tuple[str, float]:
+        """(OK|RETRY|GIVE_UP, delay before the retry) for one X response."""
+        with self._lock:
+            self._update(headers)
+            if status < 400:
+                action, delay = OK, 0.0
+            elif status == 429:
+                self.remaining = 0
+                delay = self._reset_wait(time.time()) or self._backoff(attempt)
+                action = RETRY if delay <= self.max_wait_s else GIVE_UP
+            elif status in RETRYABLE:
+                action, delay = RETRY, self._backoff(attempt)
+            else:
+                self.non_retryable += 1
+                action, delay = GIVE_UP, 0.0
+
+        if action == OK or (status < 500 and status not in BREAKER_STATUSES):
+            self.breaker.success()   # X answered sensibly (incl. 429 / bad query)
+        else:
+            self.breaker.failure()
+        return self._finish(action, delay, attempt)
+
+    def on_error(self, attempt: int) -> Tuple[str, float]:
+        """Network error / timeout: back off and retry."""
+        self.breaker.failure()
+        return self._finish(RETRY, self._backoff(attempt), attempt)
+
+    def _finish(self, action: str, delay: float, attempt: int) -> Tuple[str, float]:
+        if action == RETRY and attempt >= X_MAX_ATTEMPTS:
+            action = GIVE_UP
+        if action == RETRY:
+            with self._lock:
+                self.retries += 1
+        return action, delay
+
+    def state(self) -> Dict:
+        with self._lock:
+            now = time.time()
+            return {
+                "limit": self.limit,
+                "remaining": self.remaining,
+                "reset_in_s": round(self._reset_wait(now), 3) if self.reset_at else None,
+                "retries": self.retries,
+                "fail_fast": self.fail_fast,
+                "non_retryable": self.non_retryable,
+                "breaker": self.breaker.info(),
+            }
+
+governor = RateGovernor()
+
+gauge("xsent_x_quota_remaining", "Recent Search requests left in the current window (from x-rate-limit-remaining).",
+      fn=lambda: {(): governor.remaining})
+gauge("xsent_x_quota_limit", "Recent Search requests allowed per window (from x-rate-limit-limit).",
+      fn=lambda: {(): governor.limit})
+gauge("xsent_x_quota_reset_seconds", "Seconds until the Recent Search window resets.",
+      fn=lambda: {(): governor._reset_wait(time.time()) if governor.reset_at else None})
+gauge("xsent_x_breaker_open", "1 while the X circuit breaker is open or half-open.",
+      fn=lambda: {(): float(governor.breaker.state != CircuitBreaker.CLOSED)})
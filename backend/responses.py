@@ -0,0 +1,158 @@
+# backend/responses.py
+"""
+Compact responses for /api/sentiment.
+
+Most programmatic callers only want avg_score and counts, yet a full
+result ships the text of up to 300 tweets. Three knobs cut that down:
+
+  view=summary        drop "items" and the dedup cluster texts
+  fields=id,score     keep only these keys of every item
+  offset= / limit=    one page of items; "page" says where the next starts
+
+The body is encoded with orjson when installed (stdlib json otherwise), or
+as MessagePack when the client asks for it (format=msgpack or an Accept of
+application/msgpack). Large bodies are compressed with zstd or gzip,
+whichever the client's Accept-Encoding allows (zstd preferred).
+
+Env:
+  XSENT_COMPRESS_MIN_BYTES  smaller bodies go out uncompressed (1024)
+  XSENT_GZIP_LEVEL          1..9 (1)
+  XSENT_ZSTD_LEVEL          (3)
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from typing import Dict, Mapping, Optional, Sequence, Tuple
+
+from fastapi import Response
+
+from backend import metrics
+from backend.batch import ScoredBatch, json_default
+
+try:  # optional: 5-10x faster than json.dumps
+    import orjson
+except Exception:
+    orjson = None
+
+try:  # optional: format=msgpack
+    import msgpack
+except Exception:
+    msgpack = None
+
+try:  # optional: Content-Encoding: zstd
+    import zstandard
+except Exception:
+    zstandard = None
+
+COMPRESS_MIN_BYTES = int(os.getenv("XSENT_COMPRESS_MIN_BYTES", "1024"))
+GZIP_LEVEL = int(os.getenv("XSENT_GZIP_LEVEL", "1"))  # higher levels cost 2x the CPU for ~15% fewer bytes
+ZSTD_LEVEL = int(os.getenv("XSENT_ZSTD_LEVEL", "3"))
+
+ITEM_FIELDS = ("id", "text", "score", "label", "created_at")
+JSON_TYPE = "application/json"
+MSGPACK_TYPE = "application/msgpack"
+
+RESPONSE_BYTES = metrics.counter("xsent_response_bytes_total", "Response bytes sent by shaped endpoints, by format and encoding.",
+                                 ["format", "encoding"])
+
+_zstd = zstandard.ZstdCompressor(level=ZSTD_LEVEL) if zstandard is not None else None
+
+def parse_fields(fields: str) -> Optional[Tuple[str, ...]]:
+    """'id,score' -> ('id', 'score'); None for an empty string. Unknown names raise ValueError."""
+    names = tuple(f.strip() for f in (fields or "").split(",") if f.strip())
+    if not names:
+        return None
+    unknown = [f for f in names if f not in ITEM_FIELDS]
+    if unknown:
+        raise ValueError(f"unknown item field(s): {', '.join(unknown)}; use {','.join(ITEM_FIELDS)}")
+    return names
+
+def shape(data: Dict, view: str = "full", fields: Optional[Sequence[str]] = None,
+          offset: int = 0, limit: Optional[int] = None) -> Dict:
+    """
+    An analyze_topic() result cut down to what the caller asked for. The
+    input (often a shared cache entry) is never modified.
+    """
+    if view == "summary":
+        out = {k: v for k, v in data.items() if k != "items"}
+        if isinstance(out.get("dedup"), dict):
+            out["dedup"] = {k: v for k, v in out["dedup"].items() if k != "clusters"}
+        return out
+    items = data.get("items") or []
+    if not (fields or offset or limit is not None):
+        return data
+    total = len(items)
+    end = total if limit is None else min(total, offset + limit)
+    page = items[offset:end]  # a view, not a copy, for a ScoredBatch
+    if fields:
+        page = page.to_dicts(fields) if isinstance(page, ScoredBatch) else [{f: it.get(f) for f in fields} for it in page]
+    out = {**data, "items": page}
+    if offset or limit is not None:
+        out["page"] = {"offset": offset, "limit": limit, "total": total, "next_offset": end if end < total else None}
+    return out
+
+def dumps(data) -> bytes:
+    """Compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, default=json_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass
+    return json.dumps(data, default=json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def _accepted_codings(accept_encoding: str) -> Dict[str, float]:
+    """{'gzip': 1.0, 'zstd': 0.5} from an Accept-Encoding header."""
+    out = {}
+    for part in (accept_encoding or "").lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        out[coding.strip()] = q
+    return out
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """'zstd', 'gzip' or None, by the client's q-values (zstd wins ties)."""
+    codings = _accepted_codings(accept_encoding)
+    star = codings.get("*", 0.0)
+    options = []
+    if _zstd is not None:
+        options.append((codings.get("zstd", star), 1, "zstd"))
+    options.append((codings.get("gzip", star), 0, "gzip"))
+    q, _, best = max(options)
+    return best if q > 0 else None
+
+def wants_msgpack(fmt: Optional[str], accept: str) -> bool:
+    if fmt:
+        return fmt == "msgpack" and msgpack is not None
+    return msgpack is not None and ("application/msgpack" in accept or "application/x-msgpack" in accept)
+
+def encode(data, fmt: Optional[str] = None, accept: str = "", accept_encoding: str = "") -> Tuple[bytes, Dict[str, str]]:
+    """(body, headers) for `data`, in the negotiated format and content encoding."""
+    packed = wants_msgpack(fmt, accept or "")
+    with metrics.stage("serialize"):
+        body = msgpack.packb(data, default=json_default, use_bin_type=True) if packed else dumps(data)
+    headers = {"Content-Type": MSGPACK_TYPE if packed else JSON_TYPE, "Vary": "Accept, Accept-Encoding"}
+    coding = negotiate_encoding(accept_encoding) if len(body) >= COMPRESS_MIN_BYTES else None
+    if coding is not None:
+        with metrics.stage("compress"):
+            body = _zstd.compress(body) if coding == "zstd" else gzip.compress(body, GZIP_LEVEL, mtime=0)
+        headers["Content-Encoding"] = coding
+    RESPONSE_BYTES.inc(len(body), format="msgpack" if packed else "json", encoding=coding or "identity")
+    return body, headers
+
+def render(data, headers: Optional[Mapping[str, str]] = None, fmt: Optional[str] = None,
+           request_headers: Optional[Mapping[str, str]] = None) -> Response:
+    """encode() as a Response; `request_headers` supplies Accept / Accept-Encoding."""
+    req = request_headers or {}
+    body, out = encode(data, fmt, req.get("accept", ""), req.get("accept-encoding", ""))
+    media_type = out.pop("Content-Type")
+    return Response(content=body, media_type=media_type, headers={**out, **(headers or {})})
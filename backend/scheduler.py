@@ -0,0 +1,242 @@
+# backend/scheduler.py
+"""
+Background watchlist scheduler.
+
+Keeps a list of queries, re-analyzes each on its own interval and publishes
+the latest signal to an in-memory snapshot that strategy code can read
+without ever waiting on X; subscribe() hands out a queue that receives
+every new signal as it is published (GET /api/signals/stream). All pollers share one token bucket sized to the
+X rate budget; when several queries are due, the most-read ("hot") ones go
+first.
+
+Env:
+  XSENT_WATCHLIST        comma-separated queries to watch at startup
+  XSENT_WATCH_INTERVAL   default seconds between polls of one query (60)
+  XSENT_X_RATE           X requests/second budget for all pollers (0.5,
+                         i.e. 450 per 15 min)
+  XSENT_X_BURST          token bucket capacity (10)
+  XSENT_SCHED_WORKERS    polls allowed in flight at once (4)
+  XSENT_MOMENTUM_BUCKETS base time-series buckets the signal's momentum is fit over (30)
+"""
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+import time
+import traceback
+from typing import Dict, List, Optional
+
+from backend.aggregator import analyze_topic_async, sentiment_timeseries
+from backend.x_fetcher import PAGE_MAX
+
+WATCH_INTERVAL_S = float(os.getenv("XSENT_WATCH_INTERVAL", "60"))
+X_RATE = float(os.getenv("XSENT_X_RATE", "0.5"))
+X_BURST = float(os.getenv("XSENT_X_BURST", "10"))
+SCHED_WORKERS = int(os.getenv("XSENT_SCHED_WORKERS", "4"))
+HOT_HALF_LIFE_S = 300.0  # read counts halve every 5 minutes
+MOMENTUM_BUCKETS = int(os.getenv("XSENT_MOMENTUM_BUCKETS", "30"))  # time-series buckets behind "momentum"
+
+class TokenBucket:
+    """Classic token bucket; acquire() waits (without blocking the loop) for tokens."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self._last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    async def acquire(self, n: float = 1.0):
+        n = min(n, self.capacity)
+        async with self._lock:  # FIFO: callers are served in order
+            while True:
+                self._refill()
+                if self.tokens >= n:
+                    self.tokens -= n
+                    return
+                await asyncio.sleep((n - self.tokens) / self.rate)
+
+    def state(self) -> Dict:
+        self._refill()
+        return {"tokens": round(self.tokens, 3), "rate": self.rate, "capacity": self.capacity}
+
+class Watch:
+    def __init__(self, query: str, interval_s: float, max_results: int):
+        self.query = query
+        self.interval_s = interval_s
+        self.max_results = max_results
+        self.next_due = 0.0          # monotonic; 0 = poll asap
+        self.running = False
+        self.hot = 0.0               # exponentially decayed read count
+        self._hot_at = time.monotonic()
+        self.polls = 0
+        self.errors = 0
+
+    def touch(self, now: float):
+        self.hot = self.hotness(now) + 1.0
+        self._hot_at = now
+
+    def hotness(self, now: float) -> float:
+        return self.hot * 0.5 ** ((now - self._hot_at) / HOT_HALF_LIFE_S)
+
+    def cost(self) -> int:
+        """X requests one poll may use (one per Recent Search page)."""
+        return max(1, math.ceil(self.max_results / PAGE_MAX))
+
+    def info(self) -> Dict:
+        now = time.monotonic()
+        return {
+            "query": self.query,
+            "interval_s": self.interval_s,
+            "max_results": self.max_results,
+            "due_in_s": round(max(0.0, self.next_due - now), 3),
+            "hot": round(self.hotness(now), 3),
+            "polls": self.polls,
+            "errors": self.errors,
+        }
+
+class SignalScheduler:
+    def __init__(self, rate: float = X_RATE, burst: float = X_BURST, workers: int = SCHED_WORKERS):
+        self.bucket = TokenBucket(rate, burst)
+        self.workers = workers
+        self.watches: Dict[str, Watch] = {}
+        self.snapshot: Dict[str, Dict] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight: set = set()
+        self._listeners: List[asyncio.Queue] = []
+
+    # --- watchlist ---
+    def add(self, query: str, interval_s: float = WATCH_INTERVAL_S, max_results: int = 20) -> Dict:
+        w = self.watches.get(query)
+        if w is None:
+            w = self.watches[query] = Watch(query, interval_s, max_results)
+        else:
+            w.interval_s, w.max_results = interval_s, max_results
+            w.next_due = min(w.next_due, time.monotonic() + interval_s)
+        self._poke()
+        return w.info()
+
+    def remove(self, query: str) -> bool:
+        if self.snapshot.pop(query, None) is not None:
+            self._publish({"type": "removed", "query": query})
+        return self.watches.pop(query, None) is not None
+
+    def watchlist(self) -> List[Dict]:
+        return [w.info() for w in self.watches.values()]
+
+    # --- reads (hot path for strategy code) ---
+    def get(self, query: str) -> Optional[Dict]:
+        w = self.watches.get(query)
+        if w is not None:
+            w.touch(time.monotonic())
+        return self.snapshot.get(query)
+
+    # --- push ---
+    def subscribe(self, maxsize: int = 256) -> asyncio.Queue:
+        """Queue of {"type": "signal"|"removed", ...} frames; pass it to unsubscribe() when done."""
+        q: asyncio.Queue = asyncio.Queue(maxsize)
+        self._listeners.append(q)
+        return q
+
+    def unsubscribe(self, q: asyncio.Queue):
+        if q in self._listeners:
+            self._listeners.remove(q)
+
+    def _publish(self, frame: Dict):
+        for q in self._listeners:
+            if q.full():  # a slow reader loses its oldest frame, never blocks the poller
+                q.get_nowait()
+            q.put_nowait(frame)
+
+    # --- loop ---
+    def _poke(self):
+        if self._wake is not None:
+            self._wake.set()
+
+    def _next_watch(self, now: float) -> Optional[Watch]:
+        due = [w for w in self.watches.values() if not w.running and w.next_due <= now]
+        if not due:
+            return None
+        return max(due, key=lambda w: (w.hotness(now), -w.next_due))
+
+    def _sleep_for(self, now: float) -> float:
+        pending = [w.next_due for w in self.watches.values() if not w.running]
+        return max(0.0, min(pending) - now) if pending else 3600.0
+
+    async def _poll(self, w: Watch):
+        try:
+            data = await analyze_topic_async(w.query, max_results=w.max_results)
+            ts = await asyncio.to_thread(sentiment_timeseries, w.query, buckets=MOMENTUM_BUCKETS)
+            if self.watches.get(w.query) is not w:
+                return  # removed while polling
+            sig = self.snapshot[w.query] = {
+                "query": w.query,
+                "avg_score": data["avg_score"],
+                "counts": data["counts"],
+                "n": data["n"],
+                "momentum": ts["momentum"],
+                "source": data["source"],
+                "updated_at": time.time(),
+            }
+            self._publish({"type": "signal", **sig})
+            w.polls += 1
+        except Exception:
+            w.errors += 1
+            traceback.print_exc()
+        finally:
+            w.running = False
+            w.next_due = time.monotonic() + w.interval_s
+            self._poke()
+
+    async def run(self):
+        self._wake = asyncio.Event()
+        sem = asyncio.Semaphore(self.workers)
+        while True:
+            now = time.monotonic()
+            w = self._next_watch(now)
+            if w is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self._sleep_for(now))
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            w.running = True
+            await sem.acquire()
+            await self.bucket.acquire(w.cost())
+            task = asyncio.ensure_future(self._poll(w))
+            self._inflight.add(task)
+            task.add_done_callback(lambda t: (self._inflight.discard(t), sem.release()))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self.run())
+
+    async def stop(self):
+        for t in [self._task, *self._inflight]:
+            if t is not None and not t.done():
+                t.cancel()
+        await asyncio.gather(*[t for t in [self._task, *self._inflight] if t is not None], return_exceptions=True)
+        self._task = None
+
+    def state(self) -> Dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "bucket": self.bucket.state(),
+            "inflight": len(self._inflight),
+            "watches": len(self.watches),
+            "listeners": len(self._listeners),
+        }
+
+scheduler = SignalScheduler()
+
+for _q in filter(None, (q.strip() for q in os.getenv("XSENT_WATCHLIST", "").split(","))):
+    scheduler.add(_q)
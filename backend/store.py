@@ -0,0 +1,185 @@
+# backend/store.py
+"""
+Persistent tweet + score store (SQLite).
+
+Every LIVE tweet we fetch is kept with its score, keyed by the X query
+string. analyze_topic() asks X only for tweets newer than the last one seen
+(since_id) and merges them into the stored window instead of re-fetching
+and re-scoring everything.
+
+XSENT_STORE_DB sets the file (default xsent_store.db); set it to "" to
+disable the store.
+
+ScoreMemo keeps LLM sentiment scores keyed by a hash of the normalized
+tweet text, so reposts and repeat fetches are never sent to the model twice.
+XSENT_SCORE_DB sets its file (default xsent_scores.db; "" disables it).
+"""
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+STORE_DB = os.getenv("XSENT_STORE_DB", "xsent_store.db").strip()
+STORE_KEEP = int(os.getenv("XSENT_STORE_KEEP", "1000"))  # newest tweets kept per query
+SCORE_DB = os.getenv("XSENT_SCORE_DB", "xsent_scores.db").strip()
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS tweets (
+    query      TEXT    NOT NULL,
+    tweet_id   INTEGER NOT NULL,
+    created_at TEXT,
+    text       TEXT    NOT NULL,
+    score      REAL    NOT NULL,
+    label      TEXT    NOT NULL,
+    fetched_at REAL    NOT NULL,
+    PRIMARY KEY (query, tweet_id)
+);
+CREATE INDEX IF NOT EXISTS idx_tweets_query_id_created ON tweets (query, tweet_id, created_at);
+CREATE TABLE IF NOT EXISTS fetches (
+    query   TEXT PRIMARY KEY,
+    last_id INTEGER NOT NULL,   -- newest tweet pulled from X, kept or not
+    depth   INTEGER NOT NULL    -- largest max_results fully fetched
+);
+"""
+
+_MEMO_SCHEMA = """
+CREATE TABLE IF NOT EXISTS scores (
+    key       TEXT PRIMARY KEY,   -- sha1(model + normalized text)
+    score     REAL NOT NULL,
+    scored_at REAL NOT NULL
+);
+"""
+
+def _connect(path: str) -> sqlite3.Connection:
+    c = sqlite3.connect(path, timeout=5)
+    c.execute("PRAGMA journal_mode=WAL")
+    c.execute("PRAGMA synchronous=NORMAL")
+    return c
+
+class TweetStore:
+    def __init__(self, path: str = STORE_DB, keep: int = STORE_KEEP):
+        self.path = path
+        self.keep = keep
+        self._local = threading.local()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = self._local.conn = _connect(self.path)
+        return c
+
+    def count(self, query: str) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM tweets WHERE query = ?", (query,)).fetchone()[0]
+
+    def last_id(self, query: str) -> Optional[str]:
+        row = self._conn().execute("SELECT MAX(tweet_id) FROM tweets WHERE query = ?", (query,)).fetchone()
+        return str(row[0]) if row and row[0] is not None else None
+
+    def cursor(self, query: str) -> Tuple[Optional[str], int]:
+        """(newest tweet ID fetched, deepest window fetched) for a query."""
+        row = self._conn().execute("SELECT last_id, depth FROM fetches WHERE query = ?", (query,)).fetchone()
+        return (str(row[0]), row[1]) if row else (None, 0)
+
+    def note_fetch(self, query: str, last_id: int, depth: int):
+        c = self._conn()
+        with c:
+            c.execute(
+                "INSERT INTO fetches VALUES (?, ?, ?) ON CONFLICT(query) DO UPDATE SET"
+                " last_id = MAX(last_id, excluded.last_id), depth = MAX(depth, excluded.depth)",
+                (query, int(last_id), int(depth)),
+            )
+
+    def add(self, query: str, raw_items: List[Dict], scored: List[Dict]):
+        """Insert fetched tweets with their scores; non-numeric (DEMO) IDs are skipped."""
+        now = time.time()
+        rows = [
+            (query, int(t["id"]), t.get("created_at"), s["text"], s["score"], s["label"], now)
+            for t, s in zip(raw_items, scored)
+            if str(t.get("id", "")).isdigit()
+        ]
+        if not rows:
+            return
+        c = self._conn()
+        with c:
+            c.executemany("INSERT OR REPLACE INTO tweets VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            c.execute(
+                "DELETE FROM tweets WHERE query = ? AND tweet_id < ("
+                " SELECT tweet_id FROM tweets WHERE query = ? ORDER BY tweet_id DESC LIMIT 1 OFFSET ?)",
+                (query, query, self.keep - 1),
+            )
+
+    def window(self, query: str, limit: int) -> List[Dict]:
+        """Newest `limit` stored tweets for a query, in the aggregator item schema."""
+        rows = self._conn().execute(
+            "SELECT tweet_id, text, score, label, created_at FROM tweets WHERE query = ? ORDER BY tweet_id DESC LIMIT ?",
+            (query, int(limit)),
+        ).fetchall()
+        return [{"id": str(r[0]), "text": r[1], "score": r[2], "label": r[3], "created_at": r[4]} for r in rows]
+
+_store: Optional[TweetStore] = None
+_store_lock = threading.Lock()
+
+def get_store() -> Optional[TweetStore]:
+    """Process-wide TweetStore, or None when XSENT_STORE_DB is empty."""
+    global _store
+    if not STORE_DB:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = TweetStore()
+    return _store
+
+class ScoreMemo:
+    """text-hash -> score, shared by every process pointing at the same file."""
+
+    _CHUNK = 500  # keys per SELECT, below SQLite's bound-parameter limit
+
+    def __init__(self, path: str = SCORE_DB):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(_MEMO_SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            c = self._local.conn = _connect(self.path)
+        return c
+
+    def get_many(self, keys: List[str]) -> Dict[str, float]:
+        keys = list(keys)
+        out: Dict[str, float] = {}
+        c = self._conn()
+        for i in range(0, len(keys), self._CHUNK):
+            part = keys[i:i + self._CHUNK]
+            marks = ",".join("?" * len(part))
+            out.update(c.execute(f"SELECT key, score FROM scores WHERE key IN ({marks})", part).fetchall())
+        return out
+
+    def put_many(self, scores: Dict[str, float]):
+        if not scores:
+            return
+        now = time.time()
+        c = self._conn()
+        with c:
+            c.executemany("INSERT OR REPLACE INTO scores VALUES (?, ?, ?)", [(k, v, now) for k, v in scores.items()])
+
+    def __len__(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM scores").fetchone()[0]
+
+_memo: Optional[ScoreMemo] = None
+
+def get_score_memo() -> Optional[ScoreMemo]:
+    """Process-wide ScoreMemo, or None when XSENT_SCORE_DB is empty."""
+    global _memo
+    if not SCORE_DB:
+        return None
+    if _memo is None:
+        with _store_lock:
+            if _memo is None:
+                _memo = ScoreMemo()
+    return _memo
@@ -0,0 +1,194 @@
+# backend/timeseries.py
+"""
+Rolling, time-bucketed sentiment per X query.
+
+Every LIVE tweet we score is filed by its created_at into a ring buffer of
+fixed-width buckets (XSENT_TS_BUCKET_S wide, XSENT_TS_BUCKETS of them, so
+24h of 1-minute buckets by default). Each bucket keeps Welford running
+stats (count, mean, M2) plus pos/neg/neu counts and the tweet IDs it holds,
+so re-fetched tweets are not counted twice.
+
+Adding a tweet is O(1); sliding the window just reuses the oldest slot.
+Reads merge consecutive base buckets into wider ones with Chan's parallel
+formula, so any multiple of the base width can be served without touching
+individual tweets again.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+TS_BUCKET_S = int(os.getenv("XSENT_TS_BUCKET_S", "60"))
+TS_BUCKETS = int(os.getenv("XSENT_TS_BUCKETS", "1440"))
+TS_MAX_SERIES = int(os.getenv("XSENT_TS_MAX_SERIES", "256"))  # queries tracked, least recently used dropped
+
+def parse_ts(created_at: Optional[str]) -> Optional[float]:
+    """X created_at ("2024-05-01T12:00:00.000Z") -> epoch seconds."""
+    if not created_at:
+        return None
+    try:
+        return datetime.fromisoformat(created_at.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+def iso(ts: float) -> str:
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+class Bucket:
+    """Welford accumulator for one time slice."""
+
+    __slots__ = ("index", "n", "mean", "m2", "pos", "neg", "neu", "ids")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.pos = self.neg = self.neu = 0
+        self.ids = set()
+
+    def add(self, score: float, label: str):
+        self.n += 1
+        d = score - self.mean
+        self.mean += d / self.n
+        self.m2 += d * (score - self.mean)
+        if label == "pos":
+            self.pos += 1
+        elif label == "neg":
+            self.neg += 1
+        else:
+            self.neu += 1
+
+    def merge(self, other: "Bucket"):
+        """Fold another bucket in (Chan et al. parallel variance)."""
+        if not other.n:
+            return
+        n = self.n + other.n
+        d = other.mean - self.mean
+        self.mean += d * other.n / n
+        self.m2 += other.m2 + d * d * self.n * other.n / n
+        self.n = n
+        self.pos += other.pos
+        self.neg += other.neg
+        self.neu += other.neu
+
+    def info(self) -> Dict:
+        return {
+            "n": self.n,
+            "mean": round(self.mean, 4),
+            "var": round(self.m2 / self.n, 6) if self.n else 0.0,  # population variance
+            "counts": {"pos": self.pos, "neg": self.neg, "neu": self.neu},
+        }
+
+class RollingSeries:
+    """Ring buffer of Buckets indexed by floor(created_at / bucket_s)."""
+
+    def __init__(self, bucket_s: int = TS_BUCKET_S, size: int = TS_BUCKETS):
+        self.bucket_s = max(1, int(bucket_s))
+        self.size = max(1, int(size))
+        self.slots: List[Optional[Bucket]] = [None] * self.size
+        self.newest: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def add(self, tweet_id, ts: float, score: float, label: str) -> bool:
+        """File one scored tweet; False if it is older than the window or already counted."""
+        b = int(ts // self.bucket_s)
+        with self.lock:
+            if self.newest is not None and b <= self.newest - self.size:
+                return False
+            if self.newest is None or b > self.newest:
+                self.newest = b
+            slot = self.slots[b % self.size]
+            if slot is None or slot.index != b:  # stale slot from a previous lap: reuse it
+                slot = self.slots[b % self.size] = Bucket(b)
+            if tweet_id in slot.ids:
+                return False
+            slot.ids.add(tweet_id)
+            slot.add(score, label)
+            return True
+
+    def add_items(self, items: Iterable[Dict]) -> int:
+        added = 0
+        for it in items:
+            ts = parse_ts(it.get("created_at"))
+            if ts is not None and self.add(it.get("id"), ts, float(it["score"]), str(it["label"])):
+                added += 1
+        return added
+
+    def buckets(self, count: int, group: int = 1, now: Optional[float] = None) -> List[Bucket]:
+        """
+        The last `count` buckets of `group` base buckets each, oldest first,
+        ending with the one holding `now` (empty buckets included).
+        """
+        group = max(1, min(int(group), self.size))
+        count = max(1, min(int(count), self.size // group))
+        current = int((time.time() if now is None else now) // self.bucket_s)
+        last = current - current % group  # wide buckets start on multiples of group
+        out = []
+        with self.lock:
+            for start in range(last - (count - 1) * group, last + 1, group):
+                merged = Bucket(start)
+                for b in range(start, start + group):
+                    slot = self.slots[b % self.size]
+                    if slot is not None and slot.index == b:
+                        merged.merge(slot)
+                out.append(merged)
+        return out
+
+def momentum(buckets: List[Bucket]) -> float:
+    """Count-weighted least-squares slope of bucket means, in score per bucket."""
+    pts = [(i, b.mean, b.n) for i, b in enumerate(buckets) if b.n]
+    w = sum(n for _, _, n in pts)
+    if len(pts) < 2 or not w:
+        return 0.0
+    mx = sum(i * n for i, _, n in pts) / w
+    my = sum(m * n for _, m, n in pts) / w
+    sxx = sum(n * (i - mx) ** 2 for i, _, n in pts)
+    sxy = sum(n * (i - mx) * (m - my) for i, m, n in pts)
+    return round(sxy / sxx, 6) if sxx else 0.0
+
+class SeriesRegistry:
+    """One RollingSeries per store key (x_query), least recently used evicted."""
+
+    def __init__(self, max_series: int = TS_MAX_SERIES):
+        self.max_series = max_series
+        self._series: "OrderedDict[str, RollingSeries]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, seed: Optional[Callable[[], Iterable[Dict]]] = None) -> RollingSeries:
+        """Series for `key`; a new one is first filled from seed() (e.g. the stored tweets)."""
+        with self._lock:
+            s = self._series.get(key)
+            if s is not None:
+                self._series.move_to_end(key)
+                return s
+            s = self._series[key] = RollingSeries()
+            while len(self._series) > self.max_series:
+                self._series.popitem(last=False)
+        if seed is not None:
+            s.add_items(seed())
+        return s
+
+    def peek(self, key: str) -> Optional[RollingSeries]:
+        return self._series.get(key)
+
+    def summary(self, key: str, count: int, group: int = 1, now: Optional[float] = None) -> Dict:
+        """Per-bucket stats, the window total and momentum for one series."""
+        s = self._series.get(key) or RollingSeries()
+        buckets = s.buckets(count, group, now)
+        total = Bucket(0)
+        for b in buckets:
+            total.merge(b)
+        width = s.bucket_s * max(1, group)
+        return {
+            "bucket_s": width,
+            "buckets": [{"start": iso(b.index * s.bucket_s), **b.info()} for b in buckets],
+            "window": {"seconds": width * len(buckets), **total.info()},
+            "momentum": momentum(buckets),
+        }
+
+series = SeriesRegistry()
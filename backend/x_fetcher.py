@@ -1,8 +1,13 @@
 # backend/x_fetcher.py
+import asyncio
 import os
 import time
+import weakref
+import httpx
 import requests
-from typing import Dict, List
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from backend.metrics import counter, stage
+from backend.ratelimit import GIVE_UP, OK, X_MAX_ATTEMPTS, governor
 
 # Load .env here too (in case this module is imported before app.py)
 try:
@@ -14,7 +19,25 @@ except Exception:
 X_BEARER = os.getenv("X_BEARER", "").strip()
 FORCE_DEMO = os.getenv("XSENT_FORCE_DEMO", "0") == "1"
 
-SEARCH_URL = "https://api.twitter.com/2/tweets/search/recent"
+# Overridable so tests/benchmarks can point at a local stand-in
+SEARCH_URL = os.getenv("X_SEARCH_URL", "https://api.twitter.com/2/tweets/search/recent")
+
+PAGE_MAX = 100   # Recent Search page cap
+PAGE_MIN = 10    # X rejects max_results < 10 per page
+MAX_TOTAL = 300  # most we'll walk across pages for one call
+
+# Async client: HTTP/2 when the optional `h2` package is installed
+try:
+    import h2  # noqa: F401
+    X_HTTP2 = os.getenv("X_HTTP2", "1") == "1"
+except Exception:
+    X_HTTP2 = False
+X_MAX_CONNECTIONS = int(os.getenv("X_MAX_CONNECTIONS", "100"))
+
+X_FETCHES = counter("xsent_x_fetches_total", "Tweet fetches (one per query walk) by the source they ended up serving.", ["source"])
+X_DEMO_FALLBACKS = counter("xsent_x_demo_fallbacks_total", "Fetches answered with the DEMO set, by reason.", ["reason"])
+X_REQUESTS = counter("xsent_x_requests_total", "Recent Search HTTP attempts by status (error = no response).", ["status"])
+X_RETRIES = counter("xsent_x_retries_total", "Recent Search attempts retried after a failure.")
 
 # Obvious demo set (only if FORCE_DEMO=1 or we fail all retries)
 DEMO_TWEETS = [
@@ -28,56 +51,255 @@ DEMO_TWEETS = [
 def _auth_headers() -> Dict[str, str]:
     return {"Authorization": f"Bearer {X_BEARER}"} if X_BEARER else {}
 
-def _fallback(query: str, k: int) -> Dict:
+def _fallback(query: str, k: int, reason: str) -> Dict:
+    X_FETCHES.inc(source="DEMO")
+    X_DEMO_FALLBACKS.inc(reason=reason)
     items = [{"id": t["id"], "text": t["text"].format(q=query)} for t in DEMO_TWEETS][:k]
     return {"source": "DEMO", "items": items}
 
-def fetch_recent_tweets(query: str, max_results: int = 10, lang: str = "en") -> Dict:
-    """
-    Returns: {"source": "LIVE"|"DEMO", "items": [{"id","text"}]}
-    We do a single-page Recent Search and cap to max_results to stay within rate limits.
-    Never raises—falls back to DEMO with logs on failure.
-    """
-    max_results = max(1, min(int(max_results), 100))  # API page cap
+def x_query(query: str, lang: str) -> str:
+    """The Recent Search query string we send for (query, lang)."""
+    return f"({query}) lang:{lang}" if lang else query
 
-    if FORCE_DEMO:
-        return _fallback(query, max_results)
+def _base_params(query: str, lang: str, since_id: Optional[str] = None) -> Dict:
+    params = {
+        "query": x_query(query, lang),
+        "tweet.fields": "lang,created_at",
+    }
+    if since_id:
+        params["since_id"] = str(since_id)
+    return params
 
+def _demo_reason() -> Optional[str]:
+    """Why we must serve DEMO without calling X (None if we can go LIVE)."""
+    if FORCE_DEMO:
+        return "forced"
     if not X_BEARER:
         print("[x_fetcher] WARNING: X_BEARER missing. Using DEMO. Set X_BEARER in .env and restart.")
-        return _fallback(query, max_results)
+        return "no-bearer"
+    return None
 
-    params = {
-        "query": f"({query}) lang:{lang}" if lang else query,
-        "max_results": max_results,
-        "tweet.fields": "lang,created_at",
-    }
+def _page_size(max_results: int, got: int) -> int:
+    return max(PAGE_MIN, min(max_results - got, PAGE_MAX))
+
+def _parse_page(data: Dict, limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Items (capped to `limit`) and the next_token, if X has more pages."""
+    raw = data.get("data", []) or []
+    items = [{"id": t.get("id"), "text": t.get("text", ""), "created_at": t.get("created_at")} for t in raw][:limit]
+    next_token = (data.get("meta") or {}).get("next_token") if raw else None
+    return items, next_token
+
+def _page_failed(query: str, max_results: int, pages: int, got: int) -> Dict:
+    """
+    Last page to yield when a fetch fails: the DEMO set if it was the first
+    page, else an empty LIVE page marked "truncated" (the walk stopped early).
+    """
+    if pages == 0:
+        print("[x_fetcher] Falling back to DEMO after repeated failures.")
+        return _fallback(query, max_results, "failed")
+    print(f"[x_fetcher] Page {pages + 1} failed; stopping at {got} items.")
+    return {"source": "LIVE", "items": [], "truncated": True}
+
+def _body(r) -> Optional[Dict]:
+    """The JSON object of a requests/httpx response; None for anything else (captive portal, cut-off reply)."""
+    try:
+        data = r.json()
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+def _get_page(params: Dict) -> Optional[Dict]:
+    """
+    One Recent Search GET, retried as the rate-limit governor decides.
+    Returns the JSON body, or None when X is unavailable (breaker open,
+    quota exhausted for too long, non-retryable status, retries used up).
+    """
+    for attempt in range(1, X_MAX_ATTEMPTS + 1):
+        wait = governor.before_request()
+        if wait is None:
+            print(f"[x_fetcher] Failing fast: {governor.state()['breaker']['state']} breaker / quota exhausted")
+            return None
+        if wait:
+            print(f"[x_fetcher] Quota exhausted. Waiting {wait:.1f}s for reset")
+            with stage("x_wait"):
+                time.sleep(wait)
 
-    tries, backoff = 0, 3
-    while tries < 3:
-        tries += 1
         try:
             r = requests.get(SEARCH_URL, headers=_auth_headers(), params=params, timeout=25)
-            if r.status_code == 429:
-                print(f"[x_fetcher] 429 Too Many Requests. Backoff {backoff}s (attempt {tries})")
-                time.sleep(backoff); backoff *= 2
-                continue
-
-            if r.status_code >= 400:
-                print(f"[x_fetcher] HTTP {r.status_code}: {r.text[:300]}")
-                # Don’t raise—retry then fallback
-                time.sleep(backoff); backoff *= 2
-                continue
-
-            data = r.json()
-            raw = data.get("data", []) or []
-            items = [{"id": t.get("id"), "text": t.get("text", "")} for t in raw][:max_results]
-            print(f"[x_fetcher] LIVE fetched {len(items)} items for query='{query}'")
-            return {"source": "LIVE", "items": items}
+        except Exception as e:
+            print(f"[x_fetcher] error: {type(e).__name__}: {e} (attempt {attempt})")
+            X_REQUESTS.inc(status="error")
+            action, delay = governor.on_error(attempt)
+        else:
+            X_REQUESTS.inc(status=r.status_code)
+            data = _body(r) if r.status_code < 400 else None
+            if r.status_code < 400 and data is None:
+                print(f"[x_fetcher] HTTP {r.status_code} without a JSON body: {r.text[:300]!r} (attempt {attempt})")
+                action, delay = governor.on_error(attempt)
+            else:
+                action, delay = governor.on_response(r.status_code, r.headers, attempt)
+                if action == OK:
+                    return data
+                print(f"[x_fetcher] HTTP {r.status_code}: {r.text[:300]} (attempt {attempt})")
+
+        if action == GIVE_UP:
+            return None
+        print(f"[x_fetcher] Retrying in {delay:.1f}s")
+        X_RETRIES.inc()
+        with stage("x_wait"):
+            time.sleep(delay)
 
+    return None
+
+def iter_recent_tweet_pages(query: str, max_results: int = 10, lang: str = "en", since_id: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Yields one {"source": "LIVE"|"DEMO", "items": [{"id","text","created_at"}]}
+    per page as it arrives, following meta.next_token until max_results tweets
+    were yielded or X has no more pages. With since_id, only tweets newer
+    than that ID are returned.
+    If the first page fails we yield the DEMO set; a later failure ends the
+    stream with an empty page marked {"truncated": True}. Never raises.
+    """
+    max_results = max(1, min(int(max_results), MAX_TOTAL))
+
+    reason = _demo_reason()
+    if reason:
+        yield _fallback(query, max_results, reason)
+        return
+
+    params = _base_params(query, lang, since_id)
+    got, pages = 0, 0
+    while got < max_results:
+        params["max_results"] = _page_size(max_results, got)
+
+        with stage("x_fetch"):
+            data = _get_page(params)
+        if data is None:
+            yield _page_failed(query, max_results, pages, got)
+            return
+
+        items, next_token = _parse_page(data, max_results - got)
+        pages += 1
+        got += len(items)
+        if pages == 1:
+            X_FETCHES.inc(source="LIVE")
+        print(f"[x_fetcher] LIVE page {pages}: {len(items)} items for query='{query}'")
+        yield {"source": "LIVE", "items": items}
+
+        if not next_token:
+            return
+        params["next_token"] = next_token
+
+def fetch_recent_tweets(query: str, max_results: int = 10, lang: str = "en", since_id: Optional[str] = None) -> Dict:
+    """
+    Returns: {"source": "LIVE"|"DEMO", "items": [{"id","text","created_at"}]}
+    Walks Recent Search pages (see iter_recent_tweet_pages) until max_results.
+    Never raises—falls back to DEMO with logs on failure.
+    """
+    source, items = "LIVE", []
+    for page in iter_recent_tweet_pages(query, max_results=max_results, lang=lang, since_id=since_id):
+        source = page["source"]
+        items.extend(page["items"])
+    return {"source": source, "items": items}
+
+# --- Async client (pooled keep-alive connections, non-blocking backoff) ---
+# One client per event loop; weak keys so a finished loop's client goes with it
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = weakref.WeakKeyDictionary()
+
+def _get_async_client() -> httpx.AsyncClient:
+    """One pooled AsyncClient per event loop, created lazily."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _async_clients[loop] = httpx.AsyncClient(
+            http2=X_HTTP2,
+            timeout=25,
+            limits=httpx.Limits(max_connections=X_MAX_CONNECTIONS, max_keepalive_connections=20),
+        )
+    return client
+
+async def aclose_async_client():
+    """Close the running loop's client (app shutdown); other loops keep theirs."""
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+async def _aget_page(params: Dict) -> Optional[Dict]:
+    """Async twin of _get_page(): same governor, but every wait is awaited."""
+    client = _get_async_client()
+    for attempt in range(1, X_MAX_ATTEMPTS + 1):
+        wait = governor.before_request()
+        if wait is None:
+            print(f"[x_fetcher] Failing fast: {governor.state()['breaker']['state']} breaker / quota exhausted")
+            return None
+        if wait:
+            print(f"[x_fetcher] Quota exhausted. Waiting {wait:.1f}s for reset")
+            with stage("x_wait"):
+                await asyncio.sleep(wait)
+
+        try:
+            r = await client.get(SEARCH_URL, headers=_auth_headers(), params=params)
         except Exception as e:
-            print(f"[x_fetcher] error: {type(e).__name__}: {e} (attempt {tries})")
-            time.sleep(backoff); backoff *= 2
+            print(f"[x_fetcher] error: {type(e).__name__}: {e} (attempt {attempt})")
+            X_REQUESTS.inc(status="error")
+            action, delay = governor.on_error(attempt)
+        else:
+            X_REQUESTS.inc(status=r.status_code)
+            data = _body(r) if r.status_code < 400 else None
+            if r.status_code < 400 and data is None:
+                print(f"[x_fetcher] HTTP {r.status_code} without a JSON body: {r.text[:300]!r} (attempt {attempt})")
+                action, delay = governor.on_error(attempt)
+            else:
+                action, delay = governor.on_response(r.status_code, r.headers, attempt)
+                if action == OK:
+                    return data
+                print(f"[x_fetcher] HTTP {r.status_code}: {r.text[:300]} (attempt {attempt})")
+
+        if action == GIVE_UP:
+            return None
+        print(f"[x_fetcher] Retrying in {delay:.1f}s")
+        X_RETRIES.inc()
+        with stage("x_wait"):
+            await asyncio.sleep(delay)
+
+    return None
+
+async def aiter_recent_tweet_pages(query: str, max_results: int = 10, lang: str = "en", since_id: Optional[str] = None) -> AsyncIterator[Dict]:
+    """Async version of iter_recent_tweet_pages(). Never raises."""
+    max_results = max(1, min(int(max_results), MAX_TOTAL))
+
+    reason = _demo_reason()
+    if reason:
+        yield _fallback(query, max_results, reason)
+        return
+
+    params = _base_params(query, lang, since_id)
+    got, pages = 0, 0
+    while got < max_results:
+        params["max_results"] = _page_size(max_results, got)
+
+        with stage("x_fetch"):
+            data = await _aget_page(params)
+        if data is None:
+            yield _page_failed(query, max_results, pages, got)
+            return
+
+        items, next_token = _parse_page(data, max_results - got)
+        pages += 1
+        got += len(items)
+        if pages == 1:
+            X_FETCHES.inc(source="LIVE")
+        print(f"[x_fetcher] LIVE page {pages}: {len(items)} items for query='{query}'")
+        yield {"source": "LIVE", "items": items}
+
+        if not next_token:
+            return
+        params["next_token"] = next_token
 
-    print("[x_fetcher] Falling back to DEMO after repeated failures.")
-    return _fallback(query, max_results)
+async def afetch_recent_tweets(query: str, max_results: int = 10, lang: str = "en", since_id: Optional[str] = None) -> Dict:
+    """Async version of fetch_recent_tweets(). Never raises."""
+    source, items = "LIVE", []
+    async for page in aiter_recent_tweet_pages(query, max_results=max_results, lang=lang, since_id=since_id):
+        source = page["source"]
+        items.extend(page["items"])
+    return {"source": source, "items": items}
@@ -1,17 +1,40 @@
 # backend/xai_client.py
 """
-Minimal sentiment scorer used by the aggregator.
-Returns a score in [-1.0, 1.0] and a label in {"pos","neu","neg"}.
+Sentiment scorers used by the aggregator.
+Every scorer returns, per text, a score in [-1.0, 1.0] and a label in
+{"pos","neu","neg"}.
 
-You can later replace `score_text()` to call xAI/Grok with your XAI_KEY
-and map the model output to this same schema.
+  - lexicon (default): score_text() / score_texts(), a local heuristic
+  - grok: xAI chat completions, many tweets per request, a bounded number
+    of requests in flight, results memoized by normalized-text hash
+    (store.ScoreMemo). Anything not scored by the deadline falls back to
+    the lexicon.
+
+XSENT_SCORER=grok (with XAI_KEY set) selects the LLM; get_scorer() returns
+the active one.
 """
 
 from __future__ import annotations
+import asyncio
+import hashlib
+import json
+import os
 import re
-from typing import Dict
+from itertools import repeat
+from typing import Dict, List, Optional
+
+import httpx
+
+from backend import lexicon
+from backend.metrics import counter, stage
+from backend.store import ScoreMemo, get_score_memo
 
-# Tiny lexicons (expand as you like)
+try:
+    import numpy as np
+except Exception:  # numpy is optional; score_texts falls back to the scalar loop
+    np = None
+
+# Tiny lexicons (expand as you like, or load TSV files via XSENT_LEXICON)
 POS_WORDS = {
     "bull", "bullish", "mooning", "pump", "pumped", "green", "surge",
     "great", "good", "strong", "optimistic", "win", "beats", "beat",
@@ -23,58 +46,376 @@ NEG_WORDS = {
     "risk", "scared", "fear", "fud", "😭", "💔", "💥",
 }
 NEGATORS = {"not", "no", "never", "hardly", "barely", "scarcely", "isn't", "wasn't", "don't", "doesn't", "didn't", "can't", "won't"}
+# Multi-word phrases; weight 0 just stops the words inside from counting
+PHRASES = {
+    "to the moon": 1.5, "buy the dip": 1.0, "all time high": 1.0, "new highs": 1.0,
+    "rug pull": -1.5, "rug pulled": -1.5, "going to zero": -1.5, "dead cat bounce": -1.0,
+    "not financial advice": 0.0, "no cap": 0.0,
+}
 
-# Words + a wide emoji block
-_word_re = re.compile(r"[A-Za-z0-9_]+|[\U0001F300-\U0001FAFF]")
+def _builtin_entries() -> Dict[str, object]:
+    entries: Dict[str, object] = {}
+    entries.update({w: -1.0 for w in NEG_WORDS})
+    entries.update({w: 1.0 for w in POS_WORDS})
+    entries.update({w: lexicon.NEGATOR for w in NEGATORS})
+    entries.update(PHRASES)
+    return entries
+
+# Extra lexicon files, os.pathsep-separated (term<TAB>weight per line)
+LEXICON_FILES = [p for p in os.getenv("XSENT_LEXICON", "").split(os.pathsep) if p.strip()]
+LEXICON = lexicon.load(_builtin_entries(), LEXICON_FILES)
 
 def _tokens(text: str):
-    return [t.lower() for t in _word_re.findall(text or "")]
+    return [t.decode("utf-8", "replace") for t in lexicon.tokenize(text)]
+
+_LABELS = ("neu", "pos", "neg")
+_MIN_VECTOR_BATCH = 8
+
+def _label(norm: float) -> str:
+    if norm > 0.05:
+        return "pos"
+    if norm < -0.05:
+        return "neg"
+    return "neu"
+
+def _normalize(score: float, text: str) -> float:
+    # Exclamation emphasis
+    exclam = text.count("!")
+    if exclam:
+        score *= min(1.0, 0.15 * exclam + 1.0)
+
+    # Normalize to [-1, 1]
+    if score > 0:
+        return min(1.0, score / 6.0)
+    if score < 0:
+        return max(-1.0, score / 6.0)
+    return 0.0
 
-def score_text(text: str) -> Dict[str, float | str]:
+def score_text(text: str, lex: Optional[lexicon.Lexicon] = None) -> Dict[str, float | str]:
     """
     Heuristic scorer. Output:
       { "score": float in [-1,1], "label": "pos"|"neu"|"neg" }
+    A negator flips the next weighted word/phrase/emoji.
     """
-    toks = _tokens(text)
-    if not toks:
-        return {"score": 0.0, "label": "neu"}
-
+    lex = lex or LEXICON
+    text = text or ""
     score = 0.0
     negate = False
-    for t in toks:
-        if t in NEGATORS:
+    for entry in lex.match(text):
+        if lex.negator[entry]:
             negate = True
             continue
 
-        delta = 0.0
-        if t in POS_WORDS:
-            delta = 1.0
-        elif t in NEG_WORDS:
-            delta = -1.0
-
+        delta = lex.weights[entry]
         if negate and delta != 0.0:
             delta = -delta
             negate = False
 
         score += delta
 
+    norm = _normalize(score, text)
+    return {"score": float(round(norm, 4)), "label": _label(norm)}
+
+
+def _lex_arrays(lex: lexicon.Lexicon):
+    arrays = getattr(lex, "_np", None)
+    if arrays is None:
+        arrays = lex._np = (
+            np.asarray(lex.tok_entry, dtype=np.int32),
+            np.asarray(lex.tok_phrase, dtype=bool),
+            np.asarray(lex.weights, dtype=np.float64),
+            np.asarray(lex.negator, dtype=bool),
+        )
+    return arrays
+
+def score_texts(texts: List[str], lex: Optional[lexicon.Lexicon] = None) -> List[Dict[str, float | str]]:
+    """
+    Batch version of score_text(). Same output, one dict per input text.
+
+    The whole batch is tokenized in a single regex pass over its UTF-8
+    bytes and tokens are mapped to integer lexicon IDs. Only tokens that can
+    start a phrase walk the phrase trie; scores, negation flips and labels
+    are then computed with NumPy array ops. Falls back to a plain loop when
+    NumPy is missing.
+    """
+    lex = lex or LEXICON
+    texts = [t or "" for t in texts]
+    if not texts:
+        return []
+    # Array setup costs more than it saves on tiny batches
+    if np is None or len(texts) < _MIN_VECTOR_BATCH:
+        return [score_text(t, lex) for t in texts]
+
+    n = len(texts)
+    tok_entry, tok_phrase, weights, negator = _lex_arrays(lex)
+    joined = "\x00".join(t.replace("\x00", " ") for t in texts) + "\x00"
+    toks = lexicon.token_re.findall(lexicon.prepare(joined))
+    tids = np.fromiter(map(lex.token_ids.get, toks, repeat(0)), dtype=np.int32, count=len(toks))
+    entries = tok_entry[tids]
+
+    # Phrases: resolve leftmost-longest matches, the tokens they cover stop counting
+    covered = 0
+    for i in np.flatnonzero(tok_phrase[tids]).tolist():
+        if i < covered:
+            continue
+        entry, span = lex.phrase_at(toks, i)
+        if span:
+            entries[i] = entry
+            entries[i + 1:i + span] = 0
+            covered = i + span
+
+    is_sep = tids == 1
+    doc = np.cumsum(is_sep) - is_sep            # text index of every token
+    pos = np.arange(tids.size)
+    w = weights[entries]
+
+    # A weighted entry is flipped when a negator appeared after the previous
+    # weighted entry (or text start) in the same text.
+    is_sent = w != 0.0
+    last_neg = np.maximum.accumulate(np.where(negator[entries], pos, -1))
+    last_reset = np.maximum.accumulate(np.where(is_sent | is_sep, pos, -1))
+    prev_reset = np.concatenate(([-1], last_reset[:-1]))
+    flipped = is_sent & (last_neg > prev_reset)
+
+    delta = np.where(flipped, -w, w)
+    score = np.bincount(doc[~is_sep], weights=delta[~is_sep], minlength=n)
+
     # Exclamation emphasis
-    exclam = text.count("!")
-    if exclam:
-        score *= min(1.0, 0.15 * exclam + 1.0)
+    exclam = np.fromiter((t.count("!") for t in texts), dtype=np.float64, count=n)
+    score = np.where(exclam > 0, score * np.minimum(1.0, 0.15 * exclam + 1.0), score)
 
     # Normalize to [-1, 1]
-    if score > 0:
-        norm = min(1.0, score / 6.0)
-    elif score < 0:
-        norm = max(-1.0, score / 6.0)
-    else:
-        norm = 0.0
+    norm = np.clip(score / 6.0, -1.0, 1.0)
+    label_ids = np.where(norm > 0.05, 1, np.where(norm < -0.05, 2, 0))
 
-    label = "neu"
-    if norm > 0.05:
-        label = "pos"
-    elif norm < -0.05:
-        label = "neg"
+    return [
+        {"score": round(v, 4), "label": _LABELS[k]}
+        for v, k in zip(norm.tolist(), label_ids.tolist())
+    ]
+
+
+# --- Pluggable scorers ---
+XSENT_SCORER = os.getenv("XSENT_SCORER", "lexicon").strip().lower()  # "lexicon" | "grok"
+XAI_KEY = os.getenv("XAI_KEY", "").strip()
+XAI_URL = os.getenv("XAI_URL", "https://api.x.ai/v1/chat/completions")
+XAI_MODEL = os.getenv("XAI_MODEL", "grok-3-mini")
+XAI_BATCH = int(os.getenv("XAI_BATCH", "50"))               # tweets per request
+XAI_CONCURRENCY = int(os.getenv("XAI_CONCURRENCY", "4"))    # requests in flight
+XAI_DEADLINE_S = float(os.getenv("XAI_DEADLINE_S", "15"))   # then lexicon for the rest
+XAI_TIMEOUT_S = float(os.getenv("XAI_TIMEOUT_S", "60"))
+
+SCORED = counter("xsent_scored_texts_total", "Texts scored, by scorer.", ["scorer"])
+LLM_REQUESTS = counter("xsent_llm_requests_total", "LLM scoring requests by outcome.", ["status"])
+LLM_MEMO_HITS = counter("xsent_llm_memo_hits_total", "Texts whose LLM score came from the memo.")
+LLM_FALLBACKS = counter("xsent_llm_lexicon_fallbacks_total", "Texts scored by the lexicon because the LLM missed the deadline or failed.")
+
+class LexiconScorer:
+    name = "lexicon"
+
+    def score(self, texts: List[str]) -> List[Dict[str, float | str]]:
+        SCORED.inc(len(texts), scorer=self.name)
+        with stage("score"):
+            return score_texts(texts)
+
+    async def ascore(self, texts: List[str]) -> List[Dict[str, float | str]]:
+        # on a worker thread, so the event loop keeps the next page's fetch moving meanwhile
+        return await asyncio.to_thread(self.score, texts)
+
+    async def aclose(self):
+        pass
+
+    def state(self) -> Dict:
+        return {"scorer": self.name, "lexicon_entries": len(LEXICON)}
+
+_SYSTEM_PROMPT = (
+    "You rate the sentiment of tweets about markets and events. "
+    "The user sends a JSON array of tweets. Reply with a JSON object "
+    '{"scores": [...]} holding one number per tweet, in the same order: '
+    "-1 very negative, 0 neutral, 1 very positive."
+)
+
+_url_re = re.compile(r"https?://\S+")
+_space_re = re.compile(r"\s+")
+
+def normalize_text(text: str) -> str:
+    """Case, whitespace and links folded away, so reposts share a memo entry."""
+    return _space_re.sub(" ", _url_re.sub(" ", text or "").lower()).strip()
+
+class GrokScorer:
+    """
+    Batched, concurrent LLM scorer. Use ascore() from async code; score()
+    runs it on a private event loop (lexicon when called inside a loop).
+    """
+
+    name = "grok"
+
+    def __init__(self, url: str = XAI_URL, key: str = XAI_KEY, model: str = XAI_MODEL,
+                 batch: int = XAI_BATCH, concurrency: int = XAI_CONCURRENCY,
+                 deadline_s: float = XAI_DEADLINE_S, memo: Optional[ScoreMemo] = None):
+        self.url = url
+        self.key = key
+        self.model = model
+        self.batch = max(1, batch)
+        self.concurrency = max(1, concurrency)
+        self.deadline_s = deadline_s
+        self.memo = memo
+        self.stats = {"texts": 0, "memo_hits": 0, "requests": 0, "sent": 0,
+                      "errors": 0, "lexicon_fallbacks": 0, "late_results": 0}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self._late = set()  # chunks still running past the deadline
+
+    def _memo_key(self, text: str) -> str:
+        return hashlib.sha1(f"{self.model}\n{normalize_text(text)}".encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _bind_loop(self):
+        """Client + semaphore belong to one event loop; recreate them on a new one."""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(timeout=XAI_TIMEOUT_S)
+            self._sem = asyncio.Semaphore(self.concurrency)
+            self._loop = loop
+
+    async def aclose(self):
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+
+    async def _score_chunk(self, chunk: List[tuple], late: List[bool]) -> Dict[str, float]:
+        """POST one chunk of (key, text); returns key -> score (empty on failure)."""
+        async with self._sem:
+            self.stats["requests"] += 1
+            self.stats["sent"] += len(chunk)
+            body = {
+                "model": self.model,
+                "temperature": 0,
+                "response_format": {"type": "json_object"},
+                "messages": [
+                    {"role": "system", "content": _SYSTEM_PROMPT},
+                    {"role": "user", "content": json.dumps([t for _, t in chunk], ensure_ascii=False)},
+                ],
+            }
+            try:
+                r = await self._client.post(self.url, json=body, headers={"Authorization": f"Bearer {self.key}"})
+                r.raise_for_status()
+                content = r.json()["choices"][0]["message"]["content"]
+                scores = json.loads(content)["scores"]
+                if len(scores) != len(chunk):
+                    raise ValueError(f"{len(scores)} scores for {len(chunk)} tweets")
+                out = {k: max(-1.0, min(1.0, float(v))) for (k, _), v in zip(chunk, scores)}
+            except Exception as e:
+                self.stats["errors"] += 1
+                LLM_REQUESTS.inc(status="error")
+                msg = (str(e).splitlines() or [""])[0]
+                print(f"[xai_client] scoring request failed: {type(e).__name__}: {msg}")
+                return {}
+        LLM_REQUESTS.inc(status="ok")
+        if self.memo is not None:
+            await asyncio.to_thread(self.memo.put_many, out)  # sqlite write, off the loop
+        if late[0]:
+            self.stats["late_results"] += len(out)
+        return out
+
+    async def ascore(self, texts: List[str]) -> List[Dict[str, float | str]]:
+        texts = [t or "" for t in texts]
+        if not texts:
+            return []
+        SCORED.inc(len(texts), scorer=self.name)
+        with stage("score"):
+            return await self._ascore(texts)
+
+    async def _ascore(self, texts: List[str]) -> List[Dict[str, float | str]]:
+        self._bind_loop()
+        self.stats["texts"] += len(texts)
+        keys = [self._memo_key(t) for t in texts]
+        known = await asyncio.to_thread(self.memo.get_many, set(keys)) if self.memo is not None else {}
+        hits = sum(k in known for k in keys)
+        self.stats["memo_hits"] += hits
+        LLM_MEMO_HITS.inc(hits)
+
+        todo = {}  # distinct misses, key -> text
+        for k, t in zip(keys, texts):
+            if k not in known and normalize_text(t):
+                todo.setdefault(k, t)
+        todo = list(todo.items())
+        late = [False]
+        tasks = [
+            asyncio.ensure_future(self._score_chunk(todo[i:i + self.batch], late))
+            for i in range(0, len(todo), self.batch)
+        ]
+        if tasks:
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline_s)
+            for task in done:
+                known.update(task.result())
+            if pending:
+                # Already paid for: let them finish and fill the memo for next time
+                late[0] = True
+                self._late.update(pending)
+                for task in pending:
+                    task.add_done_callback(self._late.discard)
+
+        out: List[Optional[Dict[str, float | str]]] = []
+        missing = []
+        for i, (k, t) in enumerate(zip(keys, texts)):
+            v = known.get(k)
+            if v is None and normalize_text(t):
+                missing.append(i)
+                out.append(None)
+            else:
+                v = v or 0.0
+                out.append({"score": round(v, 4), "label": _label(v)})
+        if missing:
+            self.stats["lexicon_fallbacks"] += len(missing)
+            LLM_FALLBACKS.inc(len(missing))
+            for i, s in zip(missing, score_texts([texts[i] for i in missing])):
+                out[i] = s
+        return out
+
+    def score(self, texts: List[str]) -> List[Dict[str, float | str]]:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._score_once(texts))
+        return LexiconScorer().score(texts)  # never block a running loop
+
+    async def _score_once(self, texts: List[str]) -> List[Dict[str, float | str]]:
+        try:
+            return await self.ascore(texts)
+        finally:
+            await self.aclose()
+
+    def state(self) -> Dict:
+        return {
+            "scorer": self.name,
+            "model": self.model,
+            "batch": self.batch,
+            "concurrency": self.concurrency,
+            "deadline_s": self.deadline_s,
+            "memo": len(self.memo) if self.memo is not None else None,
+            "in_flight_late": len(self._late),
+            **self.stats,
+        }
+
+_scorer = None
+
+def get_scorer():
+    """Active scorer, chosen by XSENT_SCORER (lexicon unless grok + XAI_KEY)."""
+    global _scorer
+    if _scorer is None:
+        if XSENT_SCORER == "grok" and XAI_KEY:
+            _scorer = GrokScorer(memo=get_score_memo())
+        else:
+            if XSENT_SCORER == "grok":
+                print("[xai_client] WARNING: XSENT_SCORER=grok but XAI_KEY is missing. Using the lexicon scorer.")
+            _scorer = LexiconScorer()
+    return _scorer
+
+def set_scorer(scorer):
+    """Swap the active scorer (benchmarks, tests)."""
+    global _scorer
+    _scorer = scorer
 
-    return {"score": float(round(norm, 4)), "label": label}
+async def ascore_texts(texts: List[str]) -> List[Dict[str, float | str]]:
+    """score_texts() through the active scorer."""
+    return await get_scorer().ascore(texts)
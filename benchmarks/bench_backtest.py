@@ -0,0 +1,45 @@
+# benchmarks/bench_backtest.py
+"""
+Parameter-sweep speed of backend.backtest on synthetic data: `--days` of
+hourly bars against a (threshold x ratio x max_price) grid.
+
+Run:  python -m benchmarks.bench_backtest [--days 180]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from backend import backtest
+
+def make_bars(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    price = np.clip(50 + np.cumsum(rng.normal(0, 2, n)), 1, 99)
+    return {
+        "avg": np.clip(rng.normal(0, 0.2, n), -1, 1),
+        "pos": rng.integers(0, 30, n).astype(np.float64),
+        "neg": rng.integers(0, 30, n).astype(np.float64),
+        "price": price,
+        "next_px": np.append(price[1:], 100.0),
+    }
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=180)
+    ap.add_argument("--bar", type=int, default=3600, help="bar width in seconds")
+    args = ap.parse_args()
+
+    bars = make_bars(args.days * 86400 // args.bar)
+    params = backtest.grid(np.arange(0, 0.5, 0.01), np.arange(1, 4.01, 0.25), np.arange(40, 101, 5))
+    for hold in ("flat", "keep"):
+        t0 = time.perf_counter()
+        backtest.run(bars, params, hold=hold)
+        secs = time.perf_counter() - t0
+        cells = params["threshold"].size * bars["avg"].size
+        print(f"hold={hold:<5} {params['threshold'].size:,} params x {bars['avg'].size:,} bars  "
+              f"{secs:.2f}s  ({cells / secs / 1e6:,.0f}M cells/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+# benchmarks/bench_batch.py
+"""
+Memory per scored tweet: the old list of item dicts vs backend.batch.ScoredBatch
+(measured with tracemalloc), plus the cost of what callers do with a result:
+aggregate it, slice a page, and turn it back into dicts / JSON.
+
+Run:  python -m benchmarks.bench_batch [--tweets 300] [--results 200]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from backend.batch import ScoredBatch
+from backend.responses import dumps
+from benchmarks.bench_responses import make_result
+
+def _traced(build):
+    """(object, bytes it allocated)."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    obj = build()
+    gc.collect()
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return obj, used
+
+def _fresh(it):
+    """A copy with its own strings, as a JSON decode or a new analysis produces them."""
+    return {k: (v.encode("utf-8").decode("utf-8") if isinstance(v, str) else v) for k, v in it.items()}
+
+def _time(fn, reps: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) / reps
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tweets", type=int, default=300, help="tweets per result (the API maximum)")
+    ap.add_argument("--results", type=int, default=200, help="results held at once, e.g. a full cache")
+    ap.add_argument("--reps", type=int, default=200)
+    args = ap.parse_args()
+    items = make_result(args.tweets)["items"]
+
+    dicts, dict_bytes = _traced(lambda: [[_fresh(it) for it in items] for _ in range(args.results)])
+    batches, batch_bytes = _traced(lambda: [ScoredBatch(items) for _ in range(args.results)])
+    n = args.tweets * args.results
+    text_bytes = sum(len(it["text"].encode("utf-8")) for it in items) * args.results
+    print(f"{args.results} results x {args.tweets} tweets = {n:,} tweets; {text_bytes / n:.0f} bytes of UTF-8 text per tweet\n")
+    print(f"{'layout':<22} {'MB':>8} {'bytes/tweet':>12}")
+    print(f"{'list of dicts (before)':<22} {dict_bytes / 1e6:8.1f} {dict_bytes / n:12.0f}")
+    print(f"{'ScoredBatch':<22} {batch_bytes / 1e6:8.1f} {batch_bytes / n:12.0f}   ({dict_bytes / batch_bytes:.1f}x smaller)")
+
+    batch, rows = batches[0], dicts[0]
+    assert batch.to_dicts() == items and batch.aggregate()["counts"] == {
+        k: sum(1 for it in items if it["label"] == k) for k in ("pos", "neg", "neu")}
+    assert dumps(batch) == dumps(items)
+
+    print(f"\n{'operation':<28} {'dicts us':>9} {'batch us':>9}")
+    cases = [
+        ("aggregate", lambda: (sum(it["score"] for it in rows), [it["label"] for it in rows].count("pos")),
+         lambda: (batch.total(), batch.counts())),
+        ("page [100:120]", lambda: rows[100:120], lambda: batch[100:120]),
+        ("fields=id,score", lambda: [{"id": it["id"], "score": it["score"]} for it in rows],
+         lambda: batch.to_dicts(("id", "score"))),
+        ("JSON body", lambda: dumps(rows), lambda: dumps(batch)),
+    ]
+    for name, before, after in cases:
+        print(f"{name:<28} {_time(before, args.reps) * 1e6:9.1f} {_time(after, args.reps) * 1e6:9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+# benchmarks/bench_bulk.py
+"""
+backend.bulk_score on a synthetic archive: tweets/s for 1..N worker
+processes over a plain and a gzip JSONL file, then an interrupted run
+(half the chunks forgotten) resumed, whose aggregates must equal a clean
+run's and the numbers computed directly.
+
+Run:  python -m benchmarks.bench_bulk [--tweets 400000] [--workers 1,2,4]
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+import random
+import tempfile
+import time
+
+import numpy as np
+
+from backend import bulk_score
+from backend.xai_client import score_texts
+from benchmarks.bench_scorer import make_corpus
+
+QUERIES = ["bitcoin", "cpi", "fed", "election", "rain"]
+
+def make_archive(path: str, n: int, seed: int = 9):
+    rng = random.Random(seed)
+    texts = make_corpus(min(n, 50_000), seed)
+    t0 = 1_767_225_600  # 2026-01-01
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as f:
+        for i in range(n):
+            ts = t0 + rng.randint(0, 7 * 86400)
+            f.write(json.dumps({
+                "id": str(1_800_000_000_000_000_000 + i),
+                "text": texts[i % len(texts)],
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(ts)),
+                "query": QUERIES[i % len(QUERIES)],
+            }) + "\n")
+
+def direct_aggregates(path: str, bucket_s: int):
+    """(query, bucket_start) -> (n, mean) straight from the file, one process, no chunking."""
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f]
+    scores = [s["score"] for s in score_texts([r["text"] for r in rows])]
+    acc = {}
+    for r, s in zip(rows, scores):
+        ts = bulk_score.parse_ts(r["created_at"])
+        key = (r["query"], int(ts // bucket_s) * bucket_s)
+        n, total = acc.get(key, (0, 0.0))
+        acc[key] = (n + 1, total + float(np.float32(s)))
+    return {k: (n, total / n) for k, (n, total) in acc.items()}
+
+def _agg(out: str):
+    a = bulk_score.load(os.path.join(out, f"aggregates.{'parquet' if bulk_score.pq is not None else 'npz'}"))
+    return {(str(q), int(b)): (int(n), float(m)) for q, b, n, m in zip(a["query"], a["bucket_start"], a["n"], a["mean"])}
+
+def _same(a, b) -> bool:
+    return a.keys() == b.keys() and all(a[k][0] == b[k][0] and abs(a[k][1] - b[k][1]) < 1e-6 for k in a)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--tweets", type=int, default=400_000)
+    ap.add_argument("--workers", default=None, help="comma-separated worker counts (default 1,2,4,.. up to CPUs)")
+    ap.add_argument("--chunk-mb", type=float, default=4.0)
+    ap.add_argument("--bucket", type=int, default=3600)
+    args = ap.parse_args()
+    cpus = os.cpu_count() or 1
+    counts = [int(w) for w in args.workers.split(",")] if args.workers else \
+        sorted({1, *[w for w in (2, 4, 8, 16, 32) if w <= cpus], cpus})
+    print(f"{cpus} CPUs; {args.tweets:,} tweets; parquet={bulk_score.pq is not None}")
+
+    with tempfile.TemporaryDirectory() as d:
+        plain, gz = os.path.join(d, "archive.jsonl"), os.path.join(d, "archive.jsonl.gz")
+        make_archive(plain, args.tweets)
+        make_archive(gz, args.tweets)
+        print(f"archive: {os.path.getsize(plain) / 1e6:.0f} MB plain, {os.path.getsize(gz) / 1e6:.0f} MB gzip\n")
+
+        base = {}
+        for path in (plain, gz):
+            for w in counts:
+                out = os.path.join(d, "out")
+                s = bulk_score.run([path], out, workers=w, chunk_bytes=int(args.chunk_mb * (1 << 20)),
+                                   chunk_lines=50_000, bucket_s=args.bucket, restart=True)
+                base.setdefault(path, s["rows_per_s"])
+                print(f"{os.path.basename(path):<18} workers={w:<3} {s['seconds']:7.2f}s {s['rows_per_s']:>11,.0f} tweets/s "
+                      f"speedup={s['rows_per_s'] / base[path]:.2f}x  chunks={s['chunks']}")
+
+        # interrupted run: forget half the finished chunks, resume, compare
+        out = os.path.join(d, "resume")
+        bulk_score.run([plain], out, workers=counts[-1], chunk_bytes=int(args.chunk_mb * (1 << 20)) // 4,
+                       bucket_s=args.bucket, restart=True)
+        clean = _agg(out)
+        with open(os.path.join(out, "done.log")) as f:
+            ids = f.read().split()
+        with open(os.path.join(out, "done.log"), "w") as f:
+            f.write("".join(i + "\n" for i in ids[: len(ids) // 2]))
+        s = bulk_score.run([plain], out, workers=counts[-1], chunk_bytes=int(args.chunk_mb * (1 << 20)) // 4,
+                           bucket_s=args.bucket)
+        resumed = _agg(out)
+        direct = direct_aggregates(plain, args.bucket)
+        print(f"\nresume: {s['chunks_resumed']} chunks kept, {s['chunks']} redone, {s['aggregate_rows']} aggregate rows; "
+              f"matches clean run: {_same(clean, resumed)}, matches direct: {_same(direct, resumed)}")
+        assert _same(clean, resumed) and _same(direct, resumed)
+
+if __name__ == "__main__":
+    main()
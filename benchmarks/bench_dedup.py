@@ -0,0 +1,58 @@
+# benchmarks/bench_dedup.py
+"""
+Throughput of the dedup stage on a synthetic flood: half exact copies and
+retweets, a quarter copies with different links, some one-word edits, the
+rest original tweets.
+
+Run:  python -m benchmarks.bench_dedup [--total 100000] [--batch 100]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from typing import Dict, List
+
+from backend.dedup import Deduper
+
+def make_flood(n: int, seed: int = 3) -> List[Dict]:
+    rng = random.Random(seed)
+    vocab = [f"w{i}" for i in range(5000)]
+    originals = [" ".join(rng.choice(vocab) for _ in range(rng.randint(8, 25))) for _ in range(max(1, n // 7))]
+    out = []
+    for i in range(n):
+        r = rng.random()
+        text = rng.choice(originals)
+        if r < 0.25:
+            pass
+        elif r < 0.5:
+            text = f"RT @user{rng.randint(0, 999)}: {text}"
+        elif r < 0.75:
+            text = f"{text} https://t.co/{rng.getrandbits(40):x}"
+        elif r < 0.9:
+            words = text.split()
+            words[rng.randrange(len(words))] = rng.choice(vocab)
+            text = " ".join(words)
+        else:
+            text = " ".join(rng.choice(vocab) for _ in range(rng.randint(8, 25)))
+        out.append({"id": str(i), "text": text})
+    return out
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--total", type=int, default=100_000)
+    ap.add_argument("--batch", type=int, default=100, help="tweets per filter() call (a fetched page)")
+    args = ap.parse_args()
+
+    flood = make_flood(args.total)
+    dedup = Deduper()
+    t0 = time.perf_counter()
+    for i in range(0, len(flood), args.batch):
+        dedup.filter(flood[i:i + args.batch])
+    secs = time.perf_counter() - t0
+    rep = dedup.report(top=0)
+    print(f"{len(flood) / secs:,.0f} tweets/s  kept={rep['kept']} exact={rep['exact']} near={rep['near']} "
+          f"window={len(dedup._clusters)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# benchmarks/bench_fetch.py
+"""
+Time-to-first-result and total wall time for a multi-page analysis against
+the local Recent Search stand-in.
+
+  fetch-then-score : fetch_recent_tweets() for all pages, then score_texts()
+  pipelined        : analyze_topic() (scores page N while N+1 is in flight)
+
+Run:  python -m benchmarks.bench_fetch [--max-results 300] [--latency 0.2]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from backend import x_fetcher
+from backend.aggregator import analyze_topic
+from backend.xai_client import score_texts
+from benchmarks.fake_x import FakeXServer
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--max-results", type=int, default=300)
+    ap.add_argument("--latency", type=float, default=0.2, help="seconds per page request")
+    args = ap.parse_args()
+
+    with FakeXServer(total=1000, latency=args.latency) as fake:
+        x_fetcher.SEARCH_URL = fake.url
+        x_fetcher.X_BEARER = x_fetcher.X_BEARER or "fake"
+
+        t0 = time.perf_counter()
+        fetched = x_fetcher.fetch_recent_tweets("bench", max_results=args.max_results)
+        score_texts([t["text"] for t in fetched["items"]])
+        seq = time.perf_counter() - t0
+        print(f"fetch-then-score  n={len(fetched['items']):<4} first={seq:.3f}s total={seq:.3f}s")
+
+        t0 = time.perf_counter()
+        pages = x_fetcher.iter_recent_tweet_pages("bench", max_results=args.max_results)
+        first = None
+        n = 0
+        for page in pages:
+            score_texts([t["text"] for t in page["items"]])
+            n += len(page["items"])
+            if first is None:
+                first = time.perf_counter() - t0
+        print(f"page stream       n={n:<4} first={first:.3f}s total={time.perf_counter() - t0:.3f}s")
+
+        t0 = time.perf_counter()
+        res = analyze_topic("bench", max_results=args.max_results)
+        print(f"pipelined         n={res['n']:<4} total={time.perf_counter() - t0:.3f}s  pages={fake.requests}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/bench_llm.py
+"""
+Wall time to score one analysis window with the LLM scorer against the
+local xAI stand-in:
+
+  per-tweet   : one request per tweet, one at a time (batch=1, concurrency=1)
+  batched     : XAI_BATCH tweets per request, XAI_CONCURRENCY in flight
+  memoized    : the same window again, served from the score memo
+
+Run:  python -m benchmarks.bench_llm [--n 300] [--latency 0.3]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+from backend.store import ScoreMemo
+from backend.xai_client import GrokScorer
+from benchmarks.fake_x import make_tweets
+from benchmarks.fake_xai import FakeXAIServer
+
+async def _run(scorer: GrokScorer, texts):
+    try:
+        t0 = time.perf_counter()
+        await scorer.ascore(texts)
+        return time.perf_counter() - t0
+    finally:
+        await scorer.aclose()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=300, help="tweets per window")
+    ap.add_argument("--latency", type=float, default=0.3, help="seconds per request")
+    ap.add_argument("--per-tweet", type=float, default=0.002, help="extra seconds per tweet in a request")
+    ap.add_argument("--batch", type=int, default=50)
+    ap.add_argument("--concurrency", type=int, default=4)
+    ap.add_argument("--per-tweet-cap", type=int, default=50, help="tweets timed in per-tweet mode (then extrapolated)")
+    args = ap.parse_args()
+
+    texts = [t["text"] + f" #{i}" for i, t in enumerate(make_tweets(args.n))]
+    with FakeXAIServer(latency=args.latency, per_tweet=args.per_tweet) as fake, \
+            tempfile.TemporaryDirectory() as d:
+        n = min(args.n, args.per_tweet_cap)
+        slow = GrokScorer(url=fake.url, key="fake", batch=1, concurrency=1, deadline_s=3600)
+        secs = asyncio.run(_run(slow, texts[:n])) * args.n / n
+        print(f"per-tweet  n={args.n:<4} {secs:7.2f}s{'  (extrapolated)' if n < args.n else ''}  requests={fake.requests}")
+
+        fake.requests = 0
+        memo = ScoreMemo(os.path.join(d, "scores.db"))
+        fast = GrokScorer(url=fake.url, key="fake", batch=args.batch, concurrency=args.concurrency,
+                          deadline_s=3600, memo=memo)
+        secs = asyncio.run(_run(fast, texts))
+        print(f"batched    n={args.n:<4} {secs:7.2f}s  requests={fake.requests}")
+
+        fake.requests = 0
+        secs = asyncio.run(_run(fast, texts))
+        print(f"memoized   n={args.n:<4} {secs:7.2f}s  requests={fake.requests}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_orderbook.py
+"""
+Order-book delta application (backend/kalshi_ws.py).
+
+  book.delta        OrderBook.delta() alone, the array update
+  feed.handle dict  MarketFeed.handle() on decoded messages (seq check + routing)
+  feed.handle json  the same from raw JSON text, as read off the socket
+  websocket         end to end through FakeKalshiWS, with seq gaps every
+                    --gap-every deltas; the books must match the server's
+                    afterwards. Deltas that arrive on a subscription after
+                    its gap (until the re-snapshot) are dropped, so fewer
+                    are applied than sent
+
+Run:  python -m benchmarks.bench_orderbook [--deltas 200000] [--tickers 50]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from backend.kalshi_auth import KalshiClient
+from backend.kalshi_ws import LEVELS, MarketFeed, OrderBook
+from benchmarks.fake_kalshi_ws import FakeKalshiWS
+
+def _deltas(n: int, tickers, seed: int = 3):
+    rng = random.Random(seed)
+    return [{"market_ticker": rng.choice(tickers), "side": "yes" if rng.random() < 0.5 else "no",
+             "price": rng.randint(1, 99), "delta": rng.randint(-50, 60)} for _ in range(n)]
+
+def _line(name: str, n: int, wall: float, extra: str = ""):
+    print(f"{name:<22} n={n:<8} {wall:7.3f}s {n / wall:12,.0f} msgs/s {wall / n * 1e6:7.2f} us/msg{extra}")
+
+def _feed(tickers) -> MarketFeed:
+    """A feed with one subscription (sid 1) holding every ticker, books snapshotted."""
+    feed = MarketFeed(url="ws://unused")
+    feed._sid_tickers[1] = list(tickers)
+    for t in tickers:
+        feed.tickers.add(t)
+        feed.books[t] = OrderBook(t)
+        feed.handle({"type": "orderbook_snapshot", "sid": 1,
+                     "msg": {"market_ticker": t, "yes": [[40, 100]], "no": [[55, 100]]}})
+    return feed
+
+def _book_state(book: OrderBook):
+    return {"yes": {p: book.yes[p] for p in range(LEVELS) if book.yes[p]},
+            "no": {p: book.no[p] for p in range(LEVELS) if book.no[p]}}
+
+def bench_local(n: int, tickers):
+    bodies = _deltas(n, tickers)
+
+    books = {t: OrderBook(t) for t in tickers}
+    for b in books.values():
+        b.snapshot([[40, 100]], [[55, 100]])
+    t0 = time.perf_counter()
+    for d in bodies:
+        books[d["market_ticker"]].delta(d["side"], d["price"], d["delta"])
+    _line("book.delta", n, time.perf_counter() - t0)
+
+    msgs = [{"type": "orderbook_delta", "sid": 1, "seq": i + 2, "msg": d} for i, d in enumerate(bodies)]
+    feed = _feed(tickers)
+    feed._seq[1] = 1
+    t0 = time.perf_counter()
+    for m in msgs:
+        feed.handle(m)
+    _line("feed.handle dict", n, time.perf_counter() - t0)
+    assert feed.stats["gaps"] == 0 and all(_book_state(feed.books[t]) == _book_state(books[t]) for t in tickers)
+
+    raw = [json.dumps(m) for m in msgs]
+    feed = _feed(tickers)
+    feed._seq[1] = 1
+    t0 = time.perf_counter()
+    for r in raw:
+        feed.handle(r)
+    _line("feed.handle json", n, time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    for i in range(n):
+        feed.quote(tickers[i % len(tickers)])
+    _line("feed.quote", n, time.perf_counter() - t0)
+
+async def _ws_run(srv: FakeKalshiWS, feed: MarketFeed, tickers, n: int, chunk: int):
+    await feed.subscribe(tickers)
+    for _ in range(200):
+        if feed.connected and not any(b.stale for b in feed.books.values()):
+            break
+        await asyncio.sleep(0.01)
+    t0 = time.perf_counter()
+    done = 0
+    while done < n:
+        k = min(chunk, n - done)
+        await asyncio.to_thread(srv.publish, k)
+        done += k
+        await _settle(feed)
+    wall = time.perf_counter() - t0
+    # a gap is only seen on the next delta: send one so a skip in the last burst is caught too
+    await asyncio.to_thread(srv.publish, 1)
+    await _settle(feed)
+    await feed.stop()
+    return wall
+
+async def _settle(feed: MarketFeed, quiet: float = 0.02):
+    """Wait until the feed has drained the socket and no book is waiting for a re-snapshot."""
+    seen = -1
+    while seen != feed.stats["messages"] or any(b.stale for b in feed.books.values()):
+        seen = feed.stats["messages"]
+        await asyncio.sleep(quiet)
+
+def bench_ws(n: int, tickers, gap_every: int, chunk: int):
+    with tempfile.TemporaryDirectory() as d:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        key_path = os.path.join(d, "bench.pem")
+        with open(key_path, "wb") as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                      serialization.NoEncryption()))
+        with FakeKalshiWS(tickers, gap_every=gap_every, public_key=key.public_key()) as srv:
+            feed = MarketFeed(url=srv.url, client=KalshiClient(key_id="bench", key_path=key_path))
+            wall = asyncio.run(_ws_run(srv, feed, tickers, n, chunk))
+            st = feed.state()
+            _line("websocket", st["deltas"], wall,
+                  f"  sent={srv.sent} gaps={st['gaps']} resyncs={st['resyncs']} snapshots={st['snapshots']}")
+            bad = [t for t in tickers if _book_state(feed.books[t]) != srv.truth(t)]
+            assert not bad, f"books differ from the server: {bad[:5]}"
+            print(f"{'':<22} all {len(tickers)} books match the server")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--deltas", type=int, default=200_000)
+    ap.add_argument("--ws-deltas", type=int, default=20_000)
+    ap.add_argument("--tickers", type=int, default=50)
+    ap.add_argument("--gap-every", type=int, default=5_000, help="skip one seq every N deltas on the websocket")
+    ap.add_argument("--burst", type=int, default=1_000, help="deltas published between waits for the feed")
+    args = ap.parse_args()
+
+    tickers = [f"KXBTC-{i:05d}" for i in range(args.tickers)]
+    bench_local(args.deltas, tickers)
+    bench_ws(args.ws_deltas, tickers, args.gap_every, args.burst)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+# benchmarks/bench_orders.py
+"""
+Order submission: the old path (place_order(), one blocking signed POST at a
+time) vs the async OrderPipeline, concurrent and batched, against the fake
+exchange over HTTP and in-process (mock_transport, no sockets).
+
+The last run drops every 5th response after the exchange has executed it;
+retries reuse the client_order_id, so the exchange must end up with exactly
+one order per request.
+
+Run:  python -m benchmarks.bench_orders [--orders 200] [--latency 0.02]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from backend import kalshi_auth
+from backend.kalshi_auth import KalshiClient, order_body
+from backend.orders import OrderPipeline
+from benchmarks.fake_kalshi import FakeKalshiServer, MockExchange, mock_transport
+from benchmarks.run import latency_stats
+
+def _bodies(n: int):
+    return [order_body(f"KXBTC-{i % 50:05d}", "buy", 40 + i % 20, 1) for i in range(n)]
+
+def _line(name: str, n: int, wall: float, lat=None, extra: str = ""):
+    stats = latency_stats(lat) if lat else {}
+    tail = f"  p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms" if stats else ""
+    print(f"{name:<34} n={n:<5} {wall:7.3f}s {n / wall:9.0f} orders/s{tail}{extra}")
+
+async def _singles(p: OrderPipeline, bodies):
+    lat = []
+
+    async def one(b):
+        t0 = time.perf_counter()
+        res = await p.submit(b)
+        lat.append(time.perf_counter() - t0)
+        return res
+
+    return await asyncio.gather(*(one(b) for b in bodies)), lat
+
+async def _run(p: OrderPipeline, bodies, batched: bool):
+    try:
+        if batched:
+            return await p.submit_many(bodies), None
+        return await _singles(p, bodies)
+    finally:
+        await p.aclose()
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--orders", type=int, default=200)
+    ap.add_argument("--latency", type=float, default=0.02, help="seconds per exchange request")
+    ap.add_argument("--concurrency", type=int, default=10)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as d:
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        key_path = os.path.join(d, "bench.pem")
+        with open(key_path, "wb") as f:
+            f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                      serialization.NoEncryption()))
+        n = args.orders
+
+        with FakeKalshiServer(latency=args.latency, public_key=key.public_key()) as fake:
+            client = KalshiClient(base=fake.url, key_id="bench", key_path=key_path)
+            kalshi_auth._client = client
+
+            bodies = _bodies(n)
+            lat = []
+            t0 = time.perf_counter()
+            for b in bodies:
+                t1 = time.perf_counter()
+                kalshi_auth.kalshi_request("POST", "/trade-api/v2/portfolio/orders", json_body=b)
+                lat.append(time.perf_counter() - t1)
+            _line("place_order loop (HTTP)", n, time.perf_counter() - t0, lat)
+
+            for batched in (False, True):
+                p = OrderPipeline(client=client, concurrency=args.concurrency, use_batch=batched)
+                p.signer.warm("POST", "/trade-api/v2/portfolio/orders")
+                time.sleep(0.2)  # let the pre-signer fill up, as it would between orders
+                t0 = time.perf_counter()
+                res, lat = asyncio.run(_run(p, _bodies(n), batched))
+                st = p.state()
+                _line(f"pipeline {'batched' if batched else 'concurrent'} (HTTP)", n, time.perf_counter() - t0, lat,
+                      f"  requests={st['requests']} presigned={st['presigned_hits']}/{st['presigned_hits'] + st['presigned_misses']}")
+                assert all(r["status"] == "accepted" for r in res), {r["status"] for r in res}
+
+        for batched in (False, True):
+            ex = MockExchange()
+            p = OrderPipeline(client=client, transport=mock_transport(ex, latency=args.latency),
+                              concurrency=args.concurrency, use_batch=batched)
+            t0 = time.perf_counter()
+            res, lat = asyncio.run(_run(p, _bodies(n), batched))
+            _line(f"pipeline {'batched' if batched else 'concurrent'} (in-process)", n,
+                  time.perf_counter() - t0, lat)
+
+        ex = MockExchange()
+        p = OrderPipeline(client=client, transport=mock_transport(ex, latency=args.latency, drop_every=5),
+                          concurrency=args.concurrency, use_batch=False, backoff_s=0.0)
+        t0 = time.perf_counter()
+        res, lat = asyncio.run(_run(p, _bodies(n), False))
+        counts = {}
+        for r in res:
+            counts[r["status"]] = counts.get(r["status"], 0) + 1
+        _line("lossy link, retried (in-process)", n, time.perf_counter() - t0, lat,
+              f"  results={counts} exchange_orders={len(ex.orders)} retries={p.stats['retries']}")
+        assert len(ex.orders) == n, "an order was filled twice"
+
+        # a proxy answering with an HTML error page: every order fails cleanly, nothing raises
+        page = httpx.MockTransport(lambda req: httpx.Response(502, text="<html>502 Bad Gateway</html>"))
+        for batched in (False, True):
+            p = OrderPipeline(client=client, transport=page, use_batch=batched, backoff_s=0.0)
+            res = asyncio.run(p.submit_many(_bodies(4)))
+            assert [r["status"] for r in res] == ["failed"] * 4 and "502 Bad Gateway" in res[0]["error"], res
+        print("non-JSON 502 page: orders reported failed, no exception")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_responses.py
+"""
+Cost of one /api/sentiment body: the old path (json.dumps of the full
+result) vs the response modes of backend/responses.py, on a 300-item result.
+Prints encode+compress time per response and bytes on the wire.
+
+Run:  python -m benchmarks.bench_responses [--items 300] [--reps 500]
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import time
+
+from backend import responses
+from backend.responses import encode, parse_fields, shape
+from backend.xai_client import score_texts
+from benchmarks.bench_scorer import make_corpus
+
+def make_result(n: int, seed: int = 5):
+    rng = random.Random(seed)
+    texts = [t + f" https://t.co/{rng.getrandbits(40):x} #bitcoin @user{rng.randint(0, 9999)}" for t in make_corpus(n, seed)]
+    items = [{"id": str(1_800_000_000_000_000_000 + i), "text": t, "score": float(s["score"]), "label": s["label"],
+              "created_at": f"2026-10-17T12:{i % 60:02d}:00.000Z"} for i, (t, s) in enumerate(zip(texts, score_texts(texts)))]
+    counts = {k: sum(1 for it in items if it["label"] == k) for k in ("pos", "neg", "neu")}
+    return {
+        "query": "bitcoin", "requested": n, "n": n, "avg_score": round(sum(it["score"] for it in items) / n, 4),
+        "counts": counts, "items": items, "source": "LIVE", "fetched": n,
+        "dedup": {"seen": n, "kept": n, "exact": 0, "near": 0,
+                  "clusters": [{"id": it["id"], "size": 2, "text": it["text"]} for it in items[:5]]},
+        "cache": {"hit": True, "age_s": 1.2, "ttl_s": 30.0},
+    }
+
+def _time(fn, reps: int) -> float:
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(reps):
+        fn()
+    return (time.perf_counter() - t0) / reps
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=300)
+    ap.add_argument("--reps", type=int, default=500)
+    args = ap.parse_args()
+    data = make_result(args.items)
+
+    def old():
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    cases = [
+        ("full, json.dumps (before)", old),
+        ("full, json", lambda: encode(shape(data))[0]),
+        ("full, json + gzip", lambda: encode(shape(data), accept_encoding="gzip")[0]),
+        ("full, json + zstd", lambda: encode(shape(data), accept_encoding="zstd")[0]),
+        ("full, msgpack + zstd", lambda: encode(shape(data), "msgpack", accept_encoding="zstd")[0]),
+        ("fields=id,score", lambda: encode(shape(data, fields=parse_fields("id,score")))[0]),
+        ("fields=id,score + zstd", lambda: encode(shape(data, fields=parse_fields("id,score")), accept_encoding="zstd")[0]),
+        ("limit=20", lambda: encode(shape(data, limit=20))[0]),
+        ("view=summary", lambda: encode(shape(data, "summary"))[0]),
+        ("view=summary, msgpack", lambda: encode(shape(data, "summary"), "msgpack")[0]),
+    ]
+    base_t = base_b = None
+    print(f"orjson={responses.orjson is not None} msgpack={responses.msgpack is not None} "
+          f"zstd={responses.zstandard is not None}  {args.items} items\n")
+    print(f"{'mode':<28} {'us/resp':>9} {'bytes':>9} {'cpu':>7} {'bytes':>7}")
+    for name, fn in cases:
+        t = _time(fn, args.reps)
+        b = len(fn())
+        if base_t is None:
+            base_t, base_b = t, b
+        print(f"{name:<28} {t * 1e6:9.1f} {b:9,d} {t / base_t:6.2f}x {b / base_b:6.2f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# benchmarks/bench_scorer.py
+"""
+Throughput of score_text() (one call per tweet) vs score_texts() (batched)
+for a range of batch sizes. With --lexicon N, also compiles a synthetic
+N-entry lexicon (half words, half phrases) and scores against it.
+
+Run:  python -m benchmarks.bench_scorer [--total 50000] [--lexicon 50000]
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from typing import List
+
+from backend import lexicon
+from backend.xai_client import score_text, score_texts, POS_WORDS, NEG_WORDS, NEGATORS, _builtin_entries
+
+FILLER = ["the", "market", "today", "price", "lol", "just", "news", "vote", "$BTC", "again", "and"]
+
+def make_corpus(n: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    vocab = list(POS_WORDS) + list(NEG_WORDS) + list(NEGATORS) + FILLER * 6
+    out = []
+    for _ in range(n):
+        words = [rng.choice(vocab) for _ in range(rng.randint(8, 40))]
+        out.append(" ".join(words) + ("!" * rng.randint(0, 2)))
+    return out
+
+def write_lexicon(path: str, n: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            term = f"w{i}" if i % 2 else f"{rng.choice(FILLER)} w{i}"
+            f.write(f"{term}\t{rng.choice((-1.5, -1, 1, 1.5))}\n")
+
+def _rate(n: int, secs: float) -> float:
+    return n / secs if secs > 0 else float("inf")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--total", type=int, default=50_000, help="tweets scored per run")
+    ap.add_argument("--sizes", default="1,10,100,1000,10000", help="comma-separated batch sizes")
+    ap.add_argument("--lexicon", type=int, default=0, help="also bench a synthetic lexicon of N entries")
+    args = ap.parse_args()
+
+    corpus = make_corpus(args.total)
+
+    t0 = time.perf_counter()
+    for t in corpus:
+        score_text(t)
+    base = _rate(len(corpus), time.perf_counter() - t0)
+    print(f"{'score_text (loop)':<24} {base:>12,.0f} tweets/s")
+
+    for size in [int(x) for x in args.sizes.split(",") if x.strip()]:
+        t0 = time.perf_counter()
+        for i in range(0, len(corpus), size):
+            score_texts(corpus[i:i + size])
+        rate = _rate(len(corpus), time.perf_counter() - t0)
+        print(f"{'score_texts batch=' + str(size):<24} {rate:>12,.0f} tweets/s  ({rate / base:.2f}x)")
+
+    if args.lexicon:
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "bench.tsv")
+            write_lexicon(path, args.lexicon)
+            t0 = time.perf_counter()
+            lex = lexicon.load(_builtin_entries(), [path])
+            cold = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            lex = lexicon.load(_builtin_entries(), [path])
+            warm = time.perf_counter() - t0
+            cache = lexicon._cache_path([path], _builtin_entries())
+            if cache and os.path.exists(cache):
+                os.remove(cache)
+        print(f"lexicon {len(lex):,} entries: compile {cold * 1000:.0f} ms, cached load {warm * 1000:.0f} ms")
+        t0 = time.perf_counter()
+        for i in range(0, len(corpus), 1000):
+            score_texts(corpus[i:i + 1000], lex)
+        rate = _rate(len(corpus), time.perf_counter() - t0)
+        print(f"{'score_texts batch=1000':<24} {rate:>12,.0f} tweets/s  ({rate / base:.2f}x, big lexicon)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+# benchmarks/fake_kalshi.py
+"""
+Local stand-ins for the Kalshi trade API v2.
+
+  GET  /trade-api/v2/markets                   cursor pagination (limit <= 1000)
+  GET  /trade-api/v2/portfolio/balances
+  POST /trade-api/v2/portfolio/orders          client_order_id is idempotent (409 on reuse)
+  POST /trade-api/v2/portfolio/orders/batched  up to 20 orders, one result each
+
+MockExchange holds the state and answers requests; it is served either over
+HTTP (FakeKalshiServer) or in-process through an httpx transport
+(mock_transport), which leaves only the client side in the measurement.
+
+Every request must carry the KALSHI-ACCESS-* headers (401 otherwise); with
+`public_key` the RSA-PSS signature is verified too. Point the backend at
+the HTTP server with:
+
+    KALSHI_HOST=http://127.0.0.1:<port>
+"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, List, Mapping, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import httpx
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+from benchmarks.fake_x import _Server
+
+API = "/trade-api/v2"
+BATCH_MAX = 20
+
+TOPICS = [
+    ("KXBTC", "Bitcoin above {n}k on Friday?", "Crypto"),
+    ("KXETH", "Ethereum above {n}00 on Friday?", "Crypto"),
+    ("KXCPI", "CPI above {n}.0% in May?", "Economics"),
+    ("KXFED", "Fed cuts {n} times this year?", "Economics"),
+    ("KXPRES", "Candidate {n} wins the primary?", "Politics"),
+    ("KXRAIN", "More than {n} inches of rain in NYC?", "Climate"),
+]
+
+def make_markets(n: int, seed: int = 11) -> List[Dict]:
+    rng = random.Random(seed)
+    out = []
+    for i in range(n):
+        series, title, category = TOPICS[i % len(TOPICS)]
+        k = i // len(TOPICS)
+        bid = rng.randint(1, 97)
+        out.append({
+            "ticker": f"{series}-{k:05d}",
+            "event_ticker": f"{series}-E{k // 10:04d}",
+            "series_ticker": series,
+            "title": title.format(n=k % 100 + 1),
+            "subtitle": category,
+            "status": "open",
+            "yes_bid": bid,
+            "yes_ask": bid + rng.randint(1, 2),
+            "last_price": bid,
+            "volume": rng.randint(0, 100_000),
+            "volume_24h": rng.randint(0, 10_000),
+            "close_time": "2030-01-01T00:00:00Z",
+        })
+    return out
+
+def signed_ok(headers: Mapping[str, str], method: str, path: str, public_key=None) -> bool:
+    """KALSHI-ACCESS-* headers present and, with `public_key`, a valid RSA-PSS signature."""
+    key, ts, sig = (headers.get(h) for h in
+                    ("KALSHI-ACCESS-KEY", "KALSHI-ACCESS-TIMESTAMP", "KALSHI-ACCESS-SIGNATURE"))
+    if not (key is not None and ts and sig):
+        return False
+    if public_key is None:
+        return True
+    try:
+        public_key.verify(
+            base64.b64decode(sig), (ts + method + path).encode("utf-8"),
+            padding.PSS(mgf=padding.MGF1(hashes.SHA256()), salt_length=padding.PSS.DIGEST_LENGTH),
+            hashes.SHA256(),
+        )
+        return True
+    except Exception:
+        return False
+
+def _error(code: str, message: str) -> Dict:
+    return {"error": {"code": code, "message": message}}
+
+class MockExchange:
+    """
+    Exchange state and request handling, transport-agnostic.
+
+      markets     number of open markets served by /markets
+      rate_limit  requests allowed per second (None = unlimited); beyond it
+                  the answer is 429 with Retry-After until the next second
+      status      force this HTTP status on every request (e.g. 500, 503)
+      public_key  verify KALSHI-ACCESS-SIGNATURE against this RSA public key
+      batch       serve /portfolio/orders/batched (404 when False)
+    """
+
+    def __init__(self, markets: int = 2000, rate_limit: Optional[int] = None, status: Optional[int] = None,
+                 public_key=None, batch: bool = True):
+        self.markets = make_markets(markets)
+        self.rate_limit = rate_limit
+        self.status = status
+        self.public_key = public_key
+        self.batch = batch
+        self.requests = 0
+        self.throttled = 0
+        self.duplicates = 0
+        self.orders: List[Dict] = []
+        self.by_client_id: Dict[str, Dict] = {}
+        self._second = 0
+        self._second_used = 0
+        self._lock = threading.Lock()
+
+    def _allow(self) -> bool:
+        """Count this request against the per-second limit."""
+        with self._lock:
+            self.requests += 1
+            if self.rate_limit is None:
+                return True
+            now = int(time.time())
+            if now != self._second:
+                self._second, self._second_used = now, 0
+            self._second_used += 1
+            if self._second_used > self.rate_limit:
+                self.throttled += 1
+                return False
+            return True
+
+    def list_markets(self, params: Dict[str, str]) -> Dict:
+        limit = max(1, min(int(params.get("limit", 100)), 1000))
+        start = int(params.get("cursor") or 0)
+        page = self.markets[start:start + limit]
+        cursor = str(start + limit) if start + limit < len(self.markets) else ""
+        return {"markets": page, "cursor": cursor}
+
+    def create_order(self, body: Dict) -> Tuple[int, Dict]:
+        missing = [k for k in ("ticker", "side", "count") if body.get(k) in (None, "")]
+        if missing:
+            return 400, _error("invalid_parameters", f"missing {', '.join(missing)}")
+        cid = body.get("client_order_id")
+        with self._lock:
+            if cid and cid in self.by_client_id:
+                self.duplicates += 1
+                return 409, _error("order_already_exists", f"client_order_id {cid} already used")
+            order = {
+                "order_id": f"fake-{len(self.orders) + 1}",
+                "client_order_id": cid,
+                "ticker": body["ticker"],
+                "side": body["side"],
+                "type": body.get("type", "limit"),
+                "yes_price": body.get("price"),
+                "count": body["count"],
+                "status": "resting",
+                "created_time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            }
+            self.orders.append(order)
+            if cid:
+                self.by_client_id[cid] = order
+        return 201, {"order": order}
+
+    def create_batch(self, body: Dict) -> Tuple[int, Dict]:
+        orders = body.get("orders")
+        if not isinstance(orders, list) or not 1 <= len(orders) <= BATCH_MAX:
+            return 400, _error("invalid_parameters", f"orders must hold 1..{BATCH_MAX} orders")
+        out = []
+        for o in orders:
+            status, res = self.create_order(o)
+            out.append({"order": res.get("order"), "error": res.get("error")})
+        return 201, {"orders": out}
+
+    def handle(self, method: str, url: str, headers: Mapping[str, str], raw: bytes) -> Tuple[int, Dict, Dict[str, str]]:
+        """(status, JSON body, extra headers) for one request."""
+        parts = urlsplit(url)
+        if not self._allow():
+            return 429, _error("too_many_requests", "rate limited"), {"Retry-After": "1"}
+        if self.status:
+            return self.status, _error("forced", str(self.status)), {}
+        if not signed_ok(headers, method, parts.path, self.public_key):
+            return 401, _error("unauthorized", "bad signature"), {}
+
+        params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+        if method == "GET" and parts.path == API + "/markets":
+            return 200, self.list_markets(params), {}
+        if method == "GET" and parts.path == API + "/portfolio/balances":
+            return 200, {"balance": 100_000}, {}
+        if method == "POST" and parts.path in (API + "/portfolio/orders", API + "/portfolio/orders/batched"):
+            if parts.path.endswith("/batched") and not self.batch:
+                return 404, _error("not_found", parts.path), {}
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError as e:
+                return 400, _error("invalid_parameters", str(e)), {}
+            status, out = (self.create_batch if parts.path.endswith("/batched") else self.create_order)(body)
+            return status, out, {}
+        return 404, _error("not_found", parts.path), {}
+
+def mock_transport(exchange: MockExchange, latency: float = 0.0, drop_every: int = 0) -> httpx.MockTransport:
+    """
+    In-process transport for httpx.AsyncClient. Every `drop_every`-th request
+    is executed by the exchange but its response is lost (ReadTimeout), the
+    case idempotent retries exist for.
+    """
+    seen = [0]
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        status, body, headers = exchange.handle(request.method, str(request.url), request.headers, request.content)
+        seen[0] += 1
+        if drop_every and seen[0] % drop_every == 0:
+            raise httpx.ReadTimeout("response lost", request=request)
+        return httpx.Response(status, json=body, headers=headers)
+
+    return httpx.MockTransport(handler)
+
+class FakeKalshiServer:
+    """
+    MockExchange over HTTP; use as a context manager.
+
+      latency  seconds slept before answering each request
+    Other arguments go to MockExchange.
+    """
+
+    def __init__(self, markets: int = 2000, latency: float = 0.0, rate_limit: Optional[int] = None,
+                 status: Optional[int] = None, public_key=None, batch: bool = True,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.exchange = MockExchange(markets, rate_limit, status, public_key, batch)
+        self.latency = latency
+        self._httpd = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self.exchange.requests
+
+    @property
+    def throttled(self) -> int:
+        return self.exchange.throttled
+
+    def start(self) -> "FakeKalshiServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like the real API (the client pools connections)
+            disable_nagle_algorithm = True  # headers and body go out in separate writes
+
+            def do_GET(self):
+                self._dispatch("GET")
+
+            def do_POST(self):
+                self._dispatch("POST")
+
+            def _dispatch(self, method: str):
+                n = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(n) if n else b""
+                if server.latency:
+                    time.sleep(server.latency)
+                status, body, headers = server.exchange.handle(method, self.path, self.headers, raw)
+                out = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for k, v in headers.items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(out)))
+                self.end_headers()
+                self.wfile.write(out)
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+        return Handler
@@ -0,0 +1,199 @@
+# benchmarks/fake_kalshi_ws.py
+"""
+Local stand-in for the Kalshi market-data websocket (/trade-api/ws/v2).
+
+Speaks the subset MarketFeed uses: subscribe / unsubscribe commands,
+`subscribed` replies, `orderbook_snapshot` then `orderbook_delta` messages
+with a per-subscription seq, and `ticker` updates. The server keeps the
+true book of every market; publish(n) generates n random deltas, applies
+them and sends them to every subscriber, so a client's books can be
+compared with truth() afterwards.
+
+  gap_every   skip one seq number every N deltas (that delta is applied to
+              the true book but never sent), forcing a re-snapshot
+  public_key  verify the handshake's RSA-PSS signature
+
+Point the backend at it with:
+
+    KALSHI_WS_URL=ws://127.0.0.1:<port>/trade-api/ws/v2
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import threading
+from typing import Dict, List, Optional
+
+from websockets.asyncio.server import serve
+from websockets.exceptions import ConnectionClosed
+
+from benchmarks.fake_kalshi import signed_ok
+
+WS_PATH = "/trade-api/ws/v2"
+
+class _Sub:
+    __slots__ = ("sid", "channel", "tickers", "seq")
+
+    def __init__(self, sid: int, channel: str, tickers: List[str]):
+        self.sid = sid
+        self.channel = channel
+        self.tickers = set(tickers)
+        self.seq = 0
+
+class FakeKalshiWS:
+    """Websocket server on its own thread and event loop; use as a context manager."""
+
+    def __init__(self, tickers: List[str], gap_every: int = 0, public_key=None, seed: int = 5,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.rng = random.Random(seed)
+        self.gap_every = gap_every
+        self.public_key = public_key
+        self.host, self.port = host, port
+        self.books: Dict[str, Dict[str, Dict[int, int]]] = {t: self._initial_book() for t in tickers}
+        self.tickers = list(tickers)
+        self.sent = 0
+        self.skipped = 0
+        self.subscribes = 0
+        self.published = 0
+        self._conns: Dict[object, Dict[int, _Sub]] = {}
+        self._next_sid = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    def _initial_book(self) -> Dict[str, Dict[int, int]]:
+        mid = self.rng.randint(20, 80)
+        return {
+            "yes": {p: self.rng.randint(1, 500) for p in range(max(1, mid - 10), mid)},
+            "no": {p: self.rng.randint(1, 500) for p in range(max(1, 100 - mid - 10), 100 - mid)},
+        }
+
+    @property
+    def url(self) -> str:
+        return f"ws://{self.host}:{self.port}{WS_PATH}"
+
+    # --- lifecycle ---
+    def start(self) -> "FakeKalshiWS":
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait(10)
+        return self
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._open())
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _open(self):
+        self._server = await serve(self._handler, self.host, self.port, process_request=self._check_auth)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        async def _close():
+            self._server.close()
+            await self._server.wait_closed()
+        asyncio.run_coroutine_threadsafe(_close(), self._loop).result(10)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(10)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _check_auth(self, conn, request):
+        if not signed_ok(request.headers, "GET", WS_PATH, self.public_key):
+            return conn.respond(401, "bad signature\n")
+        return None
+
+    # --- protocol ---
+    async def _handler(self, ws):
+        subs = self._conns[ws] = {}
+        try:
+            async for raw in ws:
+                cmd = json.loads(raw)
+                params = cmd.get("params") or {}
+                if cmd.get("cmd") == "subscribe":
+                    self.subscribes += 1
+                    tickers = [t for t in params.get("market_tickers", []) if t in self.books]
+                    for channel in params.get("channels", []):
+                        self._next_sid += 1
+                        sub = subs[self._next_sid] = _Sub(self._next_sid, channel, tickers)
+                        await ws.send(json.dumps({"id": cmd.get("id"), "type": "subscribed",
+                                                  "msg": {"channel": channel, "sid": sub.sid}}))
+                        if channel == "orderbook_delta":
+                            for t in tickers:
+                                sub.seq += 1
+                                book = self.books[t]
+                                await ws.send(json.dumps({
+                                    "type": "orderbook_snapshot", "sid": sub.sid, "seq": sub.seq,
+                                    "msg": {"market_ticker": t, "yes": sorted(map(list, book["yes"].items())),
+                                            "no": sorted(map(list, book["no"].items()))},
+                                }))
+                elif cmd.get("cmd") == "unsubscribe":
+                    for sid in params.get("sids", []):
+                        subs.pop(sid, None)
+                    await ws.send(json.dumps({"id": cmd.get("id"), "type": "unsubscribed"}))
+        except ConnectionClosed:
+            pass
+        finally:
+            self._conns.pop(ws, None)
+
+    def _random_delta(self, ticker: str) -> Dict:
+        side = "yes" if self.rng.random() < 0.5 else "no"
+        levels = self.books[ticker][side]
+        if levels and self.rng.random() < 0.5:
+            price = self.rng.choice(list(levels))
+            delta = -self.rng.randint(1, levels[price])
+        else:
+            price = self.rng.randint(1, 99)
+            delta = self.rng.randint(1, 100)
+        qty = levels.get(price, 0) + delta
+        if qty:
+            levels[price] = qty
+        else:
+            levels.pop(price, None)
+        return {"market_ticker": ticker, "price": price, "delta": delta, "side": side}
+
+    async def _publish(self, n: int, ticker_every: int):
+        for i in range(n):
+            t = self.tickers[i % len(self.tickers)] if len(self.tickers) < 8 else self.rng.choice(self.tickers)
+            body = self._random_delta(t)
+            self.published += 1
+            drop = bool(self.gap_every) and self.published % self.gap_every == 0
+            for ws, subs in list(self._conns.items()):
+                for sub in list(subs.values()):
+                    if t not in sub.tickers:
+                        continue
+                    if sub.channel == "orderbook_delta":
+                        sub.seq += 1
+                        if drop:
+                            self.skipped += 1
+                            continue
+                        await ws.send(json.dumps({"type": "orderbook_delta", "sid": sub.sid, "seq": sub.seq,
+                                                  "msg": body}))
+                        self.sent += 1
+                    elif sub.channel == "ticker" and ticker_every and i % ticker_every == 0:
+                        q = self.quote(t)
+                        await ws.send(json.dumps({"type": "ticker", "sid": sub.sid, "msg": {
+                            "market_ticker": t, "price": q["yes_bid"], "yes_bid": q["yes_bid"],
+                            "yes_ask": q["yes_ask"], "volume": i}}))
+
+    def publish(self, n: int, ticker_every: int = 50):
+        """Generate, apply and send n deltas (blocks until they are written)."""
+        asyncio.run_coroutine_threadsafe(self._publish(n, ticker_every), self._loop).result()
+
+    # --- truth ---
+    def truth(self, ticker: str) -> Dict[str, Dict[int, int]]:
+        b = self.books[ticker]
+        return {"yes": dict(b["yes"]), "no": dict(b["no"])}
+
+    def quote(self, ticker: str) -> Dict:
+        b = self.books[ticker]
+        by = max(b["yes"], default=0)
+        bn = max(b["no"], default=0)
+        return {"yes_bid": by or None, "yes_ask": (100 - bn) if bn else None}
@@ -0,0 +1,165 @@
+# benchmarks/fake_x.py
+"""
+Local stand-in for X API v2 Recent Search (GET /2/tweets/search/recent).
+
+Serves a deterministic corpus with real-looking pagination (meta.next_token)
+and an optional per-request latency. Point the backend at it with:
+
+    X_SEARCH_URL=http://127.0.0.1:<port>/2/tweets/search/recent X_BEARER=fake
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlsplit
+
+WORDS = [
+    "bullish", "bearish", "pump", "dump", "not", "great", "weak", "rally", "crash",
+    "the", "market", "today", "news", "looks", "again", "vote", "poll", "🚀", "😭",
+]
+
+BASE_ID = 1_800_000_000_000_000_000
+
+def make_tweets(n: int, seed: int = 42, start: int = 0) -> List[Dict]:
+    """
+    Newest first, like Recent Search. IDs are decreasing numeric strings;
+    `start` offsets them so later batches are newer than earlier ones.
+    """
+    rng = random.Random(seed + start)
+    return [
+        {
+            "id": str(BASE_ID + start + n - i),
+            "text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 30))),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", time.gmtime(1_700_000_000 + start + n - i)),
+            "lang": "en",
+        }
+        for i in range(n)
+    ]
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 1024  # default backlog of 5 drops SYNs under concurrent load
+
+class FakeXServer:
+    """
+    Threaded HTTP server; use as a context manager.
+
+      total     number of tweets in the corpus
+      latency   seconds slept before answering each request
+      quota     requests allowed per `window_s` (None = unlimited); beyond
+                it the server answers 429 until the window resets. Every
+                response carries x-rate-limit-limit/-remaining/-reset.
+      status    force this HTTP status on every request (e.g. 401, 503)
+    """
+
+    def __init__(self, total: int = 1000, latency: float = 0.0, quota: Optional[int] = None,
+                 window_s: float = 900.0, status: Optional[int] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.tweets = make_tweets(total)
+        self.latency = latency
+        self.quota = quota
+        self.window_s = window_s
+        self.status = status
+        self.requests = 0
+        self._window_start = time.time()
+        self._window_used = 0
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/2/tweets/search/recent"
+
+    def start(self) -> "FakeXServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def publish(self, n: int) -> List[Dict]:
+        """Add `n` tweets newer than everything served so far."""
+        with self._lock:
+            newest = int(self.tweets[0]["id"]) - BASE_ID if self.tweets else 0
+            fresh = make_tweets(n, start=newest)
+            self.tweets = fresh + self.tweets
+        return fresh
+
+    def search(self, params: Dict[str, str]) -> Dict:
+        size = max(10, min(int(params.get("max_results", 10)), 100))
+        start = int(params.get("next_token") or 0)
+        tweets = self.tweets
+        if params.get("since_id"):
+            since = int(params["since_id"])
+            tweets = [t for t in tweets if int(t["id"]) > since]
+        page = tweets[start:start + size]
+        meta = {"result_count": len(page)}
+        if page:
+            meta["newest_id"], meta["oldest_id"] = page[0]["id"], page[-1]["id"]
+        if start + size < len(tweets):
+            meta["next_token"] = str(start + size)
+        return {"data": page, "meta": meta} if page else {"meta": meta}
+
+    def rate_headers(self) -> Dict[str, str]:
+        """Count this request against the quota; headers as X sends them."""
+        with self._lock:
+            now = time.time()
+            if now - self._window_start >= self.window_s:
+                self._window_start, self._window_used = now, 0
+            self._window_used += 1
+            limit = self.quota if self.quota is not None else 450
+            return {
+                "x-rate-limit-limit": str(limit),
+                "x-rate-limit-remaining": str(max(0, limit - self._window_used)),
+                "x-rate-limit-reset": str(int(self._window_start + self.window_s + 0.999)),
+            }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                with server._lock:
+                    server.requests += 1
+                if server.latency:
+                    time.sleep(server.latency)
+                if parts.path != "/2/tweets/search/recent":
+                    return self._send(404, {"title": "Not Found"})
+                headers = server.rate_headers()
+                if server.status:
+                    return self._send(server.status, {"title": f"Forced {server.status}"}, headers)
+                if server.quota is not None and headers["x-rate-limit-remaining"] == "0" \
+                        and server._window_used > server.quota:
+                    return self._send(429, {"title": "Too Many Requests"}, headers)
+                params = {k: v[0] for k, v in parse_qs(parts.query).items()}
+                self._send(200, server.search(params), headers)
+
+            def _send(self, status: int, body: Dict, headers: Optional[Dict[str, str]] = None):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+        return Handler
@@ -0,0 +1,108 @@
+# benchmarks/fake_xai.py
+"""
+Local stand-in for the xAI chat completions API (POST /v1/chat/completions).
+
+Answers the GrokScorer prompt: the user message is a JSON array of tweets,
+the reply content is {"scores": [...]}. Scores come from the lexicon scorer
+so results are deterministic. Point the backend at it with:
+
+    XSENT_SCORER=grok XAI_KEY=fake XAI_URL=http://127.0.0.1:<port>/v1/chat/completions
+"""
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+from typing import Dict, Optional
+
+from backend.xai_client import score_text
+from benchmarks.fake_x import _Server
+
+class FakeXAIServer:
+    """
+    Threaded HTTP server; use as a context manager.
+
+      latency    seconds slept before answering each request
+      per_tweet  extra seconds per tweet in the request (models are slower
+                 on longer prompts)
+      status     force this HTTP status on every request (e.g. 429, 500)
+    """
+
+    def __init__(self, latency: float = 0.0, per_tweet: float = 0.0, status: Optional[int] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.latency = latency
+        self.per_tweet = per_tweet
+        self.status = status
+        self.requests = 0
+        self.tweets = 0
+        self._lock = threading.Lock()
+        self._httpd = _Server((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def start(self) -> "FakeXAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def complete(self, body: Dict) -> Dict:
+        tweets = json.loads(body["messages"][-1]["content"])
+        with self._lock:
+            self.requests += 1
+            self.tweets += len(tweets)
+        scores = [score_text(t)["score"] for t in tweets]
+        return {
+            "id": f"fake-{self.requests}",
+            "object": "chat.completion",
+            "model": body.get("model"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": json.dumps({"scores": scores})},
+                "finish_reason": "stop",
+            }],
+        }
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path != "/v1/chat/completions":
+                    return self._send(404, {"error": "not found"})
+                if server.status:
+                    return self._send(server.status, {"error": f"forced {server.status}"})
+                body = json.loads(raw or b"{}")
+                n = len(json.loads(body["messages"][-1]["content"]))
+                delay = server.latency + server.per_tweet * n
+                if delay:
+                    time.sleep(delay)
+                self._send(200, server.complete(body))
+
+            def _send(self, status: int, body: Dict):
+                raw = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+            def log_message(self, *args):  # keep benchmark output clean
+                pass
+
+        return Handler
@@ -0,0 +1,291 @@
+# benchmarks/run.py
+"""
+Benchmark suite: the scorer, analyze_topic() and the HTTP API under
+concurrent load, against local stand-ins for X (fake_x) and Kalshi
+(fake_kalshi). Nothing leaves the machine.
+
+  score                 score_text() loop and score_texts() batches, tweets/s
+  analyze               analyze_topic() latency (p50/p99) over paginated fake X
+  api_sentiment         GET /api/sentiment, a new query per request (cache misses)
+  api_sentiment_cached  GET /api/sentiment over a few hot queries (cache hits)
+  api_order             POST /api/kalshi/order, signed, through the fake exchange
+
+The API runs in a uvicorn subprocess so the load generator does not share
+its GIL. Results go to a JSON file (sorted keys, one value per line) so two
+runs diff cleanly; --compare prints the change against an earlier file.
+
+Run:  python -m benchmarks.run [--suites score,analyze,...] [--out results.json] [--compare old.json]
+"""
+from __future__ import annotations
+
+import os
+
+# Before any backend import: no on-disk state between runs, lexicon scorer, no watchlist
+os.environ.update({
+    "X_BEARER": "fake",
+    "XSENT_FORCE_DEMO": "0",
+    "XSENT_STORE_DB": "",
+    "XSENT_SCORE_DB": "",
+    "XSENT_SCORER": "lexicon",
+    "XSENT_WATCHLIST": "",
+})
+
+import argparse
+import asyncio
+import json
+import math
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from backend import x_fetcher
+from backend.aggregator import analyze_topic
+from backend.xai_client import score_text, score_texts
+from benchmarks.bench_scorer import make_corpus
+from benchmarks.fake_kalshi import FakeKalshiServer
+from benchmarks.fake_x import FakeXServer
+
+SUITES = ["score", "analyze", "api_sentiment", "api_sentiment_cached", "api_order"]
+
+def latency_stats(samples: List[float]) -> Dict:
+    """Nearest-rank percentiles, in milliseconds."""
+    s = sorted(samples)
+    if not s:
+        return {"n": 0}
+
+    def pct(q: float) -> float:
+        return round(s[max(0, math.ceil(q * len(s)) - 1)] * 1000, 3)
+
+    return {
+        "n": len(s),
+        "mean_ms": round(sum(s) / len(s) * 1000, 3),
+        "p50_ms": pct(0.50),
+        "p90_ms": pct(0.90),
+        "p99_ms": pct(0.99),
+        "max_ms": round(s[-1] * 1000, 3),
+    }
+
+def bench_score(total: int) -> Dict:
+    corpus = make_corpus(total)
+    t0 = time.perf_counter()
+    for t in corpus:
+        score_text(t)
+    loop = time.perf_counter() - t0
+    out = {"texts": total, "score_text_per_s": round(total / loop)}
+    for size in (100, 1000):
+        t0 = time.perf_counter()
+        for i in range(0, total, size):
+            score_texts(corpus[i:i + size])
+        out[f"score_texts_batch{size}_per_s"] = round(total / (time.perf_counter() - t0))
+    return out
+
+def bench_analyze(fake: FakeXServer, runs: int, max_results: int) -> Dict:
+    analyze_topic("warmup", max_results=10)
+    samples = []
+    before = fake.requests
+    for i in range(runs):
+        t0 = time.perf_counter()
+        res = analyze_topic(f"bench {i}", max_results=max_results)
+        samples.append(time.perf_counter() - t0)
+    return {
+        "max_results": max_results,
+        "pages_per_run": round((fake.requests - before) / runs, 2),
+        "source": res["source"],
+        **latency_stats(samples),
+    }
+
+async def load(base_url: str, send: Callable[[httpx.AsyncClient, int], Awaitable[httpx.Response]],
+               requests: int, concurrency: int) -> Dict:
+    """`requests` calls of send(client, i) from `concurrency` workers; latency, throughput, statuses."""
+    samples: List[float] = []
+    statuses: Counter = Counter()
+    cache: Counter = Counter()
+    todo = iter(range(requests))
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        async def worker():
+            for i in todo:
+                t0 = time.perf_counter()
+                try:
+                    r = await send(client, i)
+                    statuses[str(r.status_code)] += 1
+                    if "x-cache" in r.headers:
+                        cache[r.headers["x-cache"].lower()] += 1
+                except Exception as e:
+                    statuses[type(e).__name__] += 1
+                samples.append(time.perf_counter() - t0)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - t0
+    out = {"concurrency": concurrency, "rps": round(requests / wall, 1), "status": dict(statuses),
+           **latency_stats(samples)}
+    if cache:
+        out["cache"] = dict(cache)
+    return out
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class ApiServer:
+    """backend.app under uvicorn in a child process, pointed at the fakes."""
+
+    def __init__(self, env: Dict[str, str]):
+        self.port = _free_port()
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.env = {**os.environ, **env}
+        self.proc: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "ApiServer":
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.app:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--log-level", "warning", "--no-access-log"],
+            env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            if self.proc.poll() is not None:
+                raise RuntimeError("uvicorn exited during startup")
+            try:
+                if httpx.get(self.url + "/health", timeout=1).status_code == 200:
+                    return self
+            except httpx.HTTPError:
+                time.sleep(0.1)
+        raise RuntimeError("uvicorn did not come up within 30s")
+
+    def __exit__(self, *exc):
+        self.proc.terminate()
+        try:
+            self.proc.wait(10)
+        except subprocess.TimeoutExpired:
+            self.proc.kill()
+
+def _write_key(d: str):
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    path = os.path.join(d, "bench_kalshi.pem")
+    with open(path, "wb") as f:
+        f.write(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                  serialization.NoEncryption()))
+    return path, key.public_key()
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except Exception:
+        return None
+
+def _flatten(d: Dict, prefix: str = "") -> Dict[str, float]:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(_flatten(v, key + "."))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+def compare(old: Dict, new: Dict):
+    """Print every numeric result present in both runs with its relative change."""
+    a, b = _flatten(old.get("results", {})), _flatten(new.get("results", {}))
+    print(f"\n{'metric':<48} {'before':>12} {'after':>12} {'change':>8}")
+    for k in sorted(set(a) & set(b)):
+        change = f"{(b[k] - a[k]) / a[k] * 100:+.1f}%" if a[k] else ""
+        print(f"{k:<48} {a[k]:>12,.3f} {b[k]:>12,.3f} {change:>8}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--suites", default=",".join(SUITES), help="comma-separated: " + ",".join(SUITES))
+    ap.add_argument("--out", default=None, help="results file (default benchmarks/results/<commit>.json)")
+    ap.add_argument("--compare", default=None, help="earlier results file to diff against")
+    ap.add_argument("--texts", type=int, default=20_000, help="texts for the score suite")
+    ap.add_argument("--runs", type=int, default=20, help="analyze_topic() calls")
+    ap.add_argument("--max-results", type=int, default=300, help="tweets per analysis (100 per page)")
+    ap.add_argument("--requests", type=int, default=500, help="HTTP requests per API suite")
+    ap.add_argument("--concurrency", type=int, default=32)
+    ap.add_argument("--x-latency", type=float, default=0.02, help="seconds per fake X request")
+    ap.add_argument("--x-quota", type=int, default=None, help="fake X requests per --x-window before 429s")
+    ap.add_argument("--x-window", type=float, default=900.0)
+    ap.add_argument("--kalshi-latency", type=float, default=0.01, help="seconds per fake Kalshi request")
+    ap.add_argument("--kalshi-rate", type=int, default=None, help="fake Kalshi requests/s before 429s")
+    args = ap.parse_args()
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    unknown = set(suites) - set(SUITES)
+    if unknown:
+        ap.error(f"unknown suites: {', '.join(sorted(unknown))}")
+
+    params = {k: v for k, v in vars(args).items() if k not in ("out", "compare")}
+    results: Dict[str, Dict] = {}
+    # No quota given: a limit high enough that the governor never holds requests back
+    x_quota = args.x_quota if args.x_quota is not None else 10_000_000
+
+    with tempfile.TemporaryDirectory() as tmp, \
+            FakeXServer(total=1000, latency=args.x_latency, quota=x_quota, window_s=args.x_window) as fake_x:
+        key_path, public_key = _write_key(tmp)
+        x_fetcher.SEARCH_URL = fake_x.url
+
+        if "score" in suites:
+            results["score"] = bench_score(args.texts)
+            print(f"[bench] score: {results['score']}")
+        if "analyze" in suites:
+            results["analyze"] = bench_analyze(fake_x, args.runs, args.max_results)
+            print(f"[bench] analyze: {results['analyze']}")
+
+        api = [s for s in suites if s.startswith("api_")]
+        if api:
+            with FakeKalshiServer(latency=args.kalshi_latency, rate_limit=args.kalshi_rate,
+                                  public_key=public_key) as fake_k, \
+                    ApiServer({"X_SEARCH_URL": fake_x.url, "KALSHI_HOST": fake_k.url,
+                               "KALSHI_API_KEY_ID": "bench", "KALSHI_PRIVATE_KEY": key_path}) as srv:
+                requests, conc = args.requests, args.concurrency
+                if "api_sentiment" in suites:
+                    results["api_sentiment"] = asyncio.run(load(srv.url, lambda c, i: c.get(
+                        "/api/sentiment", params={"q": f"bench {i}", "max_results": 100}), requests, conc))
+                    print(f"[bench] api_sentiment: {results['api_sentiment']}")
+                if "api_sentiment_cached" in suites:
+                    results["api_sentiment_cached"] = asyncio.run(load(srv.url, lambda c, i: c.get(
+                        "/api/sentiment", params={"q": f"hot {i % 5}", "max_results": 100}), requests, conc))
+                    print(f"[bench] api_sentiment_cached: {results['api_sentiment_cached']}")
+                if "api_order" in suites:
+                    body = {"ticker": "KXBTC-00001", "side": "buy", "price": 42, "count": 1}
+                    results["api_order"] = asyncio.run(load(srv.url, lambda c, i: c.post(
+                        "/api/kalshi/order", json=body), requests, conc))
+                    results["api_order"]["kalshi_throttled"] = fake_k.throttled
+                    print(f"[bench] api_order: {results['api_order']}")
+
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "params": params,
+        },
+        "results": results,
+    }
+    out = args.out or os.path.join("benchmarks", "results", f"{commit or 'local'}.json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"[bench] wrote {out}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
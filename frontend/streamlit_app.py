@@ -1,13 +1,20 @@
 # frontend/streamlit_app.py
+import json
 import os
+import threading
+import time
 import requests
 import pandas as pd
 import plotly.express as px
 import streamlit as st
-from functools import lru_cache
+from requests.adapters import HTTPAdapter
 
 # -------------------- Config --------------------
 DEFAULT_BACKEND = os.getenv("XSENT_BACKEND", "http://127.0.0.1:8000").rstrip("/")
+# Backend reads are cached per process (shared by every open session) for this long
+SENTIMENT_TTL_S = int(os.getenv("XSENT_UI_SENTIMENT_TTL", "30"))  # matches the backend's XSENT_CACHE_TTL
+MARKETS_TTL_S = int(os.getenv("XSENT_UI_MARKETS_TTL", "300"))
+BOOK_TTL_S = 2
 st.set_page_config(page_title="xSent — X → Sentiment → Kalshi Signals", layout="wide")
 
 st.markdown("""
@@ -33,7 +40,8 @@ with st.sidebar:
     st.caption("Run: `uvicorn backend.app:app --reload`")
     st.divider()
     st.header("Auto-Sync")
-    auto = st.toggle("Refresh UI every 5s", value=False, help="(front-end only; avoids hammering APIs)")
+    auto = st.toggle("Refresh UI every 5s", value=False,
+                     help="Redraws the live watchlist panel from the pushed signals; makes no API calls")
     st.caption("If Markets don’t load, ensure your backend can reach `api.elections.kalshi.com` and that your Kalshi env vars are set.")
 
 # -------------------- API helpers --------------------
@@ -43,25 +51,103 @@ def _err_msg(e: requests.HTTPError) -> str:
     except Exception:
         return str(e)
 
+@st.cache_resource
+def _session() -> requests.Session:
+    """One pooled keep-alive session for the whole Streamlit process."""
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=32)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    return s
+
 def _get(url, **kwargs):
-    r = requests.get(url, timeout=kwargs.pop("timeout", 60), **kwargs)
+    r = _session().get(url, timeout=kwargs.pop("timeout", 60), **kwargs)
     r.raise_for_status()
     return r.json()
 
 def _post(url, **kwargs):
-    r = requests.post(url, timeout=kwargs.pop("timeout", 60), **kwargs)
+    r = _session().post(url, timeout=kwargs.pop("timeout", 60), **kwargs)
     r.raise_for_status()
     return r.json()
 
+@st.cache_data(ttl=SENTIMENT_TTL_S, max_entries=256, show_spinner="Analyzing…")
 def run_sentiment(backend: str, query: str, max_results: int = 20):
-    return _get(f"{backend}/api/sentiment", params={"q": query, "max_results": int(max_results)}, timeout=90)
+    return _get(f"{backend}/api/sentiment", params={"q": query, "max_results": int(max_results)}, timeout=(5, 90))
 
-@lru_cache(maxsize=64)
+@st.cache_data(ttl=MARKETS_TTL_S, max_entries=16, show_spinner=False)
 def fetch_markets(backend: str):
     data = _get(f"{backend}/api/kalshi/markets", timeout=30)
     # Support both direct lists and {"markets":[...]} shapes
     return data.get("markets", data.get("data", data))
 
+@st.cache_data(ttl=MARKETS_TTL_S, max_entries=1024, show_spinner=False)
+def market_query(backend: str, ticker: str):
+    """Optimized X query for a market, precomputed by the backend."""
+    return _get(f"{backend}/api/kalshi/markets/{ticker}/query", timeout=10).get("query")
+
+@st.cache_data(ttl=BOOK_TTL_S, max_entries=256, show_spinner=False)
+def market_book(backend: str, ticker: str):
+    """Live best bid/ask for a market from the backend's websocket feed (None while unavailable)."""
+    try:
+        return _get(f"{backend}/api/kalshi/markets/{ticker}/book", params={"depth": 1}, timeout=5)
+    except Exception:
+        return None
+
+def watch_query(backend: str, query: str, interval_s: int = 60, max_results: int = 20):
+    return _post(f"{backend}/api/watchlist", json={"query": query, "interval_s": interval_s,
+                                                   "max_results": int(max_results)}, timeout=10)
+
+class SignalFeed:
+    """
+    Latest watchlist signals, pushed by the backend over SSE
+    (/api/signals/stream). One reader thread per backend URL for the whole
+    Streamlit process, so reruns only read memory however many sessions
+    are open.
+    """
+
+    def __init__(self, backend: str):
+        self.url = f"{backend}/api/signals/stream"
+        self.signals = {}
+        self.connected = False
+        self.error = None
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def _run(self):
+        delay = 1.0
+        while True:
+            try:
+                # own connection: a stream that never ends would pin a pooled one
+                with requests.get(self.url, stream=True, timeout=(5, 60),
+                                  headers={"Accept": "text/event-stream"}) as r:
+                    r.raise_for_status()
+                    self.connected, self.error, delay = True, None, 1.0
+                    data = []
+                    for line in r.iter_lines(chunk_size=None, decode_unicode=True):
+                        if line.startswith("data:"):
+                            data.append(line[5:].strip())
+                        elif not line and data:
+                            self._apply(json.loads("\n".join(data)))
+                            data = []
+                continue  # the backend ends streams after a while; reconnect right away
+            except Exception as e:
+                self.error = str(e)[:200]
+                self.connected = False
+            time.sleep(delay)
+            delay = min(delay * 2, 30.0)
+
+    def _apply(self, frame: dict):
+        kind = frame.get("type")
+        if kind == "snapshot":
+            self.signals = dict(frame.get("signals") or {})
+        elif kind == "signal":
+            self.signals = {**self.signals, frame["query"]: frame}
+        elif kind == "removed":
+            self.signals = {k: v for k, v in self.signals.items() if k != frame.get("query")}
+
+@st.cache_resource
+def signal_feed(backend: str) -> SignalFeed:
+    return SignalFeed(backend)
+
 def place_live_order(backend: str, ticker: str, side: str, price: int, count: int):
     payload = {"ticker": ticker, "side": side.lower(), "price": int(price), "count": int(count)}
     return _post(f"{backend}/api/kalshi/order", json=payload, timeout=30)
@@ -80,6 +166,41 @@ def sentiment_recommendation(avg: float, pos: int, neg: int):
         return ("NO", min(0.99, round(abs(avg), 3)), 60)
     return ("HOLD", 0.3, 50)
 
+# -------------------- Live watchlist panel --------------------
+def _live_signals():
+    feed = signal_feed(BACKEND)
+    st.write("**Watchlist signals (live)**")
+    if not feed.signals:
+        note = "connected, waiting for the first signal" if feed.connected else (feed.error or "connecting…")
+        st.caption(f"Nothing watched yet ({note}). Use *Watch* above to add a query.")
+        return
+    now = time.time()
+    rows = []
+    for q, sig in sorted(feed.signals.items()):
+        counts = sig.get("counts") or {}
+        rows.append({
+            "query": q,
+            "avg_score": sig.get("avg_score"),
+            "signal": sentiment_recommendation(float(sig.get("avg_score") or 0.0),
+                                               counts.get("pos", 0), counts.get("neg", 0))[0],
+            "momentum": sig.get("momentum"),
+            "n": sig.get("n"),
+            "source": sig.get("source"),
+            "age_s": int(now - sig["updated_at"]) if sig.get("updated_at") else None,
+        })
+    st.dataframe(pd.DataFrame(rows), use_container_width=True, hide_index=True)
+    if not feed.connected:
+        st.caption(f"Push channel down, showing last known values ({feed.error or 'reconnecting'}).")
+
+# st.fragment (st.experimental_fragment before 1.37) redraws just this panel; older Streamlit redraws on rerun
+_fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+
+def _live_signals_panel():
+    if _fragment is None:
+        _live_signals()
+    else:
+        _fragment(run_every=5 if auto else None)(_live_signals)()
+
 # -------------------- UI Tabs --------------------
 st.title("xSent — X → Sentiment → Kalshi Signals")
 tabs = st.tabs(["🔎 Analyze", "📈 Markets & Trade", "ℹ️ About"])
@@ -94,7 +215,8 @@ with tabs[0]:
     with mcol:
         max_results = st.number_input("Max tweets", min_value=1, max_value=300, value=30, step=5)
 
-    if st.button("Analyze Sentiment", type="primary"):
+    acol, wcol = st.columns([1, 1])
+    if acol.button("Analyze Sentiment", type="primary"):
         try:
             data = run_sentiment(BACKEND, query, max_results)
             st.session_state["last_query"] = query
@@ -104,6 +226,14 @@ with tabs[0]:
             st.error(_err_msg(e))
         except Exception as e:
             st.error(str(e))
+    if wcol.button("Watch (live updates)", help="Backend re-analyzes this query in the background and pushes each new signal"):
+        try:
+            watch_query(BACKEND, query, max_results=max_results)
+            st.success(f"Watching '{query}'.")
+        except requests.HTTPError as e:
+            st.error(_err_msg(e))
+        except Exception as e:
+            st.error(str(e))
 
     if "last_data" in st.session_state:
         data = st.session_state["last_data"]
@@ -114,13 +244,18 @@ with tabs[0]:
         n, req = data.get("n", 0), data.get("requested", 0)
 
         badge = "badge-live" if src == "LIVE" else ("badge-demo" if src == "DEMO" else "badge-err")
+        cache = data.get("cache") or {}
+        fresh = f" <span class='small'>(cached, {cache.get('age_s', 0):.0f}s old)</span>" if cache.get("hit") else ""
+        dedup = data.get("dedup") or {}
+        dups = dedup.get("exact", 0) + dedup.get("near", 0)
+        dup_note = f" <span class='small'>({dups} duplicates collapsed)</span>" if dups else ""
         st.markdown(
             f"**Avg Sentiment:** {avg:+.3f} &nbsp;"
             f"<span class='badge badge-pos'>+{pos}</span> "
             f"<span class='badge badge-neg'>-{neg}</span> "
             f"<span class='badge badge-neu'>±{neu}</span> &nbsp;|&nbsp; "
-            f"**Items:** {n} / requested {req} &nbsp;|&nbsp; "
-            f"Source: <span class='badge {badge}'>{src}</span>",
+            f"**Items:** {n} / requested {req}{dup_note} &nbsp;|&nbsp; "
+            f"Source: <span class='badge {badge}'>{src}</span>{fresh}",
             unsafe_allow_html=True
         )
 
@@ -138,6 +273,9 @@ with tabs[0]:
                 fig = px.histogram(df, x="score", nbins=30, title="Sentiment score distribution")
                 st.plotly_chart(fig, use_container_width=True)
 
+    st.divider()
+    _live_signals_panel()
+
 # ========== Markets & Trade ==========
 with tabs[1]:
     left, right = st.columns([3,2])
@@ -167,11 +305,17 @@ with tabs[1]:
 
             st.divider()
             st.write("**Link sentiment to this market (optional)**")
-            market_query = st.text_input("Market-specific query", value=(choice or ""))
+            suggested = choice or ""
+            if chosen_ticker:
+                try:
+                    suggested = market_query(BACKEND, chosen_ticker) or suggested
+                except Exception:
+                    pass
+            market_query_text = st.text_input("Market-specific query", value=suggested)
             mq_results = st.number_input("Tweets for market query", 1, 200, 20, step=5)
             if st.button("Analyze Market Query"):
                 try:
-                    mdata = run_sentiment(BACKEND, market_query, mq_results)
+                    mdata = run_sentiment(BACKEND, market_query_text, mq_results)
                     st.session_state["market_data"] = mdata
                     st.success("Market query analyzed.")
                 except Exception as e:
@@ -215,18 +359,16 @@ with tabs[1]:
             st.divider()
             st.write("### Place order (Kalshi)")
             order_side = st.selectbox("Side", ["YES", "NO"], index=0 if side=="YES" else (1 if side=="NO" else 0))
+            manual_ticker = st.text_input("Ticker (paste from Markets list)", value="")
+            # the live ask for the chosen side when the backend has a book, else the toy hint
+            book = market_book(BACKEND, manual_ticker) if manual_ticker else None
+            ask = (book or {}).get("yes_ask" if order_side == "YES" else "no_ask")
+            if ask:
+                price_hint = int(ask)
+                st.caption(f"Book: YES {book.get('yes_bid') or '—'} / {book.get('yes_ask') or '—'}¢ "
+                           f"(updated {book.get('age_s')}s ago)")
             price = st.slider("Limit price (¢)", 1, 99, price_hint)
             qty = st.number_input("Quantity", 1, 100, 1)
-            chosen_ticker = None
-            # recover ticker from left column selection by searching cache (quick hack)
-            try:
-                mkts = fetch_markets(BACKEND)
-                if mkts:
-                    titles = [m.get("title") or m.get("question") or m.get("ticker") for m in mkts]
-                    # best-effort: if user selected earlier, it's stored in the left column; otherwise we let user type
-            except Exception:
-                pass
-            manual_ticker = st.text_input("Ticker (paste from Markets list)", value="")
 
             c1, c2 = st.columns(2)
             if c1.button("Simulate"):